@@ -27,15 +27,19 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     # Third party apps
     'rest_framework',
+    'rest_framework.authtoken',
     'corsheaders',
     # Local apps
     'contact',
 ]
 
 MIDDLEWARE = [
+    'contact.middleware.RequestLogMiddleware',
+    'contact.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'contact.middleware.LeanAPIMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -44,6 +48,10 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Prefixos servidos pelo LeanAPIMiddleware, sem as camadas seguintes do MIDDLEWARE
+API_LEAN_MIDDLEWARE = config('API_LEAN_MIDDLEWARE', default=True, cast=bool)
+API_LEAN_PREFIXES = ['/api/']
+
 ROOT_URLCONF = 'backend.urls'
 
 TEMPLATES = [
@@ -63,6 +71,10 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'backend.wsgi.application'
+ASGI_APPLICATION = 'backend.asgi.application'
+
+# Serve /api/contact/send/ pela view assíncrona (use com um servidor ASGI)
+CONTACT_ASYNC_VIEWS = config('CONTACT_ASYNC_VIEWS', default=False, cast=bool)
 
 # DATABASE
 if DEBUG:
@@ -88,6 +100,27 @@ else:
             }
         }
 
+# Pool de conexões por processo (contact/db/pool.py) no lugar do CONN_MAX_AGE:
+# no máximo DATABASE_POOL_MAX_SIZE conexões por worker, com verificação das
+# conexões ociosas e tempo de vida máximo
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'contact.db.postgresql',
+    'django.db.backends.sqlite3': 'contact.db.sqlite3',
+}
+if config('DATABASE_POOL', default=False, cast=bool) and DATABASES['default']['ENGINE'] in POOLED_ENGINES:
+    DATABASES['default'].update(
+        ENGINE=POOLED_ENGINES[DATABASES['default']['ENGINE']],
+        CONN_MAX_AGE=0,
+        POOL={
+            'min_size': config('DATABASE_POOL_MIN_SIZE', default=1, cast=int),
+            'max_size': config('DATABASE_POOL_MAX_SIZE', default=4, cast=int),
+            'max_lifetime': config('DATABASE_POOL_MAX_LIFETIME', default=1800, cast=float),
+            'max_idle': config('DATABASE_POOL_MAX_IDLE', default=300, cast=float),
+            'timeout': config('DATABASE_POOL_TIMEOUT', default=10, cast=float),
+            'check_interval': config('DATABASE_POOL_CHECK_INTERVAL', default=30, cast=float),
+        },
+    )
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -107,17 +140,37 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+        'rest_framework.authentication.BasicAuthentication',
+        'rest_framework.authentication.TokenAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
+        'contact.throttling.SharedAnonRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '10/hour',
     }
 }
 
+# Estado dos throttles, compartilhado entre os workers: Redis se configurado,
+# senão um arquivo SQLite local
+THROTTLE_REDIS_URL = config('THROTTLE_REDIS_URL', default='')
+THROTTLE_SQLITE_PATH = config('THROTTLE_SQLITE_PATH', default=str(BASE_DIR / 'throttle.sqlite3'))
+
+# Proxies (CIDRs) cujo X-Forwarded-For é confiável; vazio mantém a leitura
+# antiga da primeira entrada do cabeçalho
+TRUSTED_PROXIES = config('TRUSTED_PROXIES', default='', cast=Csv())
+
+# Arquivos de faixas CIDR bloqueadas/liberadas em /api/contact/send/
+# (contact/ipfilter.py), conferidos a cada CONTACT_IP_FILTER_RELOAD_SECONDS
+CONTACT_IP_BLOCKLIST = config('CONTACT_IP_BLOCKLIST', default='')
+CONTACT_IP_ALLOWLIST = config('CONTACT_IP_ALLOWLIST', default='')
+CONTACT_IP_FILTER_RELOAD_SECONDS = config('CONTACT_IP_FILTER_RELOAD_SECONDS', default=5, cast=float)
+
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 CORS_ALLOW_METHODS = [
@@ -140,6 +193,47 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
 ]
 
+# Importação em lote (/api/contact/bulk/ e manage.py import_contacts)
+CONTACT_BULK_CHUNK_SIZE = config('CONTACT_BULK_CHUNK_SIZE', default=500, cast=int)
+
+# Mensagens duplicadas: 'flag' (grava e marca duplicate_of), 'absorb' (responde
+# sucesso sem gravar), 'reject' (409) ou 'off'. O remetente não entra na
+# comparação: 'absorb'/'reject' também descartam textos iguais de pessoas diferentes
+CONTACT_DEDUP_ACTION = config('CONTACT_DEDUP_ACTION', default='flag')
+CONTACT_DEDUP_WINDOW_SECONDS = config('CONTACT_DEDUP_WINDOW_SECONDS', default=7 * 24 * 3600, cast=int)
+CONTACT_DEDUP_SIMILARITY = config('CONTACT_DEDUP_SIMILARITY', default=0.7, cast=float)
+CONTACT_DEDUP_INDEX_SIZE = config('CONTACT_DEDUP_INDEX_SIZE', default=5000, cast=int)
+
+# Exportação (manage.py export_contacts e ação do admin): linhas por leitura do cursor
+CONTACT_EXPORT_CHUNK_SIZE = config('CONTACT_EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# Retenção: mensagens mais antigas que isso vão para arquivos JSONL.gz (manage.py archive_contacts)
+CONTACT_RETENTION_DAYS = config('CONTACT_RETENTION_DAYS', default=365, cast=int)
+CONTACT_ARCHIVE_DIR = config('CONTACT_ARCHIVE_DIR', default=str(BASE_DIR / 'archive'))
+CONTACT_ARCHIVE_BATCH_SIZE = config('CONTACT_ARCHIVE_BATCH_SIZE', default=500, cast=int)
+
+# Gravação adiada (contact/wal.py): /send/ responde depois de gravar a
+# mensagem num log local; uma thread grava no banco em lotes. Até o lote,
+# a mensagem só é vista como duplicata (exata) pelo worker que a aceitou
+CONTACT_WRITE_BEHIND = config('CONTACT_WRITE_BEHIND', default=False, cast=bool)
+CONTACT_WAL_DIR = config('CONTACT_WAL_DIR', default=str(BASE_DIR / 'wal'))
+# Sem fsync a resposta sai antes de o log chegar ao disco: uma queda do
+# servidor (não só do processo) pode perder as últimas mensagens
+CONTACT_WAL_FSYNC = config('CONTACT_WAL_FSYNC', default=True, cast=bool)
+CONTACT_WAL_FLUSH_SECONDS = config('CONTACT_WAL_FLUSH_SECONDS', default=0.05, cast=float)
+CONTACT_WAL_BATCH_SIZE = config('CONTACT_WAL_BATCH_SIZE', default=500, cast=int)
+CONTACT_WAL_SEGMENT_BYTES = config('CONTACT_WAL_SEGMENT_BYTES', default=4 * 1024 * 1024, cast=int)
+
+# Tamanho padrão da página de /api/contact/messages/ (máximo 200)
+CONTACT_API_PAGE_SIZE = config('CONTACT_API_PAGE_SIZE', default=50, cast=int)
+
+# Cache do resumo da caixa de entrada (/api/contact/summary/), em segundos
+CONTACT_INBOX_CACHE_SECONDS = config('CONTACT_INBOX_CACHE_SECONDS', default=5, cast=int)
+
+# Admin: acima deste número de linhas a listagem usa a contagem estimada pelo banco
+CONTACT_ADMIN_COUNT_ESTIMATE_THRESHOLD = config('CONTACT_ADMIN_COUNT_ESTIMATE_THRESHOLD', default=10000, cast=int)
+CONTACT_ADMIN_COUNT_CACHE_SECONDS = config('CONTACT_ADMIN_COUNT_CACHE_SECONDS', default=30, cast=int)
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST')
@@ -152,8 +246,44 @@ CONTACT_EMAIL = config('CONTACT_EMAIL')
 
 # SendGrid Configuration
 SENDGRID_API_KEY = config('SENDGRID_API_KEY', default='')
+SENDGRID_API_HOST = config('SENDGRID_API_HOST', default='https://api.sendgrid.com')
+SENDGRID_POOL_SIZE = config('SENDGRID_POOL_SIZE', default=4, cast=int)
+SENDGRID_TIMEOUT = config('SENDGRID_TIMEOUT', default=10, cast=float)
+
+# Email Outbox (fila persistente de notificações)
+EMAIL_OUTBOX_INPROCESS = config('EMAIL_OUTBOX_INPROCESS', default=True, cast=bool)
+EMAIL_OUTBOX_WORKERS = config('EMAIL_OUTBOX_WORKERS', default=2, cast=int)
+EMAIL_OUTBOX_BATCH_SIZE = config('EMAIL_OUTBOX_BATCH_SIZE', default=10, cast=int)
+EMAIL_OUTBOX_MAX_ATTEMPTS = config('EMAIL_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+EMAIL_OUTBOX_BACKOFF_SECONDS = config('EMAIL_OUTBOX_BACKOFF_SECONDS', default=30, cast=int)
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = config('EMAIL_OUTBOX_BACKOFF_MAX_SECONDS', default=3600, cast=int)
+EMAIL_OUTBOX_LEASE_SECONDS = config('EMAIL_OUTBOX_LEASE_SECONDS', default=300, cast=int)
+EMAIL_OUTBOX_POLL_SECONDS = config('EMAIL_OUTBOX_POLL_SECONDS', default=30, cast=int)
+
+# Modo de entrega: 'single' (um email por mensagem) ou 'digest' (agrupa mensagens)
+EMAIL_DELIVERY_MODE = config('EMAIL_DELIVERY_MODE', default='single')
+EMAIL_DIGEST_WINDOW_SECONDS = config('EMAIL_DIGEST_WINDOW_SECONDS', default=300, cast=int)
+EMAIL_DIGEST_MAX_MESSAGES = config('EMAIL_DIGEST_MAX_MESSAGES', default=50, cast=int)
+
+# Verificações de prontidão (/api/contact/ready/)
+HEALTH_CACHE_SECONDS = config('HEALTH_CACHE_SECONDS', default=10, cast=int)
+HEALTH_MAX_STALE_SECONDS = config('HEALTH_MAX_STALE_SECONDS', default=60, cast=int)
+HEALTH_PROBE_TIMEOUT = config('HEALTH_PROBE_TIMEOUT', default=2, cast=float)
+HEALTH_OUTBOX_MAX_PENDING = config('HEALTH_OUTBOX_MAX_PENDING', default=100, cast=int)
+HEALTH_OUTBOX_MAX_AGE_SECONDS = config('HEALTH_OUTBOX_MAX_AGE_SECONDS', default=900, cast=int)
+
+# Métricas do Prometheus em /metrics (Authorization: Bearer <token>; sem token, só com DEBUG)
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
 
 # Logging Configuration
+# 'text' (StreamHandler síncrono) ou 'json': registros estruturados escritos
+# por uma thread própria a partir de uma fila (contact/logs.py), com id por
+# requisição e linha de acesso do RequestLogMiddleware
+LOG_FORMAT = config('LOG_FORMAT', default='text')
+# Capacidade da fila; acima de 80% só LOG_SAMPLE_RATE dos INFO/DEBUG entra
+LOG_QUEUE_SIZE = config('LOG_QUEUE_SIZE', default=10000, cast=int)
+LOG_SAMPLE_RATE = config('LOG_SAMPLE_RATE', default=0.1, cast=float)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -162,11 +292,19 @@ LOGGING = {
             'format': '{levelname} {asctime} {module} {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'contact.logs.JSONFormatter',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
             'formatter': 'verbose',
+        } if LOG_FORMAT != 'json' else {
+            'class': 'contact.logs.NonBlockingQueueHandler',
+            'formatter': 'json',
+            'capacity': LOG_QUEUE_SIZE,
+            'sample_rate': LOG_SAMPLE_RATE,
         },
     },
     'root': {
@@ -1,13 +1,32 @@
 from django.contrib import admin
-from .models import ContactMessage
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .models import ContactMessage, EmailOutbox, HourlyStats
+from . import exporter, inbox, outbox, search, stats
+from .paginator import EstimatedCountPaginator
+
+class SearchRankChangeList(ChangeList):
+    """Ordena os resultados da busca textual por relevância, salvo ordenação explícita"""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        if self.query and ORDER_VAR not in self.params and search.available():
+            queryset = queryset.order_by('-search_rank', '-pk')
+        return queryset
+
 
 @admin.register(ContactMessage)
 class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ['name', 'email', 'subject', 'created_at', 'is_read', 'ip_address']
-    list_filter = ['is_read', 'created_at']
+    list_filter = ['is_read', ('duplicate_of', admin.EmptyFieldListFilter), 'created_at']
     search_fields = ['name', 'email', 'subject', 'message']
-    readonly_fields = ['created_at', 'ip_address']
+    readonly_fields = ['created_at', 'ip_address', 'duplicate_of']
     date_hierarchy = 'created_at'
+    # Contagem estimada em tabelas grandes e sem o COUNT(*) da tabela inteira
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     
     fieldsets = (
         ('Informações do Remetente', {
@@ -17,16 +36,119 @@ class ContactMessageAdmin(admin.ModelAdmin):
             'fields': ('subject', 'message')
         }),
         ('Status', {
-            'fields': ('is_read', 'created_at')
+            'fields': ('is_read', 'created_at', 'duplicate_of')
         }),
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Busca textual indexada (tsvector/FTS5) quando disponível no banco
+        if search_term and search.available():
+            return search.search(queryset, search_term), False
+        return super().get_search_results(request, queryset, search_term)
+
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
+    def save_model(self, request, obj, form, change):
+        # Mantém o resumo da caixa de entrada (contact.inbox) em dia
+        with transaction.atomic():
+            super().save_model(request, obj, form, change)
+            if not change:
+                inbox.record_created([obj])
+            elif 'is_read' in form.changed_data:
+                inbox.record_read_change([obj.created_at], obj.is_read)
+            elif form.changed_data:
+                inbox.touch()
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            stats.record_deleted([(obj.created_at, obj.is_read)])
+            super().delete_model(request, obj)
+        inbox.rebuild()
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            stats.record_deleted(list(queryset.values_list('created_at', 'is_read')))
+            super().delete_queryset(request, queryset)
+        inbox.rebuild()
+
     def mark_as_read(self, request, queryset):
-        queryset.update(is_read=True)
+        inbox.mark(queryset, True)
     mark_as_read.short_description = 'Marcar como lida'
 
     def mark_as_unread(self, request, queryset):
-        queryset.update(is_read=False)
+        inbox.mark(queryset, False)
     mark_as_unread.short_description = 'Marcar como não lida'
 
-    actions = [mark_as_read, mark_as_unread]
+    def _export(self, queryset, fmt, compress):
+        response = StreamingHttpResponse(
+            exporter.export_stream(exporter.filter_messages(queryset), fmt, compress),
+            content_type=exporter.content_type(fmt, compress),
+        )
+        response['Content-Disposition'] = f'attachment; filename="{exporter.filename(fmt, compress)}"'
+        return response
+
+    def export_csv(self, request, queryset):
+        return self._export(queryset, 'csv', False)
+    export_csv.short_description = 'Exportar selecionadas (CSV)'
+
+    def export_jsonl_gzip(self, request, queryset):
+        return self._export(queryset, 'jsonl', True)
+    export_jsonl_gzip.short_description = 'Exportar selecionadas (JSONL compactado)'
+
+    actions = [mark_as_read, mark_as_unread, 'export_csv', 'export_jsonl_gzip']
+
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['message', 'status', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['status']
+    list_select_related = ['message']
+    readonly_fields = [f.name for f in EmailOutbox._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def requeue(self, request, queryset):
+        queryset.exclude(status=EmailOutbox.Status.SENT).update(
+            status=EmailOutbox.Status.PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+            locked_by='',
+            locked_until=None,
+        )
+        outbox.wake()
+    requeue.short_description = 'Reenviar notificações selecionadas'
+
+    actions = [requeue]
+
+
+@admin.register(HourlyStats)
+class HourlyStatsAdmin(admin.ModelAdmin):
+    """Estatísticas por hora e resumo dos últimos 30 dias, lidos só da tabela agregada"""
+
+    list_display = ['hour', 'total', 'unread', 'unread_ratio']
+    date_hierarchy = 'hour'
+    change_list_template = 'admin/contact/hourlystats/change_list.html'
+
+    def unread_ratio(self, obj):
+        return f'{obj.unread / obj.total:.0%}' if obj.total else '-'
+    unread_ratio.short_description = 'Não lidas (%)'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        since = stats.default_since('day')
+        extra_context = {
+            **(extra_context or {}),
+            'daily': stats.daily(since),
+            'totals': stats.totals(since),
+        }
+        return super().changelist_view(request, extra_context)
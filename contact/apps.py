@@ -3,3 +3,9 @@ from django.apps import AppConfig
 
 class ContactConfig(AppConfig):
     name = 'contact'
+
+    def ready(self):
+        from . import emails
+
+        # Compila os templates de email uma vez, antes da primeira mensagem
+        emails.load_templates()
@@ -0,0 +1,207 @@
+"""
+Retenção de mensagens: arquivamento em disco e consulta aos arquivos.
+
+Mensagens mais antigas que CONTACT_RETENTION_DAYS são gravadas em JSONL
+comprimido e apagadas da tabela em lotes de CONTACT_ARCHIVE_BATCH_SIZE,
+cada um na sua transação curta. Os arquivos ficam particionados pelo mês
+de criação (hora local):
+
+    CONTACT_ARCHIVE_DIR/2024-03/1200-1699.jsonl.gz
+
+Um arquivo por lote e partição, nomeado pelo menor e maior id. Cada
+arquivo é escrito num temporário, sincronizado e renomeado antes do DELETE,
+então uma interrupção no meio nunca perde mensagens: no pior caso o lote é
+arquivado de novo na próxima execução, e a consulta descarta ids repetidos.
+"""
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import inbox
+from .exporter import FIELDS, jsonl_lines
+from .models import ContactMessage, EmailOutbox
+
+SUFFIX = '.jsonl.gz'
+
+
+def archive_dir():
+    return Path(settings.CONTACT_ARCHIVE_DIR)
+
+
+def cutoff_for(days=None):
+    """Instante a partir do qual as mensagens são mantidas na tabela"""
+    if days is None:
+        days = settings.CONTACT_RETENTION_DAYS
+    return timezone.now() - timedelta(days=days)
+
+
+def expired_messages(cutoff):
+    """Mensagens anteriores a `cutoff`, exceto as com notificação ainda na fila"""
+    return (
+        ContactMessage.objects
+        .filter(created_at__lt=cutoff)
+        .exclude(notifications__status__in=[EmailOutbox.Status.PENDING, EmailOutbox.Status.SENDING])
+        .order_by('created_at', 'id')
+    )
+
+
+def partition_of(moment, tz=None):
+    local = moment.astimezone(tz or timezone.get_current_timezone())
+    return f'{local.year:04d}-{local.month:02d}'
+
+
+def partition_range(name):
+    """Intervalo [início, fim) coberto pela partição 'AAAA-MM'"""
+    year, month = map(int, name.split('-'))
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return timezone.make_aware(start), timezone.make_aware(end)
+
+
+def _write(directory, rows):
+    directory.mkdir(parents=True, exist_ok=True)
+    ids = [row[0] for row in rows]
+    path = directory / f'{min(ids)}-{max(ids)}{SUFFIX}'
+    temporary = directory / f'.{path.name}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6, mtime=0) as stream:
+            stream.write(''.join(jsonl_lines(rows)).encode('utf-8'))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(temporary, path)
+    if hasattr(os, 'O_DIRECTORY'):
+        # Garante que o rename chegou ao disco antes do DELETE
+        fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+    return path
+
+
+def archive_batch(cutoff, batch_size=None):
+    """
+    Arquiva e apaga até `batch_size` das mensagens mais antigas. Retorna
+    (mensagens arquivadas, arquivos escritos); (0, []) quando não há mais.
+    """
+    batch_size = batch_size or settings.CONTACT_ARCHIVE_BATCH_SIZE
+    rows = list(expired_messages(cutoff).values_list(*FIELDS)[:batch_size])
+    if not rows:
+        return 0, []
+
+    created_at = FIELDS.index('created_at')
+    tz = timezone.get_current_timezone()
+    groups = {}
+    for row in rows:
+        groups.setdefault(partition_of(row[created_at], tz), []).append(row)
+    root = archive_dir()
+    paths = [_write(root / name, group) for name, group in groups.items()]
+
+    ids = [row[0] for row in rows]
+    placeholders = ', '.join(['%s'] * len(ids))
+    # DELETE direto: o Collector do ORM carregaria cada instância para o CASCADE
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {EmailOutbox._meta.db_table} WHERE message_id IN ({placeholders})', ids)
+        # O SET_NULL de duplicate_of é feito pelo ORM, que o DELETE direto não passa
+        cursor.execute(
+            f'UPDATE {ContactMessage._meta.db_table} SET duplicate_of_id = NULL '
+            f'WHERE duplicate_of_id IN ({placeholders})',
+            ids,
+        )
+        cursor.execute(f'DELETE FROM {ContactMessage._meta.db_table} WHERE id IN ({placeholders})', ids)
+        is_read = FIELDS.index('is_read')
+        inbox.record_deleted([(row[created_at], row[is_read]) for row in rows])
+    return len(rows), paths
+
+
+def archive_messages(cutoff=None, batch_size=None, pause=0):
+    """Arquiva tudo que passou da retenção, lote a lote. Retorna (mensagens, arquivos)"""
+    if cutoff is None:
+        cutoff = cutoff_for()
+    total = files = 0
+    while True:
+        count, paths = archive_batch(cutoff, batch_size)
+        if not count:
+            return total, files
+        total += count
+        files += len(paths)
+        if pause:
+            # Folga para as escritas da aplicação entre um lote e outro
+            time.sleep(pause)
+
+
+def partitions(since=None, until=None):
+    """Partições existentes que podem conter mensagens em [since, until)"""
+    root = archive_dir()
+    if not root.is_dir():
+        return []
+    names = []
+    for entry in sorted(root.iterdir()):
+        if not entry.is_dir():
+            continue
+        try:
+            start, end = partition_range(entry.name)
+        except ValueError:
+            continue
+        if (since is None or end > since) and (until is None or start < until):
+            names.append(entry.name)
+    return names
+
+
+def _files(name, message_id=None):
+    for path in sorted((archive_dir() / name).glob(f'*{SUFFIX}')):
+        if message_id is not None:
+            first, _, last = path.name[:-len(SUFFIX)].partition('-')
+            if not int(first) <= message_id <= int(last):
+                continue
+        yield path
+
+
+def _needle(value):
+    # Forma do texto dentro da linha JSON (aspas e quebras de linha escapadas)
+    return json.dumps(value, ensure_ascii=False)[1:-1].lower()
+
+
+def lookup(email=None, text=None, message_id=None, since=None, until=None):
+    """
+    Procura mensagens arquivadas sem restaurá-las, lendo só as partições do
+    intervalo pedido. As linhas são descartadas pelo texto cru antes de
+    qualquer json.loads, então a busca custa pouco mais que descomprimir.
+    """
+    email = email.lower() if email else None
+    text = text.lower() if text else None
+    prefix = f'{{"id":{message_id},' if message_id is not None else None
+    needles = [_needle(value) for value in (email, text) if value]
+    seen = set()
+
+    for name in partitions(since, until):
+        for path in _files(name, message_id):
+            with gzip.open(path, 'rt', encoding='utf-8') as stream:
+                for line in stream:
+                    if prefix is not None and not line.startswith(prefix):
+                        continue
+                    if needles:
+                        lowered = line.lower()
+                        if not all(needle in lowered for needle in needles):
+                            continue
+                    record = json.loads(line)
+                    if email and record['email'].lower() != email:
+                        continue
+                    if text and not any(
+                        text in (record[field] or '').lower() for field in ('name', 'subject', 'message')
+                    ):
+                        continue
+                    created_at = datetime.fromisoformat(record['created_at'])
+                    if (since and created_at < since) or (until and created_at >= until):
+                        continue
+                    if record['id'] in seen:
+                        continue
+                    seen.add(record['id'])
+                    yield record
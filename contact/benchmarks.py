@@ -0,0 +1,282 @@
+"""
+Utilitários compartilhados pelos comandos bench_* (medição e estatísticas).
+"""
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import timedelta
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from django.db import connections
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+
+def percentile(sorted_values, pct):
+    """Percentil por interpolação linear sobre uma lista já ordenada"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * pct / 100
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def summarize(samples):
+    """Resumo de latências (em segundos) com valores em milissegundos"""
+    values = sorted(samples)
+    total = sum(values)
+    return {
+        'count': len(values),
+        'mean_ms': total / len(values) * 1000 if values else 0.0,
+        'p50_ms': percentile(values, 50) * 1000,
+        'p95_ms': percentile(values, 95) * 1000,
+        'p99_ms': percentile(values, 99) * 1000,
+        'max_ms': values[-1] * 1000 if values else 0.0,
+    }
+
+
+def time_calls(fn, iterations):
+    """Executa `fn` `iterations` vezes e retorna a duração de cada chamada"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def run_concurrent(fn, total, concurrency):
+    """
+    Executa `fn(i)` para i em range(total) em `concurrency` threads e retorna
+    as latências resumidas, o throughput (ops/s) e as exceções por tipo.
+    """
+    samples = []
+    errors = Counter()
+
+    def timed(i):
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            errors[f'{type(e).__name__}: {e}'[:120]] += 1
+            return
+        samples.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, range(total)))
+    elapsed = time.perf_counter() - started
+    return dict(
+        summarize(samples),
+        ops_per_sec=len(samples) / elapsed,
+        errors=sum(errors.values()),
+        error_types=dict(errors),
+    )
+
+
+def measure_allocations(fn, iterations):
+    """
+    Pico médio de memória alocada durante uma chamada de `fn` (via
+    tracemalloc), incluindo objetos temporários liberados antes do retorno.
+    """
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    finally:
+        tracemalloc.stop()
+    return {'peak_bytes_per_call': sum(peaks) / len(peaks) if peaks else 0}
+
+
+@contextmanager
+def isolated_database(alias='default'):
+    """
+    Cria um banco descartável (o mesmo usado pelos testes, já migrado) para
+    benchmarks que gravam dados, e o destrói ao final.
+    """
+    connection = connections[alias]
+    old_name = connection.settings_dict['NAME']
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+WORDS = (
+    'projeto site orçamento portfolio contato freelance proposta sistema api django react '
+    'design prazo reunião parceria vaga desenvolvedor backend frontend aplicativo consultoria'
+).split()
+
+
+def fake_message_fields(i, now=None, days=365, unread_ratio=0.1):
+    """Campos sintéticos de uma ContactMessage (sem gravar)"""
+    now = now or timezone.now()
+    return {
+        'name': f'Remetente {i}',
+        'email': f'remetente{i}@example.com',
+        'subject': ' '.join(random.choices(WORDS, k=4)),
+        'message': ' '.join(random.choices(WORDS, k=random.randint(20, 120))),
+        'is_read': random.random() >= unread_ratio,
+        'ip_address': f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+        'created_at': now - timedelta(seconds=random.randint(0, days * 86400)),
+    }
+
+
+def seed_messages(count, batch_size=5000, days=365, unread_ratio=0.1):
+    """
+    Grava `count` mensagens sintéticas espalhadas pelos últimos `days` dias.
+
+    `created_at` é auto_now_add, então a data é ajustada com um UPDATE por
+    lote após o bulk_create.
+    """
+    from .models import ContactMessage
+
+    now = timezone.now()
+    for start in range(0, count, batch_size):
+        fields = [
+            fake_message_fields(i, now, days, unread_ratio)
+            for i in range(start, min(start + batch_size, count))
+        ]
+        created = ContactMessage.objects.bulk_create(
+            [ContactMessage(**{k: v for k, v in f.items() if k != 'created_at'}) for f in fields]
+        )
+        for message, f in zip(created, fields):
+            message.created_at = f['created_at']
+        ContactMessage.objects.bulk_update(created, ['created_at'], batch_size=1000)
+
+
+async def _http_request(reader, writer, request):
+    writer.write(request)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def _http_load(url, total, concurrency, method, body_factory, headers_factory):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    samples = []
+    statuses = Counter()
+    counter = iter(range(total))
+
+    async def worker():
+        connection = None
+        for i in counter:
+            body = body_factory(i) if body_factory else b''
+            extra = ''.join(f'{k}: {v}\r\n' for k, v in (headers_factory(i) if headers_factory else {}).items())
+            request = (
+                f'{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n{extra}\r\n'
+            ).encode('latin-1') + body
+            start = time.perf_counter()
+            if connection is None:
+                connection = await asyncio.open_connection(host, port)
+            try:
+                status, close = await _http_request(*connection, request)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # Conexão keep-alive fechada pelo servidor: reconecta e repete
+                connection[1].close()
+                connection = await asyncio.open_connection(host, port)
+                status, close = await _http_request(*connection, request)
+            samples.append(time.perf_counter() - start)
+            statuses[status] += 1
+            if close:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return dict(summarize(samples), rps=total / elapsed, statuses=dict(statuses))
+
+
+def http_load(url, total, concurrency, method='GET', body_factory=None, headers_factory=None):
+    """
+    Gerador de carga HTTP/1.1 mínimo (asyncio, keep-alive quando o servidor
+    permite). `body_factory(i)`/`headers_factory(i)` geram o corpo e
+    cabeçalhos extras da i-ésima requisição. Retorna latências, req/s e a
+    contagem por status.
+    """
+    return asyncio.run(_http_load(url, total, concurrency, method, body_factory, headers_factory))
+
+
+class _FakeSendGridHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.requests += 1
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def do_GET(self):
+        self.do_POST()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeSendGridServer:
+    """
+    Servidor HTTP local que imita a API do SendGrid (responde 202 com
+    keep-alive). Uso: `with FakeSendGridServer() as server: server.url`.
+    """
+
+    def __init__(self, status=202, latency=0.0):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _FakeSendGridHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.status = status
+        self.httpd.latency = latency
+        self.httpd.requests = 0
+        self.connections = 0
+        original = self.httpd.process_request
+
+        def process_request(request, client_address):
+            self.connections += 1
+            original(request, client_address)
+
+        self.httpd.process_request = process_request
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.httpd.server_port}'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def __enter__(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,252 @@
+"""
+Pool de conexões do banco por processo, usado pelos backends em contact.db.
+
+Com DATABASE_POOL ativo o Django continua "fechando" a conexão ao fim de
+cada requisição (CONN_MAX_AGE=0), mas o fechamento devolve a conexão ao pool
+em vez de encerrá-la. Cada thread (gthread) ou requisição ASGI pega uma
+conexão ociosa, e o processo nunca passa de `max_size` conexões abertas;
+acima disso a requisição espera até `timeout` segundos.
+
+- max_lifetime: conexões mais velhas que isso (±10%) são fechadas ao voltar
+  ao pool, para o banco e os balanceadores não acumularem sessões eternas.
+- max_idle: conexões ociosas além de `min_size` são fechadas depois disso.
+- check_interval: uma conexão parada há mais que isso passa por um SELECT 1
+  antes de ser entregue; se falhar, é descartada e outra é usada.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class PooledConnection:
+    """Conexão do driver com os instantes (monotônicos) de expiração e último uso"""
+
+    __slots__ = ('connection', 'expires_at', 'last_used')
+
+    def __init__(self, connection, expires_at):
+        self.connection = connection
+        self.expires_at = expires_at
+        self.last_used = time.monotonic()
+
+
+class ConnectionPool:
+    """
+    Pool thread-safe de conexões DB-API. As conexões são abertas sob demanda
+    por `factory` (passada a cada `acquire`) e a ociosa usada mais
+    recentemente é reaproveitada primeiro.
+    """
+
+    def __init__(self, min_size=1, max_size=4, max_lifetime=1800, max_idle=300, timeout=10, check_interval=30):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self._idle = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._counters = {'opened': 0, 'reused': 0, 'closed': 0, 'failed_checks': 0, 'waits': 0, 'timeouts': 0}
+
+    def stats(self):
+        """Contadores de conexões e o estado atual (abertas e ociosas)"""
+        with self._condition:
+            return dict(self._counters, size=self._size, idle=len(self._idle))
+
+    def _close(self, entries):
+        for entry in entries:
+            try:
+                entry.connection.close()
+            except Exception:
+                pass
+        if entries:
+            with self._condition:
+                self._counters['closed'] += len(entries)
+
+    def _forget(self, count):
+        # Chamado com o lock: libera vagas para quem está esperando
+        self._size -= count
+        self._condition.notify(count)
+
+    def _check(self, entry):
+        try:
+            cursor = entry.connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+                cursor.fetchone()
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        return True
+
+    def acquire(self, factory):
+        """
+        Uma conexão ociosa saudável ou, havendo vaga, uma nova aberta por
+        `factory()`. Levanta PoolTimeout se o pool continuar cheio por
+        `timeout` segundos.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            entry = None
+            expired = []
+            try:
+                with self._condition:
+                    while True:
+                        now = time.monotonic()
+                        while self._idle and entry is None:
+                            candidate = self._idle.pop()
+                            if now >= candidate.expires_at:
+                                expired.append(candidate)
+                            else:
+                                entry = candidate
+                        if expired:
+                            self._forget(len(expired))
+                        if entry is not None:
+                            break
+                        if self._size < self.max_size:
+                            # Reserva a vaga antes de abrir a conexão fora do lock
+                            self._size += 1
+                            break
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            self._counters['timeouts'] += 1
+                            raise PoolTimeout(
+                                f'Nenhuma conexão livre no pool em {self.timeout}s ({self.max_size} em uso)'
+                            )
+                        self._counters['waits'] += 1
+                        self._condition.wait(remaining)
+            finally:
+                self._close(expired)
+
+            if entry is None:
+                try:
+                    connection = factory()
+                except BaseException:
+                    with self._condition:
+                        self._forget(1)
+                    raise
+                jitter = random.uniform(0.9, 1.1)
+                with self._condition:
+                    self._counters['opened'] += 1
+                return PooledConnection(connection, time.monotonic() + self.max_lifetime * jitter)
+
+            if time.monotonic() - entry.last_used >= self.check_interval and not self._check(entry):
+                with self._condition:
+                    self._counters['failed_checks'] += 1
+                    self._forget(1)
+                self._close([entry])
+                continue
+            with self._condition:
+                self._counters['reused'] += 1
+            return entry
+
+    def release(self, entry, broken=False):
+        """Devolve a conexão ao pool, ou a fecha se quebrada ou expirada"""
+        now = time.monotonic()
+        trimmed = []
+        with self._condition:
+            if broken or now >= entry.expires_at:
+                trimmed.append(entry)
+                self._forget(1)
+            else:
+                entry.last_used = now
+                self._idle.append(entry)
+                # As menos usadas ficam no início da fila
+                while len(self._idle) > self.min_size and now - self._idle[0].last_used >= self.max_idle:
+                    trimmed.append(self._idle.popleft())
+                    self._size -= 1
+                self._condition.notify()
+        self._close(trimmed)
+
+    def close(self):
+        """Fecha as conexões ociosas (as em uso fecham ao serem devolvidas)"""
+        with self._condition:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._forget(len(idle))
+            self.max_lifetime = 0
+        self._close(idle)
+
+
+_pools = {}
+_pools_pid = None
+# Pools herdados pelo fork: mantidos vivos para o coletor de lixo do filho
+# não encerrar conexões que pertencem ao processo pai
+_inherited = []
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """Pool do processo para o banco `alias` (recriado após fork)"""
+    global _pools_pid
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            _inherited.extend(_pools.values())
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(**options)
+        return pool
+
+
+def close_pools():
+    """Fecha as conexões ociosas de todos os pools do processo"""
+    with _pools_lock:
+        pools = list(_pools.values()) if _pools_pid == os.getpid() else []
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+@receiver(setting_changed)
+def _reset_pools(setting, **kwargs):
+    if setting == 'DATABASES':
+        close_pools()
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Mixin para o DatabaseWrapper de um backend do Django: abre conexões pelo
+    pool e as devolve no close(). As opções vêm da chave POOL do banco em
+    DATABASES.
+    """
+
+    _pool_entry = None
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL') or {})
+
+    def get_new_connection(self, conn_params):
+        try:
+            entry = self.pool.acquire(lambda: super(PooledDatabaseWrapperMixin, self).get_new_connection(conn_params))
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+        self._pool_entry = entry
+        return entry.connection
+
+    def _close(self):
+        entry, self._pool_entry = self._pool_entry, None
+        if entry is None:
+            return super()._close()
+        # Fechada no meio de um atomic() ou após erro em uma conexão que não
+        # responde mais: não volta ao pool
+        broken = self.in_atomic_block or (self.errors_occurred and not self.is_usable())
+        if not broken:
+            try:
+                # Sem transação aberta é um no-op nos dois drivers
+                self.connection.rollback()
+            except Exception:
+                broken = True
+        self.pool.release(entry, broken=broken)
@@ -0,0 +1,244 @@
+"""
+Detecção de mensagens duplicadas antes da gravação.
+
+Duas verificações, da mais barata para a mais cara:
+
+1. Hash exato: SHA-256 do assunto + mensagem normalizados (minúsculas, sem
+   acentos, pontuação e espaços colapsados), consultado na coluna indexada
+   `content_hash` dentro da janela CONTACT_DEDUP_WINDOW_SECONDS. Vale para
+   todos os workers, pois está no banco.
+2. Quase duplicata: assinatura MinHash (one permutation hashing, 64
+   buckets) das palavras e bigramas, procurada com LSH (16 bandas de 4)
+   num índice em memória limitado às CONTACT_DEDUP_INDEX_SIZE mensagens
+   mais recentes. O índice é construído do banco quando cada worker do
+   gunicorn inicia (startup.warm_up_worker), ou na primeira verificação
+   fora dele, e recebe as mensagens gravadas pelo próprio processo.
+
+O que fazer com uma duplicata fica em CONTACT_DEDUP_ACTION: 'flag' (padrão)
+grava e notifica normalmente, marcando `duplicate_of`; 'absorb' e 'reject'
+descartam a mensagem. Como o remetente não entra na comparação, duas
+pessoas com o mesmo texto curto ("gostaria de um orçamento") batem: por
+isso nada é descartado sem configuração explícita.
+
+As assinaturas usam hash() do Python e por isso só valem dentro do
+processo; nada além do hash exato é gravado no banco.
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .models import ContactMessage
+
+NUM_BUCKETS = 64
+BANDS = 16
+ROWS = NUM_BUCKETS // BANDS
+MASK = (1 << 64) - 1
+EMPTY = MASK
+# Deslocamento das posições vazias preenchidas por rotação (densificação)
+ROTATION = 1 << 58
+NON_WORD = re.compile(r'[\W_]+', re.UNICODE)
+
+Fingerprint = namedtuple('Fingerprint', ['content_hash', 'signature'])
+Duplicate = namedtuple('Duplicate', ['kind', 'message_id', 'similarity'])
+
+
+def _accent_table():
+    # Tabela de str.translate para tirar acentos dos alfabetos latinos
+    table = {}
+    for code in range(0xC0, 0x250):
+        char = chr(code)
+        base = ''.join(c for c in unicodedata.normalize('NFKD', char) if not unicodedata.combining(c))
+        if base != char:
+            table[code] = base
+    return table
+
+
+ACCENTS = _accent_table()
+
+
+def normalize(text):
+    """Minúsculas, sem acentos e só palavras separadas por um espaço"""
+    return NON_WORD.sub(' ', text.lower().translate(ACCENTS)).strip()
+
+
+def _normalized(subject, message):
+    return f'{normalize(subject)}\n{normalize(message)}'
+
+
+def content_hash(subject, message):
+    """Hash do conteúdo normalizado (ignora remetente, email e IP, que os bots trocam)"""
+    return _digest(_normalized(subject, message))
+
+
+def signature(subject, message):
+    """
+    Assinatura MinHash das palavras e bigramas de palavras (uma passada
+    sobre os shingles). Retorna None para textos sem palavras.
+    """
+    return _minhash(_normalized(subject, message))
+
+
+def _digest(normalized):
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def _minhash(normalized):
+    words = normalized.split()
+    if not words:
+        return None
+    shingles = set(words)
+    shingles.update(f'{a} {b}' for a, b in zip(words, words[1:]))
+    slots = [EMPTY] * NUM_BUCKETS
+    for shingle in shingles:
+        value = hash(shingle) & MASK
+        bucket = value % NUM_BUCKETS
+        value >>= 6
+        if value < slots[bucket]:
+            slots[bucket] = value
+    # Buckets vazios copiam o próximo preenchido, deslocado pela distância
+    for i in range(NUM_BUCKETS):
+        if slots[i] == EMPTY:
+            for distance in range(1, NUM_BUCKETS):
+                value = slots[(i + distance) % NUM_BUCKETS]
+                if value < ROTATION:
+                    slots[i] = value + distance * ROTATION
+                    break
+    return tuple(slots)
+
+
+def similarity(a, b):
+    """Estimativa da similaridade de Jaccard entre duas assinaturas"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_BUCKETS
+
+
+def fingerprint(data):
+    normalized = _normalized(data['subject'], data['message'])
+    return Fingerprint(_digest(normalized), _minhash(normalized))
+
+
+class NearDuplicateIndex:
+    """Índice LSH em memória, limitado às `capacity` entradas mais recentes"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _bands(sig):
+        return [(band, sig[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+    def add(self, message_id, sig, created_at):
+        if sig is None or not self.capacity:
+            return
+        with self._lock:
+            if message_id in self._entries:
+                return
+            self._entries[message_id] = (sig, created_at)
+            for band in self._bands(sig):
+                self._buckets.setdefault(band, set()).add(message_id)
+            while len(self._entries) > self.capacity:
+                self._evict()
+
+    def _evict(self):
+        message_id, (sig, _) = self._entries.popitem(last=False)
+        for band in self._bands(sig):
+            ids = self._buckets.get(band)
+            if ids is not None:
+                ids.discard(message_id)
+                if not ids:
+                    del self._buckets[band]
+
+    def query(self, sig, threshold, since):
+        """Mensagem mais parecida com similaridade >= `threshold` criada após `since`"""
+        if sig is None:
+            return None
+        with self._lock:
+            candidates = set()
+            for band in self._bands(sig):
+                candidates |= self._buckets.get(band, set())
+            best = None
+            for message_id in candidates:
+                other, created_at = self._entries[message_id]
+                if created_at < since:
+                    continue
+                score = similarity(sig, other)
+                if score >= threshold and (best is None or score > best[1]):
+                    best = (message_id, score)
+        return best
+
+
+_index = None
+_index_pid = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Índice do processo, construído do banco na primeira chamada (e após fork)"""
+    global _index, _index_pid
+    with _index_lock:
+        if _index is None or _index_pid != os.getpid():
+            _index = NearDuplicateIndex(settings.CONTACT_DEDUP_INDEX_SIZE)
+            _index_pid = os.getpid()
+            rebuild(_index)
+        return _index
+
+
+def rebuild(index):
+    """Carrega as mensagens mais recentes da janela no índice"""
+    since = timezone.now() - timedelta(seconds=settings.CONTACT_DEDUP_WINDOW_SECONDS)
+    recent = (
+        ContactMessage.objects.filter(created_at__gte=since)
+        .order_by('-created_at', '-id')
+        .values_list('id', 'subject', 'message', 'created_at')[:index.capacity]
+    )
+    # Do mais antigo para o mais novo, para a ordem de descarte ficar correta
+    for message_id, subject, message, created_at in reversed(list(recent)):
+        index.add(message_id, signature(subject, message), created_at)
+
+
+def enabled():
+    return settings.CONTACT_DEDUP_ACTION in ('flag', 'reject', 'absorb')
+
+
+def check(data):
+    """
+    Calcula o Fingerprint de dados já validados e procura uma duplicata
+    recente. Retorna (fingerprint, Duplicate ou None).
+    """
+    fp = fingerprint(data)
+    if not enabled():
+        return fp, None
+    since = timezone.now() - timedelta(seconds=settings.CONTACT_DEDUP_WINDOW_SECONDS)
+    # SQL direto: montar a consulta pelo ORM custava mais que executá-la
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM {ContactMessage._meta.db_table} '
+            'WHERE content_hash = %s AND created_at >= %s ORDER BY created_at DESC LIMIT 1',
+            [fp.content_hash, connection.ops.adapt_datetimefield_value(since)],
+        )
+        exact = cursor.fetchone()
+    if exact is not None:
+        return fp, Duplicate('exact', exact[0], 1.0)
+    match = get_index().query(fp.signature, settings.CONTACT_DEDUP_SIMILARITY, since)
+    if match is not None:
+        return fp, Duplicate('near', *match)
+    return fp, None
+
+
+def remember(message, fp):
+    """Adiciona uma mensagem recém-gravada ao índice do processo"""
+    if enabled():
+        get_index().add(message.id, fp.signature, message.created_at)
@@ -0,0 +1,96 @@
+import html
+import re
+from functools import lru_cache
+from pathlib import Path
+
+from django.utils.safestring import SafeData, mark_safe
+
+TEMPLATE_DIR = Path(__file__).resolve().parent / 'templates' / 'contact' / 'emails'
+PLACEHOLDER = re.compile(r'{{\s*(\w+)\s*}}')
+DATE_FORMAT = '%d/%m/%Y às %H:%M'
+
+
+def escape(value):
+    """Escape HTML, preservando conteúdo já marcado como seguro"""
+    if isinstance(value, SafeData):
+        return value
+    value = str(value)
+    # A maioria dos campos não tem nada a escapar: evita as cópias de html.escape
+    if '&' in value or '<' in value or '>' in value or '"' in value or "'" in value:
+        return html.escape(value)
+    return value
+
+
+class CompiledTemplate:
+    """
+    Template de email pré-compilado.
+
+    O arquivo é lido e dividido uma única vez em trechos estáticos (CSS,
+    cabeçalho, rodapé) e campos `{{ nome }}`; renderizar é só escapar cada
+    campo uma vez e intercalar os valores com os trechos já prontos.
+    """
+
+    def __init__(self, source, autoescape=True):
+        parts = PLACEHOLDER.split(source)
+        self.chunks = parts[0::2]
+        self.fields = parts[1::2]
+        self.autoescape = autoescape
+
+    def render(self, context):
+        if self.autoescape:
+            context = {key: escape(value) for key, value in context.items()}
+        pieces = [None] * (len(self.chunks) + len(self.fields))
+        pieces[0::2] = self.chunks
+        pieces[1::2] = [context[field] for field in self.fields]
+        return ''.join(pieces)
+
+
+@lru_cache(maxsize=None)
+def get_template(name):
+    """Carrega e compila um template de contact/templates/contact/emails (com cache)"""
+    source = (TEMPLATE_DIR / name).read_text(encoding='utf-8')
+    return CompiledTemplate(source, autoescape=name.endswith('.html'))
+
+
+def load_templates():
+    """Pré-compila todos os templates de email (chamado na inicialização)"""
+    for path in TEMPLATE_DIR.iterdir():
+        if path.suffix in ('.html', '.txt'):
+            get_template(path.name)
+
+
+def message_context(message):
+    return {
+        'name': message.name,
+        'email': message.email,
+        'subject': message.subject,
+        'message': message.message,
+        'created_at': message.created_at.strftime(DATE_FORMAT),
+        'ip_address': message.ip_address or '',
+    }
+
+
+def render_notification(message):
+    """Retorna (html, texto) do email de notificação de uma mensagem"""
+    context = message_context(message)
+    return (
+        get_template('notification.html').render(context),
+        get_template('notification.txt').render(context),
+    )
+
+
+def render_digest(messages):
+    """Retorna (html, texto) do email digest com várias mensagens"""
+    html_item = get_template('digest_item.html')
+    text_item = get_template('digest_item.txt')
+    html_items = []
+    text_items = []
+    for message in messages:
+        context = message_context(message)
+        html_items.append(html_item.render(context))
+        text_items.append(text_item.render(context))
+    count = str(len(messages))
+    return (
+        get_template('digest.html').render({'count': count, 'items': mark_safe(''.join(html_items))}),
+        get_template('digest.txt').render({'count': count, 'items': ''.join(text_items)}),
+    )
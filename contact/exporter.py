@@ -0,0 +1,133 @@
+"""
+Exportação de mensagens em CSV ou JSONL, opcionalmente com gzip.
+
+As linhas são lidas com `.iterator(chunk_size=...)` (cursor no servidor no
+PostgreSQL) e convertidas em blocos de bytes sob demanda, então a memória
+fica constante para qualquer tamanho de tabela. Usado pelo comando
+export_contacts e pela ação de exportação do admin.
+"""
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import ContactMessage
+
+FIELDS = ['id', 'name', 'email', 'subject', 'message', 'created_at', 'is_read', 'ip_address']
+CREATED_AT = FIELDS.index('created_at')
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+# Tamanho aproximado de cada bloco de bytes entregue ao stream
+BUFFER_SIZE = 64 * 1024
+
+
+def parse_bound(value, end=False):
+    """
+    Data (AAAA-MM-DD) ou data/hora ISO no fuso atual. Com `end`, uma data
+    sem hora vale até o fim do dia. Levanta ValueError se inválida.
+    """
+    # A data antes: o parse_datetime também aceita 'AAAA-MM-DD' (meia-noite)
+    day = parse_date(value)
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end else day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'Data inválida: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_messages(queryset=None, since=None, until=None, is_read=None):
+    """Aplica o intervalo [since, until) e o filtro is_read, em ordem de criação"""
+    if queryset is None:
+        queryset = ContactMessage.objects.all()
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+    if is_read is not None:
+        queryset = queryset.filter(is_read=is_read)
+    return queryset.order_by('created_at', 'id')
+
+
+class _LineBuffer:
+    """Destino do csv.writer que só acumula o texto escrito"""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, value):
+        self.parts.append(value)
+
+
+def _batched(lines):
+    # Junta linhas em blocos de ~BUFFER_SIZE para não gerar um chunk por linha
+    parts = []
+    size = 0
+    for line in lines:
+        parts.append(line)
+        size += len(line)
+        if size >= BUFFER_SIZE:
+            yield ''.join(parts).encode('utf-8')
+            parts = []
+            size = 0
+    if parts:
+        yield ''.join(parts).encode('utf-8')
+
+
+def _csv_lines(rows):
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for row in rows:
+        row = list(row)
+        row[CREATED_AT] = row[CREATED_AT].isoformat()
+        writer.writerow(row)
+        if len(buffer.parts) >= 256:
+            yield from buffer.parts
+            buffer.parts.clear()
+    yield from buffer.parts
+
+
+def jsonl_lines(rows):
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        record = dict(zip(FIELDS, row))
+        record['created_at'] = record['created_at'].isoformat()
+        yield encoder.encode(record) + '\n'
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset, fmt='csv', compress=False, chunk_size=None):
+    """Iterador de blocos de bytes com as mensagens de `queryset`"""
+    if fmt not in FORMATS:
+        raise ValueError(f'Formato desconhecido: {fmt}')
+    rows = queryset.values_list(*FIELDS).iterator(chunk_size=chunk_size or settings.CONTACT_EXPORT_CHUNK_SIZE)
+    lines = _csv_lines(rows) if fmt == 'csv' else jsonl_lines(rows)
+    chunks = _batched(lines)
+    return _gzip(chunks) if compress else chunks
+
+
+def content_type(fmt, compress=False):
+    return 'application/gzip' if compress else FORMATS[fmt]
+
+
+def filename(fmt, compress=False):
+    stamp = timezone.localtime().strftime('%Y%m%d-%H%M%S')
+    return f'mensagens-{stamp}.{fmt}' + ('.gz' if compress else '')
@@ -0,0 +1,170 @@
+"""
+Verificações de prontidão (readiness) com cache.
+
+Cada processo mantém o último resultado das verificações (banco, fila de
+notificações e alcance do SendGrid). Uma requisição nunca executa as
+verificações: ela lê o resultado em cache e, se ele tiver mais de
+HEALTH_CACHE_SECONDS, dispara uma única atualização em segundo plano. Assim
+o polling do load balancer custa no máximo uma rodada de verificações por
+intervalo, em qualquer frequência.
+
+Se as verificações travarem (ex.: banco sem responder), o resultado fica
+velho; acima de HEALTH_MAX_STALE_SECONDS o processo é reportado como não
+pronto.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import EmailOutbox
+from .services import notifications_enabled
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+DEGRADED = 'degraded'
+ERROR = 'error'
+DISABLED = 'disabled'
+
+# Verificações cuja falha tira o processo do load balancer
+CRITICAL = ('database',)
+
+Snapshot = namedtuple('Snapshot', ['checks', 'checked_at', 'monotonic'])
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return {'status': OK}
+
+
+def check_outbox():
+    backlog = EmailOutbox.objects.filter(
+        status__in=[EmailOutbox.Status.PENDING, EmailOutbox.Status.SENDING]
+    ).aggregate(pending=Count('id'), oldest=Min('created_at'))
+    dead = EmailOutbox.objects.filter(status=EmailOutbox.Status.DEAD).count()
+    oldest_age = (timezone.now() - backlog['oldest']).total_seconds() if backlog['oldest'] else 0
+    degraded = (
+        backlog['pending'] > settings.HEALTH_OUTBOX_MAX_PENDING
+        or oldest_age > settings.HEALTH_OUTBOX_MAX_AGE_SECONDS
+    )
+    return {
+        'status': DEGRADED if degraded else OK,
+        'pending': backlog['pending'],
+        'oldest_pending_seconds': round(oldest_age),
+        'dead': dead,
+    }
+
+
+def check_sendgrid():
+    """Abre (e fecha) uma conexão TCP com a API, sem gastar cota de envio"""
+    if not notifications_enabled():
+        return {'status': DISABLED}
+    url = urlsplit(settings.SENDGRID_API_HOST)
+    port = url.port or (443 if url.scheme == 'https' else 80)
+    with socket.create_connection((url.hostname, port), timeout=settings.HEALTH_PROBE_TIMEOUT):
+        pass
+    return {'status': OK}
+
+
+PROBES = {
+    'database': check_database,
+    'outbox': check_outbox,
+    'sendgrid': check_sendgrid,
+}
+
+
+def run_probes():
+    """Executa todas as verificações e retorna {nome: resultado}"""
+    checks = {}
+    for name, probe in PROBES.items():
+        start = time.perf_counter()
+        try:
+            result = probe()
+        except Exception as e:
+            result = {'status': ERROR, 'error': str(e)[:200]}
+        result['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+        checks[name] = result
+    return checks
+
+
+class HealthMonitor:
+    """Resultado em cache das verificações, atualizado em segundo plano"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._refreshing = None
+        self._pid = None
+
+    def _refresh(self):
+        try:
+            checks = run_probes()
+            self._snapshot = Snapshot(checks, timezone.now(), time.monotonic())
+            failed = [name for name, result in checks.items() if result['status'] == ERROR]
+            if failed:
+                logger.warning('Verificação de saúde com falha: %s', ', '.join(failed))
+        finally:
+            # Conexão própria desta thread; a próxima rodada testa uma conexão nova
+            connections.close_all()
+
+    def _start_refresh(self):
+        # Chamado com o lock; no máximo uma atualização por processo
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._snapshot = None
+            self._refreshing = None
+        if self._refreshing is None or not self._refreshing.is_alive():
+            self._refreshing = threading.Thread(target=self._refresh, name='health-probes', daemon=True)
+            self._refreshing.start()
+        return self._refreshing
+
+    def snapshot(self):
+        """
+        Último resultado das verificações. Na primeira chamada do processo
+        espera a rodada inicial (até HEALTH_PROBE_TIMEOUT); depois, nunca
+        bloqueia.
+        """
+        with self._lock:
+            snapshot = self._snapshot if self._pid == os.getpid() else None
+            if snapshot is None or time.monotonic() - snapshot.monotonic > settings.HEALTH_CACHE_SECONDS:
+                thread = self._start_refresh()
+            else:
+                thread = None
+        if snapshot is None and thread is not None:
+            thread.join(settings.HEALTH_PROBE_TIMEOUT)
+            snapshot = self._snapshot
+        return snapshot
+
+
+monitor = HealthMonitor()
+
+
+def readiness():
+    """Retorna (pronto, payload) a partir do resultado em cache"""
+    snapshot = monitor.snapshot()
+    if snapshot is None:
+        return False, {'status': 'unready', 'reason': 'Verificações ainda não concluídas.', 'checks': {}}
+
+    age = time.monotonic() - snapshot.monotonic
+    ready = all(snapshot.checks[name]['status'] != ERROR for name in CRITICAL)
+    payload = {
+        'status': 'ready' if ready else 'unready',
+        'checked_at': snapshot.checked_at,
+        'age_seconds': round(age, 1),
+        'checks': snapshot.checks,
+    }
+    if age > settings.HEALTH_MAX_STALE_SECONDS:
+        payload.update(status='unready', reason='Verificações sem resposta.')
+        ready = False
+    return ready, payload
@@ -0,0 +1,110 @@
+import ipaddress
+import json
+from itertools import islice
+
+from django.conf import settings
+
+from .serializers import ContactMessageSerializer
+from .services import create_contact_messages
+
+
+class InvalidLine:
+    """Linha de um stream JSONL que não é JSON válido"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def iter_jsonl(lines):
+    """
+    Lê um stream JSONL linha a linha (sem carregar tudo em memória).
+
+    Linhas vazias são ignoradas; linhas inválidas viram `InvalidLine`, para
+    serem reportadas como erro do item sem interromper o lote.
+    """
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            yield InvalidLine(f'JSON inválido: {str(e)}')
+
+
+def _validate_ip(item):
+    value = item.get('ip_address') if isinstance(item, dict) else None
+    if value in (None, ''):
+        return None, None
+    try:
+        return str(ipaddress.ip_address(value)), None
+    except ValueError:
+        return None, ['Endereço IP inválido.']
+
+
+def _validate_chunk(items):
+    """
+    Valida um bloco com ContactMessageSerializer(many=True).
+
+    Retorna (válidos, erros): válidos é uma lista de (índice, dados), erros
+    uma lista de (índice, erros do item).
+    """
+    errors = []
+    candidates = []
+    ips = []
+    for index, item in items:
+        if isinstance(item, InvalidLine):
+            errors.append((index, {'non_field_errors': [item.error]}))
+            continue
+        ip_address, ip_errors = _validate_ip(item)
+        if ip_errors:
+            errors.append((index, {'ip_address': ip_errors}))
+            continue
+        candidates.append((index, item))
+        ips.append(ip_address)
+
+    serializer = ContactMessageSerializer(data=[item for _, item in candidates], many=True)
+    if not serializer.is_valid():
+        item_errors = serializer.errors
+        errors.extend((candidates[i][0], e) for i, e in enumerate(item_errors) if e)
+        keep = [i for i, e in enumerate(item_errors) if not e]
+        candidates = [candidates[i] for i in keep]
+        ips = [ips[i] for i in keep]
+        # Revalida só os itens bons: o ListSerializer descarta tudo quando há erro
+        serializer = ContactMessageSerializer(data=[item for _, item in candidates], many=True)
+        serializer.is_valid(raise_exception=True)
+
+    valid = [
+        (index, dict(data, ip_address=ip_address))
+        for (index, _), data, ip_address in zip(candidates, serializer.validated_data, ips)
+    ]
+    return valid, errors
+
+
+def import_messages(items, notify=False, chunk_size=None):
+    """
+    Importa mensagens em blocos de `chunk_size` com bulk_create.
+
+    `items` pode ser qualquer iterável de itens (lista ou stream JSONL);
+    strings e dicts levantam TypeError. Erros de validação são reportados
+    por item (índice a partir de 0) sem abortar o lote. Retorna
+    {'created': n, 'failed': n, 'errors': [...]}.
+    """
+    if isinstance(items, (str, bytes, dict)):
+        raise TypeError(f'Esperada uma lista ou um stream de mensagens, recebido {type(items).__name__}')
+    chunk_size = chunk_size or settings.CONTACT_BULK_CHUNK_SIZE
+    result = {'created': 0, 'failed': 0, 'errors': []}
+    numbered = enumerate(items)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        valid, errors = _validate_chunk(chunk)
+        if valid:
+            created = create_contact_messages([data for _, data in valid], notify=notify)
+            result['created'] += len(created)
+        result['failed'] += len(errors)
+        result['errors'].extend({'index': index, 'errors': item_errors} for index, item_errors in errors)
+    return result
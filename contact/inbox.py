@@ -0,0 +1,126 @@
+"""
+Resumo da caixa de entrada (total, não lidas, data da última mensagem).
+
+Os contadores ficam em InboxSummary e são ajustados com UPDATE ... SET
+unread = unread + n na mesma transação que cria, marca ou arquiva as
+mensagens; só as exclusões pelo admin recalculam tudo. A leitura passa pelo
+cache do Django por CONTACT_INBOX_CACHE_SECONDS; `version` e `updated_at`
+mudam a cada alteração e servem de ETag/Last-Modified para
+/api/contact/summary/ e /api/contact/messages/, então o polling quase sempre
+termina em um 304 sem tocar no banco.
+
+O cache é invalidado no commit apenas no processo que fez a alteração; com
+o LocMemCache padrão os outros workers veem a mudança quando a entrada
+expira.
+
+As mesmas funções mantêm as estatísticas por hora (contact.stats).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import stats
+from .models import ContactMessage, InboxSummary
+
+CACHE_KEY = 'contact:inbox-summary'
+FIELDS = ('total', 'unread', 'last_message_at', 'version', 'updated_at')
+MARK_BATCH_SIZE = 500
+
+
+def invalidate():
+    cache.delete(CACHE_KEY)
+
+
+def _apply(**changes):
+    updated = InboxSummary.objects.filter(pk=1).update(
+        version=F('version') + 1, updated_at=timezone.now(), **changes
+    )
+    if not updated:
+        # Tabela vazia (banco recriado sem a migração de dados): recalcula
+        rebuild()
+        return
+    transaction.on_commit(invalidate)
+
+
+def record_created(messages):
+    """Conta mensagens recém-criadas (chamar na transação que as gravou)"""
+    if not messages:
+        return
+    latest = max(message.created_at for message in messages)
+    _apply(
+        total=F('total') + len(messages),
+        unread=F('unread') + sum(1 for message in messages if not message.is_read),
+        last_message_at=Greatest(Coalesce(F('last_message_at'), latest), latest),
+    )
+    stats.record_created(messages)
+
+
+def touch():
+    """Outra alteração nas mensagens (edição no admin): só invalida os ETags"""
+    _apply()
+
+
+def record_read_change(created_ats, is_read):
+    """
+    Mensagens (datas de criação) que passaram a lidas, ou a não lidas com
+    `is_read` falso
+    """
+    if created_ats:
+        _apply(unread=F('unread') - (len(created_ats) if is_read else -len(created_ats)))
+        stats.record_read_change(created_ats, is_read)
+
+
+def record_deleted(rows):
+    """
+    Desconta mensagens apagadas, dadas como pares (created_at, is_read). A
+    data da última mensagem é mantida
+    """
+    if rows:
+        _apply(total=F('total') - len(rows), unread=F('unread') - sum(1 for _, is_read in rows if not is_read))
+        stats.record_deleted(rows)
+
+
+def mark(queryset, is_read):
+    """Marca as mensagens como lidas/não lidas e ajusta os contadores. Retorna quantas mudaram"""
+    with transaction.atomic():
+        pks = list(queryset.filter(is_read=not is_read).values_list('pk', flat=True))
+        changed = []
+        # Em blocos (a seleção do admin pode ter a tabela inteira), travando as
+        # linhas para contar cada mudança na hora certa das estatísticas
+        for start in range(0, len(pks), MARK_BATCH_SIZE):
+            rows = list(
+                ContactMessage.objects.filter(pk__in=pks[start:start + MARK_BATCH_SIZE], is_read=not is_read)
+                .select_for_update().values_list('pk', 'created_at')
+            )
+            ContactMessage.objects.filter(pk__in=[pk for pk, _ in rows]).update(is_read=is_read)
+            changed.extend(created_at for _, created_at in rows)
+        record_read_change(changed, is_read)
+    return len(changed)
+
+
+def rebuild():
+    """Recalcula o resumo a partir da tabela (após exclusões)"""
+    stats = ContactMessage.objects.aggregate(
+        total=Count('pk'),
+        unread=Count('pk', filter=Q(is_read=False)),
+        last_message_at=Max('created_at'),
+    )
+    with transaction.atomic():
+        InboxSummary.objects.get_or_create(pk=1)
+        InboxSummary.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now(), **stats)
+        transaction.on_commit(invalidate)
+
+
+def get_summary():
+    """Resumo atual como dict (FIELDS), do cache quando possível"""
+    summary = cache.get(CACHE_KEY)
+    if summary is None:
+        summary = InboxSummary.objects.filter(pk=1).values(*FIELDS).first()
+        if summary is None:
+            rebuild()
+            summary = InboxSummary.objects.filter(pk=1).values(*FIELDS).first()
+        cache.set(CACHE_KEY, summary, settings.CONTACT_INBOX_CACHE_SECONDS)
+    return summary
@@ -0,0 +1,292 @@
+"""
+Filtro de IPs por faixas CIDR, aplicado antes do throttle e da validação.
+
+As faixas vêm de arquivos locais, um CIDR (ou IP) por linha, `#` para
+comentários:
+
+    CONTACT_IP_BLOCKLIST  faixas recusadas com 403
+    CONTACT_IP_ALLOWLIST  exceções ao bloqueio (têm prioridade)
+
+Cada lista é mesclada em intervalos [início, fim] ordenados e disjuntos,
+guardados em arrays compactos (4 bytes por borda no IPv4); a consulta é um
+bisect em C, O(log n) sobre as faixas já mescladas. Os arquivos são
+conferidos a cada CONTACT_IP_FILTER_RELOAD_SECONDS e, se mudaram, relidos
+numa thread à parte: as requisições seguem com a versão anterior até a nova
+ficar pronta.
+
+O IP do cliente é resolvido por `client_ip`, que só confia no
+X-Forwarded-For vindo de TRUSTED_PROXIES. A permissão do DRF que aplica o
+filtro fica em contact.permissions, para este módulo não importar o DRF.
+"""
+import bisect
+import logging
+import os
+import socket
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Prefixo de um IPv4 mapeado em IPv6 (::ffff:a.b.c.d)
+V4_MAPPED = bytes(10) + b'\xff\xff'
+
+
+def parse_ip(value):
+    """(versão, inteiro) de um endereço IPv4/IPv6 em texto, ou None se inválido"""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, value), 'big')
+    except (OSError, TypeError, ValueError):
+        pass
+    try:
+        packed = socket.inet_pton(socket.AF_INET6, value.split('%', 1)[0])
+    except (OSError, TypeError, ValueError, AttributeError):
+        return None
+    if packed.startswith(V4_MAPPED):
+        return 4, int.from_bytes(packed[12:], 'big')
+    return 6, int.from_bytes(packed, 'big')
+
+
+def parse_cidr(value):
+    """
+    (versão, primeiro, último) da faixa em texto ('10.0.0.0/8', um IP sem
+    prefixo vale /32 ou /128), ou None se inválida. Bits de host são
+    ignorados, como em ip_network(strict=False).
+    """
+    address, _, prefix = value.partition('/')
+    parsed = parse_ip(address)
+    if parsed is None:
+        return None
+    version, number = parsed
+    bits = 32 if version == 4 else 128
+    host = 0
+    if prefix:
+        if not prefix.isdigit():
+            return None
+        length = int(prefix)
+        # Um IPv4 mapeado (::ffff:a.b.c.d/104) tem o prefixo contado em 128 bits
+        if version == 4 and ':' in address:
+            length -= 96
+        if not 0 <= length <= bits:
+            return None
+        host = bits - length
+    start = number >> host << host
+    return version, start, start | ((1 << host) - 1)
+
+
+def _merge(intervals):
+    intervals.sort()
+    starts, ends = [], []
+    for start, end in intervals:
+        if ends and start <= ends[-1] + 1:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+class IntervalSet:
+    """Conjunto de faixas IPv4/IPv6 mescladas, com pertinência por bisect"""
+
+    def __init__(self, ranges=()):
+        intervals = {4: [], 6: []}
+        for version, start, end in ranges:
+            intervals[version].append((start, end))
+        starts, ends = _merge(intervals[4])
+        self._ranges = {
+            4: (array('I', starts), array('I', ends)),
+            # Inteiros de 128 bits não cabem em array: listas comuns
+            6: _merge(intervals[6]),
+        }
+
+    def __len__(self):
+        return len(self._ranges[4][0]) + len(self._ranges[6][0])
+
+    def contains(self, version, number):
+        starts, ends = self._ranges[version]
+        i = bisect.bisect_right(starts, number) - 1
+        return i >= 0 and number <= ends[i]
+
+    def __contains__(self, address):
+        parsed = parse_ip(address)
+        return parsed is not None and self.contains(*parsed)
+
+
+def load_ranges(path):
+    """Faixas de um arquivo (ver parse_cidr); linhas inválidas são ignoradas com aviso"""
+    ranges = []
+    invalid = 0
+    with open(path, encoding='utf-8') as stream:
+        for line in stream:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            parsed = parse_cidr(line)
+            if parsed is None:
+                invalid += 1
+            else:
+                ranges.append(parsed)
+    if invalid:
+        logger.warning('%s linhas inválidas ignoradas em %s', invalid, path)
+    return ranges
+
+
+class IPFilter:
+    """Listas de bloqueio e liberação carregadas dos arquivos configurados"""
+
+    def __init__(self, blocklist, allowlist):
+        self.blocked = IntervalSet(load_ranges(blocklist) if blocklist else ())
+        self.allowed = IntervalSet(load_ranges(allowlist) if allowlist else ())
+
+    def is_blocked(self, address):
+        parsed = parse_ip(address)
+        if parsed is None:
+            return False
+        return self.blocked.contains(*parsed) and not self.allowed.contains(*parsed)
+
+
+def _signature(paths):
+    signature = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            signature.append(None)
+        else:
+            signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+class FilterLoader:
+    """IPFilter do processo, relido em segundo plano quando os arquivos mudam"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._filter = None
+        self._signature = None
+        self._checked_at = 0.0
+        self._reloading = None
+
+    def _paths(self):
+        return [path for path in (settings.CONTACT_IP_BLOCKLIST, settings.CONTACT_IP_ALLOWLIST) if path]
+
+    def _load(self, signature):
+        start = time.perf_counter()
+        try:
+            loaded = IPFilter(settings.CONTACT_IP_BLOCKLIST, settings.CONTACT_IP_ALLOWLIST)
+        except (OSError, ValueError):
+            # Arquivo ilegível ou que não é UTF-8 (UnicodeDecodeError): mantém a
+            # versão anterior (ou nenhum bloqueio) até o arquivo mudar
+            logger.exception('Falha ao carregar as listas de IP')
+            self._filter = self._filter or IPFilter('', '')
+            self._signature = signature
+            return
+        self._filter, self._signature = loaded, signature
+        logger.info(
+            'Listas de IP carregadas: %s faixas bloqueadas, %s liberadas, em %.0f ms',
+            len(loaded.blocked), len(loaded.allowed), (time.perf_counter() - start) * 1000,
+        )
+
+    def get(self):
+        """IPFilter atual, ou None sem listas configuradas"""
+        paths = self._paths()
+        if not paths:
+            return None
+        now = time.monotonic()
+        if self._filter is not None and now - self._checked_at < settings.CONTACT_IP_FILTER_RELOAD_SECONDS:
+            return self._filter
+
+        with self._lock:
+            self._checked_at = now
+            signature = _signature(paths)
+            if signature == self._signature and self._filter is not None:
+                return self._filter
+            if self._filter is None:
+                # Primeira carga do processo: sem versão anterior para servir
+                self._load(signature)
+            elif self._reloading is None or not self._reloading.is_alive():
+                self._reloading = threading.Thread(
+                    target=self._load, args=(signature,), name='ipfilter-reload', daemon=True,
+                )
+                self._reloading.start()
+            return self._filter
+
+    def reset(self):
+        with self._lock:
+            self._filter = self._signature = None
+            self._checked_at = 0.0
+
+
+loader = FilterLoader()
+
+
+@receiver(setting_changed)
+def _reset_filter(setting, **kwargs):
+    global _trusted
+    if setting.startswith('CONTACT_IP_'):
+        loader.reset()
+    elif setting == 'TRUSTED_PROXIES':
+        _trusted = None
+
+
+def is_blocked(address):
+    """Se `address` está numa faixa bloqueada (e fora das liberadas)"""
+    ip_filter = loader.get()
+    if ip_filter is None or not ip_filter.is_blocked(address):
+        return False
+    metrics.IP_FILTER_REJECTIONS.inc()
+    return True
+
+
+_trusted = None
+
+
+def trusted_proxies():
+    global _trusted
+    if _trusted is None:
+        ranges = [parse_cidr(value.strip()) for value in settings.TRUSTED_PROXIES]
+        if None in ranges:
+            raise ImproperlyConfigured(f'TRUSTED_PROXIES inválido: {settings.TRUSTED_PROXIES}')
+        _trusted = IntervalSet(ranges)
+    return _trusted
+
+
+def client_ip(request):
+    """
+    IP do cliente. O X-Forwarded-For só é considerado se a conexão vier de
+    TRUSTED_PROXIES, e é lido da direita para a esquerda, pulando os proxies
+    confiáveis: o primeiro endereço de fora é o cliente. Entradas à esquerda
+    dele foram escritas pelo próprio cliente e são ignoradas.
+
+    Sem TRUSTED_PROXIES configurado vale a primeira entrada do cabeçalho
+    (comportamento anterior, falsificável pelo cliente), se for um IP
+    válido; senão, o REMOTE_ADDR.
+    """
+    remote = request.META.get('REMOTE_ADDR', '')
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if not settings.TRUSTED_PROXIES:
+        first = forwarded.split(',')[0].strip() if forwarded else ''
+        return first if parse_ip(first) is not None else remote
+
+    proxies = trusted_proxies()
+    if not forwarded or remote not in proxies:
+        return remote
+    closest = remote
+    for hop in reversed(forwarded.split(',')):
+        hop = hop.strip()
+        parsed = parse_ip(hop)
+        if parsed is None:
+            return closest
+        if not proxies.contains(*parsed):
+            return hop
+        closest = hop
+    return closest
@@ -0,0 +1,156 @@
+"""
+Logs estruturados sem bloquear quem registra (LOG_FORMAT='json').
+
+As views e as threads de envio só colocam o registro numa fila em memória;
+uma thread do processo formata e escreve no stdout. Se o stdout ficar lento
+e a fila encher, os registros INFO/DEBUG passam a ser amostrados
+(LOG_SAMPLE_RATE) e, com a fila cheia, descartados — a requisição nunca
+espera pelo log. O total descartado aparece no campo `dropped` do próximo
+registro que entrar.
+
+A mensagem é formatada só na thread de escrita, então as chamadas devem usar
+o estilo com argumentos (`logger.info('... %s', valor)`) e valores
+imutáveis. Campos passados em `extra` (CONTEXT_FIELDS) e o id da requisição
+atual viram chaves do JSON.
+"""
+import contextvars
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+# Atributos do LogRecord copiados para o JSON quando presentes
+CONTEXT_FIELDS = ('request_id', 'message_id', 'ip', 'method', 'path', 'status', 'latency_ms', 'dropped')
+
+# Id da requisição atual (definido pelo RequestLogMiddleware)
+request_id = contextvars.ContextVar('request_id', default=None)
+
+
+class JSONFormatter(logging.Formatter):
+    """Um objeto JSON por linha com horário UTC, nível, logger e mensagem"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in CONTEXT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # Na saída espera uma vaga na fila em vez de perder o fim dos logs
+        self.queue.put(self._sentinel)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler com fila limitada e uma QueueListener por processo,
+    escrevendo em `stream` com o formatter deste handler.
+
+    Acima de `sample_above` (fração da capacidade) só `sample_rate` dos
+    registros abaixo de WARNING entra na fila; com a fila cheia, qualquer
+    registro é descartado.
+    """
+
+    def __init__(self, capacity=10000, sample_rate=0.1, sample_above=0.8, stream=None):
+        super().__init__(None)
+        self.capacity = capacity
+        self.sample_rate = sample_rate
+        self.sample_above = int(capacity * sample_above)
+        self.target = logging.StreamHandler(stream or sys.stdout)
+        self.listener = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._dropped = 0
+        self._counters = {'enqueued': 0, 'sampled_out': 0, 'dropped': 0}
+
+    def setFormatter(self, fmt):
+        super().setFormatter(fmt)
+        self.target.setFormatter(fmt)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, queued=self.queue.qsize() if self.queue is not None else 0)
+
+    def _start(self):
+        # A thread de escrita não sobrevive ao fork (preload do gunicorn):
+        # cada processo cria a sua fila e a sua listener
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.queue = queue.Queue(self.capacity)
+            self.listener = _Listener(self.queue, self.target)
+            self.listener.start()
+            self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Sem o self.format() do QueueHandler: a mensagem é montada na listener
+        record = copy.copy(record)
+        if record.exc_info:
+            # O traceback referencia frames vivos: vira texto aqui mesmo
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if getattr(record, 'request_id', None) is None:
+            record.request_id = request_id.get()
+        with self._lock:
+            if self._dropped:
+                record.dropped, self._dropped = self._dropped, 0
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Inclui os descartes que este registro levaria no campo `dropped`
+            self._count('dropped', 1 + getattr(record, 'dropped', 0))
+            return
+        with self._lock:
+            self._counters['enqueued'] += 1
+
+    def _count(self, key, pending=1):
+        with self._lock:
+            self._counters[key] += 1
+            self._dropped += pending
+
+    def emit(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        if (
+            record.levelno < logging.WARNING
+            and self.queue.qsize() >= self.sample_above
+            and random.random() >= self.sample_rate
+        ):
+            self._count('sampled_out')
+            return
+        try:
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        # Chamado pelo logging.shutdown() na saída: esvazia a fila antes
+        with self._lock:
+            listener = self.listener if self._pid == os.getpid() else None
+            self.listener = None
+            self._pid = None
+        if listener is not None:
+            listener.stop()
+        self.target.close()
+        super().close()
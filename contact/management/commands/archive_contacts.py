@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from contact import archive
+
+
+class Command(BaseCommand):
+    help = 'Move mensagens mais antigas que a retenção para arquivos JSONL.gz e as apaga da tabela em lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None, help='Retenção em dias (padrão: CONTACT_RETENTION_DAYS)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Mensagens por lote (padrão: CONTACT_ARCHIVE_BATCH_SIZE)')
+        parser.add_argument('--pause', type=float, default=0, help='Segundos de espera entre os lotes')
+        parser.add_argument('--dry-run', action='store_true', help='Só conta as mensagens que seriam arquivadas')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.CONTACT_RETENTION_DAYS
+        if days < 1:
+            raise CommandError('A retenção deve ser de pelo menos 1 dia.')
+        cutoff = archive.cutoff_for(days)
+
+        if options['dry_run']:
+            count = archive.expired_messages(cutoff).count()
+            self.stdout.write(f'{count} mensagens anteriores a {cutoff:%d/%m/%Y %H:%M} seriam arquivadas')
+            return
+
+        total, files = archive.archive_messages(cutoff, options['batch_size'], options['pause'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} mensagens arquivadas em {files} arquivo(s) em {archive.archive_dir()}'
+        ))
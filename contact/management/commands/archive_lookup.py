@@ -0,0 +1,33 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contact import archive
+from contact.exporter import parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Procura mensagens nos arquivos da retenção sem restaurá-las (saída em JSONL)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--email', help='Email do remetente (exato, sem diferenciar maiúsculas)')
+        parser.add_argument('--text', help='Trecho no nome, assunto ou mensagem')
+        parser.add_argument('--id', type=int, dest='message_id', help='Id da mensagem')
+        parser.add_argument('--since', help='Data/hora inicial (AAAA-MM-DD ou ISO 8601), inclusiva')
+        parser.add_argument('--until', help='Data/hora final (AAAA-MM-DD ou ISO 8601); uma data inclui o dia todo')
+        parser.add_argument('--limit', type=int, default=None, help='Máximo de mensagens')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options['since']) if options['since'] else None
+            until = parse_bound(options['until'], end=True) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        found = 0
+        for record in archive.lookup(options['email'], options['text'], options['message_id'], since, until):
+            self.stdout.write(json.dumps(record, ensure_ascii=False))
+            found += 1
+            if options['limit'] and found >= options['limit']:
+                break
+        self.stderr.write(f'{found} mensagens encontradas')
@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from contact.benchmarks import isolated_database, seed_messages
+from contact.models import ContactMessage
+
+CHANGELIST = '/admin/contact/contactmessage/'
+
+
+def changelist_urls():
+    today = timezone.localdate()
+    return [
+        ('listagem', CHANGELIST),
+        ('não lidas', f'{CHANGELIST}?is_read__exact=0'),
+        ('lidas', f'{CHANGELIST}?is_read__exact=1'),
+        ('mês atual', f'{CHANGELIST}?created_at__month={today.month}&created_at__year={today.year}'),
+        ('página 50', f'{CHANGELIST}?p=50'),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula um banco descartável e mede as consultas da listagem de mensagens '
+        'no admin com e sem os índices de ContactMessage'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            self.stdout.write(f"Populando {options['rows']} mensagens...")
+            seed_messages(options['rows'])
+            user = get_user_model().objects.create_superuser('bench', 'bench@example.com', 'bench')
+            client = Client()
+            client.force_login(user)
+
+            indexes = ContactMessage._meta.indexes
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.remove_index(ContactMessage, index)
+            self.analyze()
+            before = self.measure(client, options['repeat'])
+
+            with connection.schema_editor() as editor:
+                for index in indexes:
+                    editor.add_index(ContactMessage, index)
+            self.analyze()
+            after = self.measure(client, options['repeat'])
+
+        self.stdout.write(f"{'página':12} {'sem índices':>24} {'com índices':>24}")
+        for label, _ in changelist_urls():
+            b, a = before[label], after[label]
+            self.stdout.write(
+                f'{label:12} {b[0]:9.1f} ms ({b[1]:6.1f} SQL) {a[0]:9.1f} ms ({a[1]:6.1f} SQL)'
+            )
+        self.stdout.write('Tempos: mediana da requisição completa e, entre parênteses, do total gasto em SQL.')
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def measure(self, client, repeat):
+        results = {}
+        for label, url in changelist_urls():
+            client.get(url)
+            request_times = []
+            sql_times = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    request_times.append(time.perf_counter() - start)
+                assert response.status_code == 200, response.status_code
+                sql_times.append(sum(float(q['time']) for q in queries.captured_queries))
+            results[label] = (statistics.median(request_times) * 1000, statistics.median(sql_times) * 1000)
+        return results
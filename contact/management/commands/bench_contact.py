@@ -0,0 +1,196 @@
+import json
+import logging
+import platform
+import random
+import subprocess
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+
+from contact import dedup, tasks
+from contact.benchmarks import WORDS, isolated_database, run_concurrent
+from contact.models import ContactMessage
+from contact.sendgrid_client import SendGridResponse
+from contact.serializers import ContactMessageSerializer
+from contact.views import send_contact_message
+
+STAGES = ['validation', 'dedup', 'insert', 'render', 'view']
+NAMES = ['Ana Souza', 'João Pereira', 'Maria Oliveira', 'Carlos Lima', 'Beatriz Gonçalves', 'Rafael Costa']
+
+
+def contact_payload(i):
+    """Payload válido para ContactMessageSerializer"""
+    return {
+        'name': random.choice(NAMES),
+        'email': f'remetente{i}@example.com',
+        'subject': ' '.join(random.choices(WORDS, k=4)),
+        'message': ' '.join(random.choices(WORDS, k=random.randint(20, 120))),
+    }
+
+
+def client_ip(i):
+    # IP diferente por requisição para não cair no throttle de 5/hora
+    return f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}'
+
+
+class StubSendGridClient:
+    """Transporte falso: serializa o Mail como o cliente real, sem rede"""
+
+    def send(self, message):
+        json.dumps(message.get())
+        return SendGridResponse(202, b'', {})
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark em processo do envio de mensagens de contato: validação do '
+        'serializer, gravação no banco, renderização do email (transporte falso) '
+        'e a view completa pelo ciclo do DRF. Roda em um banco descartável.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='operações por etapa')
+        parser.add_argument('--concurrency', type=int, default=1, help='threads simultâneas')
+        parser.add_argument('--stages', default=','.join(STAGES), help=f'etapas, entre: {", ".join(STAGES)}')
+        parser.add_argument('--output', help='grava os resultados em JSON neste arquivo')
+        parser.add_argument('--compare', help='JSON de uma execução anterior para comparar')
+
+    def handle(self, *args, **options):
+        stages = [stage.strip() for stage in options['stages'].split(',') if stage.strip()]
+        unknown = set(stages) - set(STAGES)
+        if unknown:
+            raise CommandError(f'Etapas desconhecidas: {", ".join(sorted(unknown))}')
+        baseline = self.load(options['compare']) if options['compare'] else None
+
+        results = {}
+        with tempfile.TemporaryDirectory() as tmp, isolated_database(), override_settings(
+            # Notificações habilitadas (a view grava também a fila), sem worker
+            SENDGRID_API_KEY='bench',
+            THROTTLE_REDIS_URL='',
+            THROTTLE_SQLITE_PATH=str(Path(tmp) / 'throttle.sqlite3'),
+            EMAIL_OUTBOX_INPROCESS=False,
+        ), mock.patch.object(tasks, 'get_client', return_value=StubSendGridClient()):
+            # Os logs por mensagem dominariam o tempo medido; erros entram no resultado
+            logging.disable(logging.ERROR)
+            try:
+                for stage in stages:
+                    operation = getattr(self, f'stage_{stage}')(options['requests'])
+                    operation(0)
+                    results[stage] = run_concurrent(operation, options['requests'], options['concurrency'])
+            finally:
+                logging.disable(logging.NOTSET)
+
+        self.report(results, baseline)
+        if options['output']:
+            self.save(options['output'], results, options, stages)
+
+    def stage_validation(self, total):
+        payloads = [contact_payload(i) for i in range(total)]
+
+        def operation(i):
+            serializer = ContactMessageSerializer(data=payloads[i])
+            if not serializer.is_valid():
+                raise ValueError(serializer.errors)
+        return operation
+
+    def stage_dedup(self, total):
+        payloads = [contact_payload(i) for i in range(total)]
+
+        def operation(i):
+            dedup.check(payloads[i])
+        return operation
+
+    def stage_insert(self, total):
+        payloads = [contact_payload(i) for i in range(total)]
+
+        def operation(i):
+            ContactMessage.objects.create(ip_address=client_ip(i), **payloads[i])
+        return operation
+
+    def stage_render(self, total):
+        now = timezone.now()
+        messages = [ContactMessage(created_at=now, ip_address=client_ip(i), **contact_payload(i)) for i in range(total)]
+
+        def operation(i):
+            tasks.send_contact_email(messages[i])
+        return operation
+
+    def stage_view(self, total):
+        factory = APIRequestFactory()
+        payloads = [contact_payload(i) for i in range(total)]
+        # A chamada de aquecimento usa o índice 0 de novo: desloca os IPs
+        offset = random.randint(1, 1000) * 100000
+
+        def operation(i):
+            request = factory.post('/api/contact/send/', payloads[i], format='json', REMOTE_ADDR=client_ip(offset + i))
+            response = send_contact_message(request)
+            if response.status_code != 201:
+                raise ValueError(response.status_code)
+        return operation
+
+    def report(self, results, baseline):
+        self.stdout.write(
+            f"{'etapa':12} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erros':>6}"
+            + (f" {'Δ ops/s':>9} {'Δ p99':>9}" if baseline else '')
+        )
+        for stage, result in results.items():
+            line = (
+                f"{stage:12} {result['ops_per_sec']:10.1f} {result['p50_ms']:9.3f} "
+                f"{result['p95_ms']:9.3f} {result['p99_ms']:9.3f} {result['errors']:6}"
+            )
+            previous = baseline['results'].get(stage) if baseline else None
+            if previous:
+                line += (
+                    f" {self.delta(result['ops_per_sec'], previous['ops_per_sec']):>9}"
+                    f" {self.delta(result['p99_ms'], previous['p99_ms']):>9}"
+                )
+            self.stdout.write(line)
+            for error, count in result['error_types'].items():
+                self.stdout.write(f'    {count}x {error}')
+
+    @staticmethod
+    def delta(current, previous):
+        if not previous:
+            return '-'
+        return f'{(current - previous) / previous * 100:+.1f}%'
+
+    def load(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Não foi possível ler {path}: {e}')
+
+    def save(self, path, results, options, stages):
+        data = {
+            'timestamp': datetime.now(dt_timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'options': {'requests': options['requests'], 'concurrency': options['concurrency'], 'stages': stages},
+            'results': results,
+        }
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2)
+        self.stdout.write(f'Resultados gravados em {path}')
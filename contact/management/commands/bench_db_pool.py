@@ -0,0 +1,105 @@
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.backends.signals import connection_created
+from django.db.utils import ConnectionHandler
+
+from contact.benchmarks import run_concurrent
+from contact.db.pool import close_pools, get_pool
+
+try:
+    import dj_database_url
+except ImportError:
+    dj_database_url = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Conexões abertas e latência sob carga concorrente: conexão por '
+        'requisição (CONN_MAX_AGE=0), conexão persistente por thread '
+        '(CONN_MAX_AGE=600) e o pool de DATABASE_POOL. Cada operação faz uma '
+        'consulta e encerra a "requisição" como o Django faz no request_finished.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=8, help='threads simultâneas (como as do gthread)')
+        parser.add_argument('--pool-size', type=int, default=4, help='max_size do pool')
+        parser.add_argument('--query', default='SELECT 1')
+        parser.add_argument(
+            '--database-url',
+            help='banco medido (ex.: postgres://...); por padrão um SQLite temporário',
+        )
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            base = self.database(options, tmp)
+            self.stdout.write(
+                f"{options['requests']} requisições, {options['concurrency']} threads, "
+                f"{base['ENGINE']}, pool de {options['pool_size']}\n"
+            )
+            self.stdout.write(
+                f"{'modo':22} {'média ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'conexões':>9} {'esperas':>8} {'erros':>6}"
+            )
+            for name, settings_dict in self.modes(base, options):
+                result = self.bench(settings_dict, options)
+                self.stdout.write(
+                    f"{name:22} {result['mean_ms']:9.3f} {result['p50_ms']:9.3f} {result['p99_ms']:9.3f} "
+                    f"{result['ops_per_sec']:9.0f} {result['opened']:9d} {result['waits']:8d} {result['errors']:6d}"
+                )
+                for error, count in result['error_types'].items():
+                    self.stdout.write(f'    {count}x {error}')
+
+    def database(self, options, tmp):
+        if not options['database_url']:
+            return {'ENGINE': 'django.db.backends.sqlite3', 'NAME': str(Path(tmp) / 'bench.sqlite3')}
+        if dj_database_url is None:
+            raise CommandError('--database-url requer o pacote dj-database-url')
+        return dj_database_url.parse(options['database_url'])
+
+    def modes(self, base, options):
+        if base['ENGINE'] not in settings.POOLED_ENGINES:
+            raise CommandError(f"Sem backend com pool para {base['ENGINE']}")
+        yield 'sem pool (max_age=0)', dict(base, CONN_MAX_AGE=0)
+        yield 'persistente (600)', dict(base, CONN_MAX_AGE=600)
+        yield 'pool', dict(
+            base,
+            ENGINE=settings.POOLED_ENGINES[base['ENGINE']],
+            CONN_MAX_AGE=0,
+            POOL={'min_size': options['pool_size'], 'max_size': options['pool_size']},
+        )
+
+    def bench(self, settings_dict, options):
+        close_pools()
+        handler = ConnectionHandler({DEFAULT_DB_ALIAS: settings_dict})
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            if connection.settings_dict is settings_dict:
+                opened.append(1)
+
+        def request(i):
+            connection = handler[DEFAULT_DB_ALIAS]
+            with connection.cursor() as cursor:
+                cursor.execute(options['query'])
+                cursor.fetchall()
+            # O que o Django faz ao fim de cada requisição
+            connection.close_if_unusable_or_obsolete()
+
+        connection_created.connect(count)
+        try:
+            result = run_concurrent(request, options['requests'], options['concurrency'])
+        finally:
+            connection_created.disconnect(count)
+
+        if 'POOL' in settings_dict:
+            # connection_created dispara a cada retirada do pool; conta só as aberturas reais
+            stats = get_pool(DEFAULT_DB_ALIAS, settings_dict['POOL']).stats()
+            result.update(opened=stats['opened'], waits=stats['waits'])
+            close_pools()
+        else:
+            result.update(opened=len(opened), waits=0)
+        return result
@@ -0,0 +1,188 @@
+import random
+import string
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from contact import emails
+from contact.benchmarks import measure_allocations, summarize, time_calls
+from contact.models import ContactMessage
+
+
+def render_legacy(message, ip_address):
+    """Renderização antiga (f-string montada a cada email, sem escape)"""
+    email_html = f"""
+    <!DOCTYPE html>
+    <html lang="pt-BR">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <style>
+            body {{
+                font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, 'Helvetica Neue', Arial, sans-serif;
+                line-height: 1.6;
+                color: #333;
+                margin: 0;
+                padding: 0;
+                background-color: #f5f5f5;
+            }}
+            .container {{
+                max-width: 600px;
+                margin: 20px auto;
+                background: #ffffff;
+                border-radius: 8px;
+                overflow: hidden;
+                box-shadow: 0 2px 4px rgba(0,0,0,0.1);
+            }}
+            .header {{
+                background: #2c3e50;
+                color: #ffffff;
+                padding: 30px 20px;
+                text-align: center;
+            }}
+            .header h1 {{
+                margin: 0;
+                font-size: 24px;
+                font-weight: 600;
+            }}
+            .content {{
+                padding: 30px;
+            }}
+            .field {{
+                margin-bottom: 20px;
+                padding-bottom: 20px;
+                border-bottom: 1px solid #eee;
+            }}
+            .field:last-child {{
+                border-bottom: none;
+            }}
+            .label {{
+                font-weight: 600;
+                color: #2c3e50;
+                margin-bottom: 5px;
+                font-size: 14px;
+                text-transform: uppercase;
+                letter-spacing: 0.5px;
+            }}
+            .value {{
+                color: #555;
+                font-size: 16px;
+            }}
+            .message-content {{
+                background: #f9f9f9;
+                padding: 20px;
+                border-radius: 4px;
+                border-left: 3px solid #2c3e50;
+                margin-top: 10px;
+                white-space: pre-wrap;
+                word-wrap: break-word;
+            }}
+            .metadata {{
+                background: #f0f0f0;
+                padding: 15px;
+                margin-top: 20px;
+                border-radius: 4px;
+                font-size: 13px;
+                color: #666;
+            }}
+            .footer {{
+                background: #f8f9fa;
+                padding: 20px;
+                text-align: center;
+                font-size: 12px;
+                color: #999;
+                border-top: 1px solid #e0e0e0;
+            }}
+            a {{
+                color: #2c3e50;
+                text-decoration: none;
+            }}
+            a:hover {{
+                text-decoration: underline;
+            }}
+        </style>
+    </head>
+    <body>
+        <div class="container">
+            <div class="header">
+                <h1>Nova Mensagem de Contato</h1>
+            </div>
+
+            <div class="content">
+                <div class="field">
+                    <div class="label">Nome</div>
+                    <div class="value">{message.name}</div>
+                </div>
+
+                <div class="field">
+                    <div class="label">E-mail</div>
+                    <div class="value"><a href="mailto:{message.email}">{message.email}</a></div>
+                </div>
+
+                <div class="field">
+                    <div class="label">Assunto</div>
+                    <div class="value">{message.subject}</div>
+                </div>
+
+                <div class="field">
+                    <div class="label">Mensagem</div>
+                    <div class="message-content">{message.message}</div>
+                </div>
+
+                <div class="metadata">
+                    <strong>Informações adicionais:</strong><br>
+                    Data e hora: {message.created_at.strftime('%d/%m/%Y às %H:%M')}<br>
+                    IP de origem: {ip_address}
+                </div>
+            </div>
+
+            <div class="footer">
+                <p>Mensagem recebida através do formulário de contato do portfolio<br>
+                Arthur Lanznaster</p>
+            </div>
+        </div>
+    </body>
+    </html>
+    """
+    return email_html
+
+
+def make_message(size):
+    words = [''.join(random.choices(string.ascii_lowercase, k=random.randint(3, 9))) for _ in range(size // 6)]
+    return ContactMessage(
+        name='Fulano de Tal',
+        email='fulano@example.com',
+        subject='Proposta de projeto <freelance>',
+        message=' '.join(words)[:size],
+        created_at=timezone.now(),
+        ip_address='203.0.113.10',
+    )
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark da renderização do email de notificação (antes/depois)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--message-size', type=int, default=1000, help='Tamanho do corpo da mensagem')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        message = make_message(options['message_size'])
+        emails.load_templates()
+
+        cases = [
+            ('legado (f-string)', lambda: render_legacy(message, message.ip_address)),
+            ('compilado (html)', lambda: emails.get_template('notification.html').render(emails.message_context(message))),
+            ('compilado (html + texto)', lambda: emails.render_notification(message)),
+        ]
+        for label, fn in cases:
+            for _ in range(100):
+                fn()
+            stats = summarize(time_calls(fn, iterations))
+            allocations = measure_allocations(fn, min(iterations, 1000))
+            self.stdout.write(
+                f"{label:26} média {stats['mean_ms'] * 1000:8.2f} µs | "
+                f"p99 {stats['p99_ms'] * 1000:8.2f} µs | "
+                f"pico alocado {allocations['peak_bytes_per_call'] / 1024:7.1f} KiB/msg"
+            )
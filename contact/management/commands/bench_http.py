@@ -0,0 +1,50 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand
+
+from contact.benchmarks import http_load
+
+
+def contact_payload(i):
+    return json.dumps({
+        'name': 'Fulano de Tal',
+        'email': f'fulano{i}@example.com',
+        'subject': 'Benchmark de carga',
+        'message': 'Mensagem gerada pelo benchmark de carga do endpoint de contato.',
+    }).encode('utf-8')
+
+
+def random_forwarded_for(i):
+    # IP diferente por requisição para não cair no throttle de 5/hora
+    return {'X-Forwarded-For': f'10.{random.randint(0, 255)}.{random.randint(0, 255)}.{random.randint(1, 254)}'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de concorrência (req/s e p99) contra um servidor em execução. '
+        'Rode uma vez contra o gunicorn (WSGI) e outra contra o uvicorn (ASGI) '
+        'usando um banco descartável: cada POST grava uma mensagem.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', nargs='+', help='URL(s) do endpoint, ex.: http://127.0.0.1:8000/api/contact/send/')
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--method', default='POST', choices=['GET', 'POST'])
+
+    def handle(self, *args, **options):
+        post = options['method'] == 'POST'
+        for url in options['url']:
+            result = http_load(
+                url,
+                options['requests'],
+                options['concurrency'],
+                method=options['method'],
+                body_factory=contact_payload if post else None,
+                headers_factory=random_forwarded_for,
+            )
+            self.stdout.write(
+                f"{url}\n    {result['rps']:8.1f} req/s | p50 {result['p50_ms']:7.2f} ms | "
+                f"p95 {result['p95_ms']:7.2f} ms | p99 {result['p99_ms']:7.2f} ms | status {result['statuses']}"
+            )
@@ -0,0 +1,136 @@
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+
+from contact.benchmarks import WORDS, isolated_database, run_concurrent
+from contact.models import ContactMessage
+from contact.serializers import ContactMessageSerializer
+from contact.services import submit_contact_message
+from contact.wal import WriteBehindLog, get_log
+
+
+NAMES = ['Ana Souza', 'João Pereira', 'Maria Oliveira', 'Carlos Lima']
+
+
+def payload(i):
+    return {
+        'name': random.choice(NAMES),
+        'email': f'remetente{i}@example.com',
+        'subject': ' '.join(random.choices(WORDS, k=4)),
+        'message': ' '.join(random.choices(WORDS, k=random.randint(20, 120))),
+    }
+
+
+def submit(i):
+    serializer = ContactMessageSerializer(data=payload(i))
+    serializer.is_valid(raise_exception=True)
+    submit_contact_message(serializer, f'10.0.{i // 256 % 256}.{i % 256}')
+
+
+class Command(BaseCommand):
+    help = (
+        'Entrada de mensagens sob carga concorrente: INSERT na requisição x '
+        'gravação adiada (log local + bulk_create em lotes) com e sem fsync. '
+        'Mostra a latência até a resposta, o throughput, quanto tempo as '
+        'mensagens levam para aparecer no banco e quantas uma queda do '
+        'processo antes do lote deixa para a reaplicação do log.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=3000)
+        parser.add_argument('--concurrency', type=int, default=8, help='threads simultâneas (como as do gthread)')
+        parser.add_argument('--flush-ms', type=float, default=50, help='CONTACT_WAL_FLUSH_SECONDS em ms')
+        parser.add_argument('--batch-size', type=int, default=500, help='CONTACT_WAL_BATCH_SIZE')
+        parser.add_argument('--crash-messages', type=int, default=1000, help='mensagens no teste de queda')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            # Banco em arquivo: as threads gravam em conexões separadas
+            connection.settings_dict['TEST']['NAME'] = str(Path(tmp) / 'bench.sqlite3')
+            with isolated_database(), override_settings(CONTACT_DEDUP_ACTION='off'):
+                self.stdout.write(
+                    f"{options['messages']} mensagens, {options['concurrency']} threads, "
+                    f"lotes a cada {options['flush_ms']:.0f} ms (até {options['batch_size']})\n"
+                )
+                self.stdout.write(
+                    f"{'modo':16} {'média ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'ops/s':>9} "
+                    f"{'no banco':>9} {'fsyncs':>7} {'lotes':>6} {'erros':>6}"
+                )
+                for name, write_behind, fsync in (
+                    ('INSERT direto', False, False),
+                    ('log + fsync', True, True),
+                    ('log sem fsync', True, False),
+                ):
+                    with override_settings(
+                        CONTACT_WRITE_BEHIND=write_behind,
+                        CONTACT_WAL_DIR=str(Path(tmp) / name.replace(' ', '-')),
+                        CONTACT_WAL_FSYNC=fsync,
+                        CONTACT_WAL_FLUSH_SECONDS=options['flush_ms'] / 1000,
+                        CONTACT_WAL_BATCH_SIZE=options['batch_size'],
+                    ):
+                        self.bench(name, write_behind, options)
+                self.crash(Path(tmp) / 'crash', options)
+
+    def bench(self, name, write_behind, options):
+        ContactMessage.objects.all().delete()
+        result = run_concurrent(submit, options['messages'], options['concurrency'])
+        acked = time.perf_counter()
+        stats = {'syncs': 0, 'batches': 0}
+        if write_behind:
+            log = get_log()
+            while log.stats()['committed'] < log.stats()['appended']:
+                time.sleep(0.001)
+            stats = log.stats()
+        # Tempo entre a última resposta e a última mensagem visível no banco
+        visible = (time.perf_counter() - acked) * 1000
+        stored = ContactMessage.objects.count()
+        self.stdout.write(
+            f"{name:16} {result['mean_ms']:9.3f} {result['p50_ms']:9.3f} {result['p99_ms']:9.3f} "
+            f"{result['ops_per_sec']:9.0f} {f'+{visible:.0f} ms':>9} {stats['syncs']:7d} "
+            f"{stats['batches']:6d} {result['errors']:6d}"
+        )
+        for error, count in result['error_types'].items():
+            self.stdout.write(f'    {count}x {error}')
+        if stored != result['count']:
+            self.stdout.write(self.style.ERROR(f'    {stored} no banco para {result["count"]} respostas'))
+
+    def crash(self, directory, options):
+        """Queda do processo antes do lote: aceitas, só no log, e depois reaplicadas"""
+        ContactMessage.objects.all().delete()
+        total = options['crash_messages']
+        log = WriteBehindLog(directory, fsync=True, flush_interval=3600, batch_size=total + 1)
+        with override_settings(CONTACT_WRITE_BEHIND=True):
+            for i in range(total):
+                log.append({
+                    'id': f'00000000-0000-4000-8000-{i:012d}',
+                    **payload(i),
+                    'ip_address': '10.0.0.1',
+                    'content_hash': '',
+                    'created_at': '2026-01-01T00:00:00+00:00',
+                    'notify': False,
+                })
+        # "Morte" do processo: nada chegou ao banco, a trava do segmento é
+        # liberada e a última escrita ficou pela metade
+        log._stop.set()
+        log._wakeup.set()
+        log._buffer.clear()
+        for segment in log._segments:
+            segment.file.write(b'{"id": "incomple')
+            segment.file.close()
+        before = ContactMessage.objects.count()
+
+        start = time.perf_counter()
+        recovered = WriteBehindLog(directory, batch_size=options['batch_size']).replay()
+        elapsed = (time.perf_counter() - start) * 1000
+        again = WriteBehindLog(directory).replay()
+        self.stdout.write(
+            f'\nqueda com {total} mensagens aceitas: {before} no banco antes, {recovered} recuperadas '
+            f'pela reaplicação em {elapsed:.0f} ms (linha incompleta ignorada), '
+            f'{ContactMessage.objects.count()} no banco, {again} na segunda reaplicação, '
+            f'{len(list(directory.glob("*.wal")))} logs restantes'
+        )
@@ -0,0 +1,89 @@
+import random
+import sys
+import tempfile
+import time
+from ipaddress import IPv4Address, IPv6Address, ip_address, ip_network
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from contact.ipfilter import IPFilter
+
+
+def random_network(rng, v6_ratio):
+    if rng.random() < v6_ratio:
+        prefix = rng.randint(32, 64)
+        return ip_network((rng.getrandbits(128), prefix), strict=False)
+    prefix = rng.randint(16, 32)
+    return ip_network((rng.getrandbits(32), prefix), strict=False)
+
+
+def random_address(rng, v6_ratio):
+    if rng.random() < v6_ratio:
+        return str(IPv6Address(rng.getrandbits(128)))
+    return str(IPv4Address(rng.getrandbits(32)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Listas de IP com muitas faixas: tempo de carga do arquivo, memória '
+        'das faixas mescladas e consultas por segundo (com o parse do IP), '
+        'contra a varredura linear com ipaddress em uma lista menor.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ranges', type=int, default=300000)
+        parser.add_argument('--lookups', type=int, default=200000)
+        parser.add_argument('--v6-ratio', type=float, default=0.1, help='fração de faixas e consultas IPv6')
+        parser.add_argument('--naive-ranges', type=int, default=1000, help='faixas na varredura linear de referência')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        networks = [random_network(rng, options['v6_ratio']) for _ in range(options['ranges'])]
+        # Metade das consultas cai dentro de alguma faixa
+        addresses = []
+        for i in range(options['lookups']):
+            if i % 2:
+                network = networks[rng.randrange(len(networks))]
+                offset = rng.randrange(network.num_addresses)
+                addresses.append(str(network.network_address + offset))
+            else:
+                addresses.append(random_address(rng, options['v6_ratio']))
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'blocklist.txt'
+            path.write_text(''.join(f'{network}\n' for network in networks))
+            start = time.perf_counter()
+            ip_filter = IPFilter(str(path), '')
+            load = time.perf_counter() - start
+
+        ranges = ip_filter.blocked._ranges
+        size = sum(sys.getsizeof(part) for part in ranges[4]) + sum(
+            sys.getsizeof(part) + sum(sys.getsizeof(n) for n in part) for part in ranges[6]
+        )
+        self.stdout.write(
+            f"{options['ranges']} faixas -> {len(ip_filter.blocked)} intervalos mesclados, "
+            f"carga em {load * 1000:.0f} ms, {size / 1024 / 1024:.1f} MiB"
+        )
+
+        is_blocked = ip_filter.is_blocked
+        start = time.perf_counter()
+        hits = sum(1 for address in addresses if is_blocked(address))
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'intervalos + bisect    {len(addresses) / elapsed:12,.0f} consultas/s '
+            f'({elapsed / len(addresses) * 1e6:.2f} µs cada, {hits} bloqueados)'
+        )
+
+        naive = networks[:options['naive_ranges']]
+        sample = addresses[:max(1, min(len(addresses), 2000))]
+        start = time.perf_counter()
+        for address in sample:
+            parsed = ip_address(address)
+            any(parsed in network for network in naive)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"varredura linear ({len(naive)} faixas) {len(sample) / elapsed:8,.0f} consultas/s "
+            f'({elapsed / len(sample) * 1e6:.2f} µs cada)'
+        )
@@ -0,0 +1,79 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from contact.benchmarks import run_concurrent
+from contact.logs import JSONFormatter, NonBlockingQueueHandler
+
+
+class SlowStream:
+    """stdout lento (pipe cheio, coletor de logs atrasado): cada write demora `delay`"""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, data):
+        time.sleep(self.delay)
+        self.lines += 1
+
+    def flush(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Latência de logger.info nas threads da aplicação com um stdout lento: '
+        'StreamHandler síncrono (LOG_FORMAT=text) x fila com thread de escrita '
+        '(LOG_FORMAT=json), e quantos registros a fila descartou ou amostrou.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=5000)
+        parser.add_argument('--concurrency', type=int, default=4, help='threads registrando ao mesmo tempo')
+        parser.add_argument('--write-ms', type=float, default=0.2, help='tempo de cada escrita no stdout')
+        parser.add_argument('--capacity', type=int, default=10000, help='capacidade da fila (LOG_QUEUE_SIZE)')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"{options['records']} registros, {options['concurrency']} threads, "
+            f"escrita de {options['write_ms']} ms\n"
+        )
+        self.stdout.write(
+            f"{'handler':14} {'média ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'máx ms':>9} {'escritos':>9} {'perdidos':>9}"
+        )
+        for name in ('síncrono', 'fila'):
+            stream = SlowStream(options['write_ms'] / 1000)
+            if name == 'síncrono':
+                handler = logging.StreamHandler(stream)
+                handler.setFormatter(logging.Formatter('{levelname} {asctime} {module} {message}', style='{'))
+            else:
+                handler = NonBlockingQueueHandler(capacity=options['capacity'], stream=stream)
+                handler.setFormatter(JSONFormatter())
+
+            logger = logging.getLogger(f'contact.bench.{len(name)}')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            try:
+                result = run_concurrent(
+                    lambda i: logger.info(
+                        'Nova mensagem de contato: %s (%s)', f'Remetente {i}', f'r{i}@example.com',
+                        extra={'message_id': i, 'ip': '10.0.0.1'},
+                    ),
+                    options['records'],
+                    options['concurrency'],
+                )
+            finally:
+                logger.removeHandler(handler)
+                handler.close()
+
+            lost = 0
+            if isinstance(handler, NonBlockingQueueHandler):
+                stats = handler.stats()
+                lost = stats['dropped'] + stats['sampled_out']
+            self.stdout.write(
+                f"{name:14} {result['mean_ms']:9.3f} {result['p50_ms']:9.3f} {result['p99_ms']:9.3f} "
+                f"{result['max_ms']:9.3f} {stream.lines:9d} {lost:9d}"
+            )
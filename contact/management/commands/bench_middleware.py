@@ -0,0 +1,112 @@
+import io
+import itertools
+import json
+import logging
+import tempfile
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from contact.benchmarks import isolated_database, summarize, time_calls
+from contact.management.commands.bench_contact import client_ip, contact_payload
+
+VARIANTS = [('completa', False), ('enxuta', True)]
+
+
+def make_environ(method, path, i, body=b''):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'HTTP_HOST': 'testserver',
+        'SERVER_NAME': 'testserver',
+        'REMOTE_ADDR': client_ip(i),
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    setup_testing_defaults(environ)
+    return environ
+
+
+class Command(BaseCommand):
+    help = (
+        'Custo por requisição da pilha de middleware nas rotas /api/: a pilha '
+        'completa do MIDDLEWARE contra o atalho do LeanAPIMiddleware, pelo '
+        'WSGIHandler do Django (sem rede). Roda em um banco descartável.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='requisições por rota e variante')
+        parser.add_argument('--rounds', type=int, default=3, help='rodadas alternando as variantes')
+
+    def handle(self, *args, **options):
+        total = options['requests']
+        samples = {}
+        with tempfile.TemporaryDirectory() as tmp, isolated_database(), override_settings(
+            SENDGRID_API_KEY='',
+            CONTACT_DEDUP_ACTION='off',
+            THROTTLE_REDIS_URL='',
+            THROTTLE_SQLITE_PATH=str(Path(tmp) / 'throttle.sqlite3'),
+        ):
+            logging.disable(logging.ERROR)
+            try:
+                handlers = {}
+                for name, lean in VARIANTS:
+                    with override_settings(API_LEAN_MIDDLEWARE=lean):
+                        handlers[name] = WSGIHandler()
+
+                routes = self.routes(total)
+                offset = 0
+                for _ in range(options['rounds']):
+                    for name, _lean in VARIANTS:
+                        for route, request in routes.items():
+                            operation = self.operation(handlers[name], request, offset)
+                            operation(0)
+                            counter = itertools.count(1)
+                            samples.setdefault((route, name), []).extend(
+                                time_calls(lambda: operation(next(counter)), total)
+                            )
+                            offset += total + 1
+            finally:
+                logging.disable(logging.NOTSET)
+
+        self.report(samples)
+
+    def routes(self, total):
+        payloads = [json.dumps(contact_payload(i)).encode('utf-8') for i in range(total + 1)]
+        return {
+            'GET /api/contact/health/': lambda i: make_environ('GET', '/api/contact/health/', i),
+            'GET /api/contact/ready/': lambda i: make_environ('GET', '/api/contact/ready/', i),
+            'POST /api/contact/send/': lambda i: make_environ('POST', '/api/contact/send/', i, payloads[i % len(payloads)]),
+        }
+
+    def operation(self, handler, request, offset):
+        def run(i):
+            status = []
+            # IP diferente por requisição para não cair no throttle
+            body = handler(request(offset + i), lambda s, h, e=None: status.append(s))
+            b''.join(body)
+            body.close()
+            if status[0][:1] not in ('2', '3'):
+                raise ValueError(status[0])
+        return run
+
+    def report(self, samples):
+        self.stdout.write(f"{'rota':28} {'pilha':9} {'média ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+        routes = list(dict.fromkeys(route for route, _ in samples))
+        for route in routes:
+            for name, _lean in VARIANTS:
+                result = summarize(samples[(route, name)])
+                self.stdout.write(
+                    f"{route:28} {name:9} {result['mean_ms']:9.3f} {result['p50_ms']:9.3f} {result['p99_ms']:9.3f}"
+                )
+        self.stdout.write('')
+        for route in routes:
+            full = summarize(samples[(route, 'completa')])['p50_ms']
+            lean = summarize(samples[(route, 'enxuta')])['p50_ms']
+            self.stdout.write(
+                f'{route:28} economia {(full - lean) * 1000:7.1f} µs por requisição (p50, {(full - lean) / full * 100:.0f}%)'
+            )
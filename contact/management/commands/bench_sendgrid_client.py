@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail
+
+from contact.benchmarks import FakeSendGridServer, summarize
+from contact.sendgrid_client import SendGridClient
+
+
+def make_mail():
+    return Mail(
+        from_email='portfolio@example.com',
+        to_emails='contato@example.com',
+        subject='Contato: benchmark',
+        html_content='<p>' + 'x' * 4000 + '</p>',
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compara um SendGridAPIClient novo por envio com o cliente com pool, contra um servidor local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--pool-size', type=int, default=4)
+        parser.add_argument('--latency', type=float, default=0.0, help='Latência simulada do servidor (s)')
+
+    def run(self, label, send, requests, concurrency):
+        samples = []
+
+        def timed():
+            start = time.perf_counter()
+            send()
+            samples.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(timed) for _ in range(requests)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        stats = summarize(samples)
+        self.stdout.write(
+            f"{label:28} {requests / elapsed:8.1f} envios/s | p50 {stats['p50_ms']:6.2f} ms | "
+            f"p99 {stats['p99_ms']:6.2f} ms"
+        )
+
+    def handle(self, *args, **options):
+        requests = options['requests']
+        concurrency = options['concurrency']
+        mail = make_mail()
+
+        with FakeSendGridServer(latency=options['latency']) as server:
+            self.run(
+                'SendGridAPIClient por envio',
+                lambda: SendGridAPIClient('SG.bench', host=server.url).send(mail),
+                requests, concurrency,
+            )
+            self.stdout.write(f'{"":28} conexões TCP abertas: {server.connections}')
+
+        with FakeSendGridServer(latency=options['latency']) as server:
+            client = SendGridClient('SG.bench', host=server.url, pool_size=options['pool_size'])
+            self.run('SendGridClient com pool', lambda: client.send(mail), requests, concurrency)
+            stats = client.stats()
+            self.stdout.write(
+                f'{"":28} conexões TCP abertas: {server.connections} | '
+                f"abertas: {stats['opened']} | reaproveitadas: {stats['reused']} | "
+                f"refeitas: {stats['reconnects']} | descartadas: {stats['discarded']}"
+            )
+            client.close()
@@ -0,0 +1,181 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from http.client import HTTPConnection
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Dependências pesadas que não devem ser carregadas só para subir o servidor
+HEAVY_MODULES = ['sendgrid', 'prometheus_client']
+
+# Roda em um interpretador novo: importa a aplicação WSGI e faz duas
+# requisições direto no callable (sem rede)
+PROBE = '''
+import io, json, os, sys, time
+from wsgiref.util import setup_testing_defaults
+
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+from backend.wsgi import application
+imported = time.perf_counter()
+
+from django.conf import settings
+host = next((h.lstrip('.') for h in settings.ALLOWED_HOSTS if h != '*'), 'localhost')
+
+def request():
+    environ = {'PATH_INFO': sys.argv[1], 'HTTP_HOST': host, 'SERVER_NAME': host}
+    setup_testing_defaults(environ)
+    status = []
+    body = application(environ, lambda s, h, e=None: status.append(s))
+    try:
+        b''.join(body)
+    finally:
+        getattr(body, 'close', lambda: None)()
+    return int(status[0].split()[0])
+
+status = request()
+first = time.perf_counter()
+request()
+second = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_ms': (first - imported) * 1000,
+    'second_ms': (second - first) * 1000,
+    'status': status,
+    'modules': len(sys.modules),
+    'heavy': [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark de partida a frio: tempo de import da aplicação WSGI e da '
+        'primeira resposta em processos novos e, com --server, tempo até a '
+        'primeira resposta do gunicorn (com e sem preload).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='processos novos por medição')
+        parser.add_argument('--path', default='/api/contact/health/', help='rota da primeira requisição')
+        parser.add_argument('--server', action='store_true', help='mede também o gunicorn com gunicorn.conf.py')
+        parser.add_argument('--max-import-ms', type=float, help='falha se a mediana do import passar disso')
+        parser.add_argument('--max-first-response-ms', type=float, help='falha se a mediana até a 1ª resposta passar disso')
+        parser.add_argument('--output', help='grava os resultados em JSON neste arquivo')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            self.tmp = Path(tmp)
+            env = dict(
+                os.environ,
+                DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'backend.settings'),
+                PROMETHEUS_MULTIPROC_DIR=str(self.tmp / 'metrics'),
+            )
+            os.makedirs(env['PROMETHEUS_MULTIPROC_DIR'])
+            results = {'process': self.bench_process(env, options)}
+            if options['server']:
+                results['server'] = {
+                    'preload': self.bench_server(env, options, preload=True),
+                    'no_preload': self.bench_server(env, options, preload=False),
+                }
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+            self.stdout.write(f"Resultados gravados em {options['output']}")
+
+        failures = []
+        process = results['process']
+        if options['max_import_ms'] and process['import_ms'] > options['max_import_ms']:
+            failures.append(f"import {process['import_ms']:.1f} ms > {options['max_import_ms']} ms")
+        if options['max_first_response_ms'] and process['total_ms'] > options['max_first_response_ms']:
+            failures.append(f"primeira resposta {process['total_ms']:.1f} ms > {options['max_first_response_ms']} ms")
+        if failures:
+            raise CommandError('Regressão na partida: ' + '; '.join(failures))
+
+    def _run_env(self, env, i):
+        # Estado do throttle novo a cada execução, para não medir respostas 429
+        path = self.tmp / f'throttle-{time.monotonic_ns()}-{i}.sqlite3'
+        return dict(env, THROTTLE_SQLITE_PATH=str(path))
+
+    def bench_process(self, env, options):
+        runs = []
+        for i in range(options['runs']):
+            started = time.perf_counter()
+            completed = subprocess.run(
+                [sys.executable, '-c', PROBE, options['path'], json.dumps(HEAVY_MODULES)],
+                capture_output=True, text=True, env=self._run_env(env, i), cwd=settings.BASE_DIR,
+            )
+            wall = time.perf_counter() - started
+            if completed.returncode != 0:
+                raise CommandError(f'Falha no processo de medição:\n{completed.stderr}')
+            run = json.loads(completed.stdout.strip().splitlines()[-1])
+            run['wall_ms'] = wall * 1000
+            runs.append(run)
+
+        result = {
+            key: statistics.median(run[key] for run in runs)
+            for key in ('import_ms', 'first_ms', 'second_ms', 'wall_ms', 'modules')
+        }
+        result['total_ms'] = result['import_ms'] + result['first_ms']
+        result['status'] = runs[-1]['status']
+        result['heavy'] = runs[-1]['heavy']
+
+        self.stdout.write(f"\nProcesso novo (mediana de {options['runs']}, {options['path']} -> {result['status']})")
+        self.stdout.write(f"    import da aplicação   {result['import_ms']:8.1f} ms  ({result['modules']:.0f} módulos)")
+        self.stdout.write(f"    primeira requisição   {result['first_ms']:8.1f} ms")
+        self.stdout.write(f"    segunda requisição    {result['second_ms']:8.1f} ms")
+        self.stdout.write(f"    processo inteiro      {result['wall_ms']:8.1f} ms")
+        self.stdout.write(f"    pesadas carregadas    {', '.join(result['heavy']) or 'nenhuma'}")
+        return result
+
+    def bench_server(self, env, options, preload):
+        samples = []
+        for i in range(options['runs']):
+            port = free_port()
+            server_env = dict(self._run_env(env, i), GUNICORN_PRELOAD='true' if preload else 'false')
+            server_env.pop('PORT', None)
+            started = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', 'backend.wsgi', '--bind', f'127.0.0.1:{port}'],
+                cwd=settings.BASE_DIR, env=server_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                samples.append(self._first_response(port, options['path'], started, process))
+            finally:
+                process.terminate()
+                process.wait(timeout=30)
+
+        label = 'com preload' if preload else 'sem preload'
+        result = {'first_response_ms': statistics.median(samples) * 1000, 'runs': len(samples)}
+        self.stdout.write(f"\ngunicorn {label} (mediana de {len(samples)})")
+        self.stdout.write(f"    até a primeira resposta {result['first_response_ms']:8.1f} ms")
+        return result
+
+    def _first_response(self, port, path, started, process, timeout=60):
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise CommandError('O gunicorn terminou antes de responder')
+            connection = HTTPConnection('127.0.0.1', port, timeout=5)
+            try:
+                connection.request('GET', path, headers={'Host': 'localhost'})
+                connection.getresponse().read()
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.005)
+            finally:
+                connection.close()
+        raise CommandError(f'Sem resposta do gunicorn em {timeout}s')
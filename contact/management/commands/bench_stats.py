@@ -0,0 +1,89 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from contact import stats
+from contact.benchmarks import isolated_database, seed_messages, summarize, time_calls
+from contact.models import ContactMessage
+
+
+def raw_daily(since):
+    """Relatório por dia agrupando a tabela de mensagens (o que a tabela agregada evita)"""
+    return list(
+        ContactMessage.objects.filter(created_at__gte=since)
+        .annotate(date=TruncDate('created_at'))
+        .values('date')
+        .annotate(total=Count('pk'), unread=Count('pk', filter=Q(is_read=False)))
+        .order_by('date')
+    )
+
+
+def raw_hourly(since):
+    return list(
+        ContactMessage.objects.filter(created_at__gte=since)
+        .annotate(hour=TruncHour('created_at'))
+        .values('hour')
+        .annotate(total=Count('pk'), unread=Count('pk', filter=Q(is_read=False)))
+        .order_by('hour')
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Relatórios por dia e por hora agrupando a tabela de mensagens x lendo '
+        'a tabela agregada (contact.stats), custo do ajuste incremental por '
+        'mensagem gravada e tempo do backfill (rebuild_stats).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=200000)
+        parser.add_argument('--days', type=int, default=365, help='período coberto pelas mensagens')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with isolated_database():
+            self.stdout.write(f"Populando {options['rows']} mensagens em {options['days']} dias...")
+            seed_messages(options['rows'], days=options['days'])
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            start = time.perf_counter()
+            hours = stats.rebuild()
+            self.stdout.write(f'rebuild_stats: {hours} horas em {(time.perf_counter() - start) * 1000:.0f} ms\n')
+
+            now = timezone.now()
+            reports = [
+                ('por dia, 30 dias', lambda: raw_daily(now - timedelta(days=30)),
+                 lambda: stats.daily(now - timedelta(days=30))),
+                ('por dia, tudo', lambda: raw_daily(now - timedelta(days=options['days'] + 1)),
+                 lambda: stats.daily(now - timedelta(days=options['days'] + 1))),
+                ('por hora, 48 h', lambda: raw_hourly(now - timedelta(hours=48)),
+                 lambda: stats.hourly(now - timedelta(hours=48))),
+                ('totais, tudo', lambda: ContactMessage.objects.aggregate(
+                    total=Count('pk'), unread=Count('pk', filter=Q(is_read=False))), stats.totals),
+            ]
+            self.stdout.write(f"{'relatório':18} {'GROUP BY p50 ms':>16} {'agregada p50 ms':>16} {'x':>7}")
+            for label, raw, rollup in reports:
+                before = summarize(time_calls(raw, options['repeat']))
+                after = summarize(time_calls(rollup, options['repeat']))
+                self.stdout.write(
+                    f"{label:18} {before['p50_ms']:16.2f} {after['p50_ms']:16.3f} "
+                    f"{before['p50_ms'] / after['p50_ms']:7.0f}"
+                )
+
+            # Custo do ajuste incremental em cada gravação (UPDATE na linha da hora)
+            message = ContactMessage.objects.first()
+
+            def increment():
+                with transaction.atomic():
+                    stats.record_created([message])
+
+            result = summarize(time_calls(increment, options['repeat'] * 50))
+            self.stdout.write(
+                f"\najuste por mensagem gravada: p50 {result['p50_ms']:.3f} ms, p99 {result['p99_ms']:.3f} ms"
+            )
@@ -0,0 +1,95 @@
+import multiprocessing
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.request import Request
+from rest_framework.throttling import AnonRateThrottle
+
+from contact.throttling import SharedAnonRateThrottle, get_backend
+
+
+def throttle_class(base, rate):
+    return type(f'Bench{base.__name__}', (base,), {'scope': 'bench', 'rate': rate})
+
+
+def make_requests(keys):
+    factory = RequestFactory()
+    return [Request(factory.post('/', REMOTE_ADDR=f'10.0.{i // 250}.{i % 250 + 1}')) for i in range(keys)]
+
+
+def run_checks(throttle, requests, total):
+    allowed = 0
+    start = time.perf_counter()
+    for i in range(total):
+        allowed += throttle().allow_request(requests[i % len(requests)], None)
+    return allowed, time.perf_counter() - start
+
+
+def _worker(throttle, total, results):
+    results.put(run_checks(throttle, make_requests(1), total)[0])
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede verificações de throttle por segundo (DRF com LocMemCache x janela '
+        'deslizante compartilhada) e quantas requisições passam com vários processos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=20000)
+        parser.add_argument('--keys', type=int, default=100, help='IPs distintos')
+        parser.add_argument('--rate', default='1000/hour', help='taxa usada na medição de throughput')
+        parser.add_argument('--processes', type=int, default=4)
+        parser.add_argument('--limit', type=int, default=5, help='limite por hora no teste com vários processos')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            backends = [('locmem (DRF)', AnonRateThrottle, {})]
+            backends.append(('sqlite', SharedAnonRateThrottle, {
+                'THROTTLE_REDIS_URL': '', 'THROTTLE_SQLITE_PATH': str(Path(tmp) / 'throttle.sqlite3'),
+            }))
+            if settings.THROTTLE_REDIS_URL:
+                backends.append(('redis', SharedAnonRateThrottle, {}))
+
+            requests = make_requests(options['keys'])
+            self.stdout.write(
+                f"{'backend':14} {'verificações/s':>15} {'us/verificação':>15} "
+                f"{'permitidas (' + str(options['processes']) + ' processos)':>28}"
+            )
+            for label, base, overrides in backends:
+                with override_settings(**overrides):
+                    rate_throttle = throttle_class(base, options['rate'])
+                    self.reset(base)
+                    run_checks(rate_throttle, requests, min(options['checks'], 1000))
+                    self.reset(base)
+                    _, elapsed = run_checks(rate_throttle, requests, options['checks'])
+
+                    self.reset(base)
+                    shared = self.multiprocess(
+                        throttle_class(base, f"{options['limit']}/hour"), options['processes'], options['limit'] * 10
+                    )
+                self.stdout.write(
+                    f"{label:14} {options['checks'] / elapsed:15.0f} {elapsed / options['checks'] * 1e6:15.1f} "
+                    f"{shared:>18} (limite {options['limit']})"
+                )
+
+    def reset(self, base):
+        cache.clear()
+        if base is not AnonRateThrottle:
+            get_backend().clear()
+
+    def multiprocess(self, throttle, processes, attempts):
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [context.Process(target=_worker, args=(throttle, attempts, results)) for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get() for _ in workers)
+        for worker in workers:
+            worker.join()
+        return allowed
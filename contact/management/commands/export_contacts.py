@@ -0,0 +1,45 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.exporter import FORMATS, export_stream, filter_messages, parse_bound
+
+
+class Command(BaseCommand):
+    help = 'Exporta mensagens de contato em CSV ou JSONL (opcionalmente gzip), em streaming'
+
+    def add_arguments(self, parser):
+        parser.add_argument('-o', '--output', default='-', help='Arquivo de saída, ou "-" para stdout (padrão)')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Comprime a saída (automático para arquivos .gz)')
+        parser.add_argument('--since', help='Data/hora inicial (AAAA-MM-DD ou ISO 8601), inclusiva')
+        parser.add_argument('--until', help='Data/hora final (AAAA-MM-DD ou ISO 8601); uma data inclui o dia todo')
+        read = parser.add_mutually_exclusive_group()
+        read.add_argument('--read', dest='is_read', action='store_const', const=True, help='Só mensagens lidas')
+        read.add_argument('--unread', dest='is_read', action='store_const', const=False, help='Só mensagens não lidas')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Linhas por leitura do cursor (padrão: CONTACT_EXPORT_CHUNK_SIZE)')
+
+    def handle(self, *args, **options):
+        try:
+            since = parse_bound(options['since']) if options['since'] else None
+            until = parse_bound(options['until'], end=True) if options['until'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        queryset = filter_messages(since=since, until=until, is_read=options['is_read'])
+        chunks = export_stream(queryset, options['format'], compress, options['chunk_size'])
+
+        stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+        finally:
+            if output == '-':
+                stream.flush()
+            else:
+                stream.close()
+
+        if output != '-':
+            self.stderr.write(self.style.SUCCESS(f'Mensagens exportadas para {output}'))
@@ -0,0 +1,56 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from contact.importer import import_messages, iter_jsonl
+
+
+class Command(BaseCommand):
+    help = 'Importa mensagens de contato de um arquivo JSON (array) ou JSONL, em blocos com bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Arquivo de entrada, ou "-" para stdin')
+        parser.add_argument('--format', choices=['auto', 'json', 'jsonl'], default='auto')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Itens por bulk_create (padrão: CONTACT_BULK_CHUNK_SIZE)')
+        parser.add_argument('--notify', action='store_true', help='Enfileira as notificações por email')
+
+    def handle(self, *args, **options):
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            fmt = options['format']
+            if fmt == 'auto':
+                # Array JSON começa com '[', JSONL com '{'
+                first = stream.read(1)
+                while first.isspace():
+                    first = stream.read(1)
+                fmt = 'json' if first == '[' else 'jsonl'
+                head = first
+            else:
+                head = ''
+
+            if fmt == 'json':
+                try:
+                    items = json.loads(head + stream.read())
+                except ValueError as e:
+                    raise CommandError(f'JSON inválido: {str(e)}')
+                if not isinstance(items, list):
+                    raise CommandError('O arquivo JSON deve conter um array de mensagens.')
+            else:
+                items = iter_jsonl(self._lines(head, stream))
+
+            result = import_messages(items, notify=options['notify'], chunk_size=options['chunk_size'])
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        for error in result['errors']:
+            self.stderr.write(f"Item {error['index']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{result['created']} mensagens importadas, {result['failed']} com erro"
+        ))
+
+    def _lines(self, head, stream):
+        first_line = head + stream.readline()
+        yield first_line
+        yield from stream
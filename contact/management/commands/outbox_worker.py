@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from contact import outbox
+
+
+class Command(BaseCommand):
+    help = 'Processa a fila de notificações por email (worker dedicado)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Número de threads (padrão: EMAIL_OUTBOX_WORKERS)')
+        parser.add_argument('--poll', type=int, default=None, help='Intervalo de polling em segundos')
+        parser.add_argument('--once', action='store_true', help='Drena a fila uma vez e sai')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            total = {'claimed': 0, 'flushes': 0, 'sent': 0, 'retry': 0, 'dead': 0}
+            while True:
+                result = outbox.process_outbox()
+                if not result['claimed']:
+                    break
+                if result['flushes']:
+                    self.stdout.write(f"Flush: {result['claimed']} mensagens em {result['flushes']} envio(s)")
+                for key, value in result.items():
+                    total[key] += value
+            self.stdout.write(
+                f"Processadas: {total['claimed']} | envios: {total['flushes']} | enviadas: {total['sent']} | "
+                f"reagendadas: {total['retry']} | descartadas: {total['dead']}"
+            )
+            return
+
+        pool = outbox.OutboxWorkerPool(size=options['workers'], poll_interval=options['poll'])
+        pool.wake()
+        self.stdout.write(f'Worker de notificações rodando com {pool.size} threads (Ctrl+C para sair)')
+        try:
+            pool.join()
+        except KeyboardInterrupt:
+            pool.stop()
+            pool.join(timeout=10)
@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from contact import inbox, stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula as estatísticas por hora e o resumo da caixa de entrada a '
+        'partir da tabela de mensagens (backfill ou correção depois de '
+        'alterações feitas direto no banco)'
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        hours = stats.rebuild()
+        inbox.rebuild()
+        self.stdout.write(f'Estatísticas recalculadas: {hours} horas com mensagens em {time.perf_counter() - start:.1f} s')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from contact.wal import get_log
+
+
+class Command(BaseCommand):
+    help = (
+        'Grava no banco as mensagens dos logs de gravação adiada deixados por '
+        'processos que morreram (CONTACT_WAL_DIR) e apaga os logs. Segmentos '
+        'em uso por processos vivos são ignorados.'
+    )
+
+    def handle(self, *args, **options):
+        log = get_log()
+        total = log.replay()
+        self.stdout.write(f'Mensagens recuperadas: {total} (em {log.directory})')
@@ -0,0 +1,146 @@
+"""
+Métricas no formato do Prometheus (expostas em /metrics).
+
+Com PROMETHEUS_MULTIPROC_DIR definido (o gunicorn.conf.py define um padrão),
+cada worker grava seus valores em arquivos mmap nesse diretório e /metrics
+soma os de todos os processos. Sem prometheus_client instalado, ou sem
+METRICS_TOKEN fora do DEBUG, as métricas viram no-ops.
+"""
+import hmac
+import logging
+import os
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.views.decorators.http import require_GET
+
+logger = logging.getLogger(__name__)
+
+if settings.METRICS_TOKEN or settings.DEBUG:
+    try:
+        import prometheus_client
+        from prometheus_client import CollectorRegistry, Counter, Gauge, Histogram, multiprocess
+        from prometheus_client.core import GaugeMetricFamily
+    except ImportError:
+        prometheus_client = None
+else:
+    # /metrics não responde sem token fora do DEBUG: não vale carregar o
+    # prometheus_client (dezenas de ms na partida a frio)
+    prometheus_client = None
+
+
+class _NoopMetric:
+    def labels(self, *args, **kwargs):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def observe(self, amount):
+        pass
+
+    def time(self):
+        return nullcontext()
+
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+if prometheus_client is not None:
+    REQUEST_LATENCY = Histogram(
+        'contact_http_request_duration_seconds', 'Latência das requisições por view',
+        ['view', 'method', 'status'],
+    )
+    REQUEST_QUERIES = Histogram(
+        'contact_http_request_db_queries', 'Consultas SQL por requisição',
+        ['view'], buckets=QUERY_COUNT_BUCKETS,
+    )
+    REQUEST_DB_TIME = Histogram(
+        'contact_http_request_db_seconds', 'Tempo total em SQL por requisição',
+        ['view'], buckets=FAST_BUCKETS,
+    )
+    THROTTLE_REJECTIONS = Counter(
+        'contact_throttle_rejections_total', 'Requisições recusadas pelo rate limiting', ['scope'],
+    )
+    IP_FILTER_REJECTIONS = Counter(
+        'contact_ip_filter_rejections_total', 'Requisições recusadas pelas listas de IP',
+    )
+    EMAIL_RENDER_LATENCY = Histogram(
+        'contact_email_render_seconds', 'Tempo de renderização dos emails', ['kind'], buckets=FAST_BUCKETS,
+    )
+    EMAIL_SEND_LATENCY = Histogram(
+        'contact_email_send_seconds', 'Latência dos envios ao SendGrid', ['kind', 'outcome'],
+    )
+    OUTBOX_BUSY_WORKERS = Gauge(
+        'contact_outbox_busy_workers', 'Threads do pool de notificações enviando emails',
+        multiprocess_mode='livesum',
+    )
+else:
+    REQUEST_LATENCY = REQUEST_QUERIES = REQUEST_DB_TIME = _NoopMetric()
+    THROTTLE_REJECTIONS = EMAIL_RENDER_LATENCY = EMAIL_SEND_LATENCY = OUTBOX_BUSY_WORKERS = _NoopMetric()
+    IP_FILTER_REJECTIONS = _NoopMetric()
+
+
+class OutboxCollector:
+    """
+    Profundidade da fila de notificações, consultada no banco a cada scrape.
+
+    Não usa o resultado em cache das verificações de prontidão: ele é de
+    cada processo e só existe nos workers que já atenderam /ready/.
+    """
+
+    def collect(self):
+        from . import health
+
+        try:
+            outbox = health.check_outbox()
+        except Exception as e:
+            logger.warning('Falha ao consultar a fila de notificações para as métricas: %s', e)
+            return
+        yield GaugeMetricFamily('contact_outbox_pending', 'Notificações pendentes na fila', value=outbox['pending'])
+        yield GaugeMetricFamily('contact_outbox_dead', 'Notificações que esgotaram as tentativas', value=outbox['dead'])
+        yield GaugeMetricFamily(
+            'contact_outbox_oldest_pending_seconds', 'Idade da notificação pendente mais antiga',
+            value=outbox['oldest_pending_seconds'],
+        )
+
+
+class _DefaultCollector:
+    # Métricas do registro padrão do processo (modo sem multiprocess)
+    def collect(self):
+        return prometheus_client.REGISTRY.collect()
+
+
+def _registry():
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = CollectorRegistry()
+        registry.register(_DefaultCollector())
+    registry.register(OutboxCollector())
+    return registry
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Exposição das métricas. Com METRICS_TOKEN definido exige
+    `Authorization: Bearer <token>`; sem token, só responde com DEBUG.
+    """
+    token = settings.METRICS_TOKEN
+    if prometheus_client is None or (not token and not settings.DEBUG):
+        raise Http404
+    if token and not hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()
+    ):
+        return HttpResponse(status=401)
+    return HttpResponse(
+        prometheus_client.generate_latest(_registry()),
+        content_type=prometheus_client.CONTENT_TYPE_LATEST,
+    )
+
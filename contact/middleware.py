@@ -0,0 +1,225 @@
+import logging
+import time
+import uuid
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connection
+from django.urls import Resolver404, resolve
+
+from . import logs, metrics
+from .utils import get_client_ip
+
+access_logger = logging.getLogger('contact.access')
+
+
+class QueryTimer:
+    """execute_wrapper que conta as consultas SQL e soma o tempo gasto nelas"""
+
+    __slots__ = ('count', 'elapsed')
+
+    def __init__(self):
+        self.count = 0
+        self.elapsed = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.elapsed += time.perf_counter() - start
+            self.count += 1
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """
+    Latência por view e consultas SQL por requisição (contact.metrics).
+
+    O rótulo é o nome da rota, não o caminho, para manter a cardinalidade
+    baixa. Em views assíncronas o SQL roda em outras threads (conexões
+    próprias) e não entra na contagem de consultas.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start, timer)
+        return response
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, time.perf_counter() - start, None)
+        return response
+
+    def observe(self, request, response, elapsed, timer):
+        view = _view_name(request)
+        metrics.REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(elapsed)
+        if timer is not None:
+            metrics.REQUEST_QUERIES.labels(view).observe(timer.count)
+            metrics.REQUEST_DB_TIME.labels(view).observe(timer.elapsed)
+
+
+class RequestLogMiddleware:
+    """
+    Id por requisição e uma linha de acesso estruturada (LOG_FORMAT='json').
+
+    O id vem do cabeçalho X-Request-ID (quando o proxy já gera um) ou é
+    criado aqui, volta na resposta e é anexado a todos os registros de log
+    feitos durante a requisição (contact.logs). Fica no topo do MIDDLEWARE
+    para a latência cobrir a pilha inteira.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.LOG_FORMAT != 'json':
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        value = request.headers.get('X-Request-ID', '')[:64] or uuid.uuid4().hex
+        return value, logs.request_id.set(value), time.perf_counter()
+
+    def finish(self, request, response, value, token, start):
+        response['X-Request-ID'] = value
+        access_logger.info(
+            '%s %s %s', request.method, request.path, response.status_code,
+            extra={
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'ip': get_client_ip(request),
+                'latency_ms': round((time.perf_counter() - start) * 1000, 2),
+            },
+        )
+        logs.request_id.reset(token)
+        return response
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        value, token, start = self.start(request)
+        return self.finish(request, self.get_response(request), value, token, start)
+
+    async def __acall__(self, request):
+        value, token, start = self.start(request)
+        return self.finish(request, await self.get_response(request), value, token, start)
+
+
+class LeanAPIMiddleware:
+    """
+    Atalho para as rotas da API (API_LEAN_PREFIXES).
+
+    Essas requisições saem da pilha aqui e vão direto para a view: sessão,
+    autenticação do Django, mensagens, CSRF (as views do DRF já são
+    csrf_exempt) e X-Frame-Options não servem a uma API sem estado. O admin
+    segue pela pilha completa, assim como requisições da API com cookie de
+    sessão (a SessionAuthentication do DRF usa o request.user do Django) e
+    caminhos que não resolvem (o CommonMiddleware cuida do APPEND_SLASH).
+
+    Fica logo depois do CorsMiddleware, para os cabeçalhos CORS continuarem
+    valendo.
+
+    O que as rotas do atalho deixam de ter, além das camadas seguintes:
+    - process_view, process_exception e process_template_response dos
+      middlewares seguintes (os deste projeto só usam __call__);
+    - o handler de exceções do Django para a view: uma exceção não tratada
+      pelo DRF vira o 500 do convert_exception_to_response, que ainda envia
+      o got_request_exception e usa o handler500;
+    - o ATOMIC_REQUESTS (o atalho fica desligado se algum banco o usa).
+
+    Só vão pelo atalho as views csrf_exempt (as do DRF e a de envio
+    assíncrono); qualquer outra view sob os prefixos segue a pilha completa.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.API_LEAN_MIDDLEWARE:
+            raise MiddlewareNotUsed
+        if any(db.get('ATOMIC_REQUESTS') for db in settings.DATABASES.values()):
+            # O BaseHandler envolve a view na transação; o atalho não faria isso
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefixes = tuple(settings.API_LEAN_PREFIXES)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            self.lean_response = convert_exception_to_response(self._view_async)
+        else:
+            self.lean_response = convert_exception_to_response(self._view)
+
+    def is_lean(self, request):
+        return request.path_info.startswith(self.prefixes) and settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if self.is_lean(request):
+            return self.lean_response(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if self.is_lean(request):
+            return await self.lean_response(request)
+        return await self.get_response(request)
+
+    @staticmethod
+    def _resolve(request):
+        """Rota da requisição, ou None se ela deve seguir a pilha completa"""
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return None
+        if not getattr(match.func, 'csrf_exempt', False):
+            return None
+        return match
+
+    def _view(self, request):
+        match = self._resolve(request)
+        if match is None:
+            return self.get_response(request)
+        request.resolver_match = match
+        response = match.func(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
+
+    async def _view_async(self, request):
+        match = self._resolve(request)
+        if match is None:
+            return await self.get_response(request)
+        request.resolver_match = match
+        callback = match.func
+        if not iscoroutinefunction(callback):
+            callback = sync_to_async(callback, thread_sensitive=True)
+        response = await callback(request, *match.args, **match.kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = await sync_to_async(response.render, thread_sensitive=True)()
+        return response
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:50
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendente'), ('sending', 'Enviando'), ('sent', 'Enviada'), ('dead', 'Falhou')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Próxima tentativa')),
+                ('locked_by', models.CharField(blank=True, default='', max_length=32, verbose_name='Reservada por')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='Reservada até')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Enviada em')),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='contact.contactmessage', verbose_name='Mensagem')),
+            ],
+            options={
+                'verbose_name': 'Notificação por Email',
+                'verbose_name_plural': 'Notificações por Email',
+                'ordering': ['next_attempt_at'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='contact_outbox_due_idx')],
+            },
+        ),
+    ]
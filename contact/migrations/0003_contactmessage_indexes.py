@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0002_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['-created_at', '-id'], name='contact_msg_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['is_read', '-created_at'], name='contact_msg_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['-created_at'], name='contact_msg_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from contact import search
+    search.install(schema_editor)
+
+
+def uninstall(apps, schema_editor):
+    from contact import search
+    search.uninstall(schema_editor)
+
+
+class Migration(migrations.Migration):
+    """
+    Busca textual: coluna gerada tsvector + índice GIN no PostgreSQL, tabela
+    FTS5 com triggers no SQLite (ver contact/search.py).
+    """
+
+    dependencies = [
+        ('contact', '0003_contactmessage_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
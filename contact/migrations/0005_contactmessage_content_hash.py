@@ -0,0 +1,47 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:10
+
+from django.db import migrations, models
+
+
+def reinstall_search(apps, schema_editor):
+    # No SQLite o AddField/RemoveField recria a tabela e descarta os triggers do FTS5
+    from contact import search
+    if schema_editor.connection.vendor == 'sqlite':
+        search.install_sqlite_fts(schema_editor)
+
+
+def backfill_content_hash(apps, schema_editor):
+    from contact.dedup import content_hash
+    ContactMessage = apps.get_model('contact', 'ContactMessage')
+    batch = []
+    for message in ContactMessage.objects.only('id', 'subject', 'message').iterator(chunk_size=2000):
+        message.content_hash = content_hash(message.subject, message.message)
+        batch.append(message)
+        if len(batch) >= 2000:
+            ContactMessage.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    if batch:
+        ContactMessage.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0004_contactmessage_search'),
+    ]
+
+    operations = [
+        # Ao reverter, roda por último (depois do RemoveField)
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64, verbose_name='Hash do conteúdo'),
+        ),
+        migrations.AddIndex(
+            model_name='contactmessage',
+            index=models.Index(fields=['content_hash', '-created_at'], name='contact_msg_hash_idx'),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+    ]
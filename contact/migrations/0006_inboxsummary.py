@@ -0,0 +1,39 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:26
+
+from django.db import migrations, models
+
+
+def populate_summary(apps, schema_editor):
+    ContactMessage = apps.get_model('contact', 'ContactMessage')
+    InboxSummary = apps.get_model('contact', 'InboxSummary')
+    stats = ContactMessage.objects.aggregate(
+        total=models.Count('pk'),
+        unread=models.Count('pk', filter=models.Q(is_read=False)),
+        last_message_at=models.Max('created_at'),
+    )
+    InboxSummary.objects.create(pk=1, **stats)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0005_contactmessage_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InboxSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('unread', models.IntegerField(default=0, verbose_name='Não lidas')),
+                ('last_message_at', models.DateTimeField(blank=True, null=True, verbose_name='Última mensagem')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Resumo da Caixa de Entrada',
+                'verbose_name_plural': 'Resumo da Caixa de Entrada',
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
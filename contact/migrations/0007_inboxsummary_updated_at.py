@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:36
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def set_updated_at(apps, schema_editor):
+    InboxSummary = apps.get_model('contact', 'InboxSummary')
+    InboxSummary.objects.update(updated_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0006_inboxsummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inboxsummary',
+            name='updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Atualizado em'),
+        ),
+        migrations.RunPython(set_updated_at, migrations.RunPython.noop),
+    ]
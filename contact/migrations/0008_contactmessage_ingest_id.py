@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+def reinstall_search(apps, schema_editor):
+    # No SQLite o AddField com unique=True recria a tabela e descarta os triggers do FTS5
+    from contact import search
+    if schema_editor.connection.vendor == 'sqlite':
+        search.install_sqlite_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0007_inboxsummary_updated_at'),
+    ]
+
+    operations = [
+        # Ao reverter, roda por último (depois do RemoveField)
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='ingest_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True, verbose_name='Id de ingestão'),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.0.1 on 2026-10-18 18:55
+
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models.functions import TruncHour
+
+
+def populate_stats(apps, schema_editor):
+    ContactMessage = apps.get_model('contact', 'ContactMessage')
+    HourlyStats = apps.get_model('contact', 'HourlyStats')
+    rows = (
+        ContactMessage.objects.annotate(bucket=TruncHour('created_at', tzinfo=timezone.utc))
+        .values('bucket')
+        .annotate(total=models.Count('pk'), unread=models.Count('pk', filter=models.Q(is_read=False)))
+        .order_by()
+    )
+    HourlyStats.objects.bulk_create(
+        [HourlyStats(hour=row['bucket'], total=row['total'], unread=row['unread']) for row in rows],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0008_contactmessage_ingest_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(unique=True, verbose_name='Hora')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('unread', models.IntegerField(default=0, verbose_name='Não lidas')),
+            ],
+            options={
+                'verbose_name': 'Estatística por Hora',
+                'verbose_name_plural': 'Estatísticas por Hora',
+                'ordering': ['-hour'],
+            },
+        ),
+        migrations.RunPython(populate_stats, migrations.RunPython.noop),
+    ]
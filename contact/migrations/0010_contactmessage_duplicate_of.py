@@ -0,0 +1,29 @@
+# Generated by Django 5.0.1 on 2026-10-18 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def reinstall_search(apps, schema_editor):
+    # No SQLite o AddField/RemoveField pode recriar a tabela e descartar os triggers do FTS5
+    from contact import search
+    if schema_editor.connection.vendor == 'sqlite':
+        search.install_sqlite_fts(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0009_hourlystats'),
+    ]
+
+    operations = [
+        # Ao reverter, roda por último (depois do RemoveField)
+        migrations.RunPython(migrations.RunPython.noop, reinstall_search),
+        migrations.AddField(
+            model_name='contactmessage',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='contact.contactmessage', verbose_name='Possível duplicata de'),
+        ),
+        migrations.RunPython(reinstall_search, migrations.RunPython.noop),
+    ]
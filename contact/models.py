@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.validators import EmailValidator
+from django.utils import timezone
 
 class ContactMessage(models.Model):
     name = models.CharField(max_length=200, verbose_name='Nome')
@@ -9,11 +10,118 @@ class ContactMessage(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Data de Envio')
     is_read = models.BooleanField(default=False, verbose_name='Lida')
     ip_address = models.GenericIPAddressField(null=True, blank=True, verbose_name='IP')
+    content_hash = models.CharField(max_length=64, blank=True, default='', editable=False, verbose_name='Hash do conteúdo')
+    # Mensagem recente de mesmo conteúdo (ou quase), com CONTACT_DEDUP_ACTION='flag'
+    duplicate_of = models.ForeignKey(
+        'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+        editable=False, verbose_name='Possível duplicata de',
+    )
+    # Id do registro no log de gravação adiada (contact.wal): evita gravar
+    # duas vezes a mesma mensagem ao reaplicar o log
+    ingest_id = models.UUIDField(null=True, blank=True, unique=True, editable=False, verbose_name='Id de ingestão')
 
     class Meta:
         verbose_name = 'Mensagem de Contato'
         verbose_name_plural = 'Mensagens de Contato'
         ordering = ['-created_at']
+        indexes = [
+            # Ordenação padrão do admin (-created_at, -pk) e date_hierarchy
+            models.Index(fields=['-created_at', '-id'], name='contact_msg_created_idx'),
+            # Filtro is_read do admin, já na ordem da listagem
+            models.Index(fields=['is_read', '-created_at'], name='contact_msg_read_created_idx'),
+            # Caixa de entrada: só as não lidas, mais recentes primeiro
+            models.Index(
+                fields=['-created_at'],
+                condition=models.Q(is_read=False),
+                name='contact_msg_unread_idx',
+            ),
+            # Verificação de duplicatas exatas recentes (contact.dedup)
+            models.Index(fields=['content_hash', '-created_at'], name='contact_msg_hash_idx'),
+        ]
 
     def __str__(self):
         return f'{self.name} - {self.subject} ({self.created_at.strftime("%d/%m/%Y %H:%M")})'
+
+
+class EmailOutbox(models.Model):
+    """
+    Fila persistente de notificações por email.
+
+    Cada linha é gravada na mesma transação da ContactMessage e consumida
+    pelos workers de contact.outbox, com novas tentativas e backoff
+    exponencial até o limite configurado (estado "dead").
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pendente'
+        SENDING = 'sending', 'Enviando'
+        SENT = 'sent', 'Enviada'
+        DEAD = 'dead', 'Falhou'
+
+    message = models.ForeignKey(
+        ContactMessage,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name='Mensagem',
+    )
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING, verbose_name='Status')
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Tentativas')
+    next_attempt_at = models.DateTimeField(default=timezone.now, verbose_name='Próxima tentativa')
+    locked_by = models.CharField(max_length=32, blank=True, default='', verbose_name='Reservada por')
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='Reservada até')
+    last_error = models.TextField(blank=True, default='', verbose_name='Último erro')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Criada em')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Enviada em')
+
+    class Meta:
+        verbose_name = 'Notificação por Email'
+        verbose_name_plural = 'Notificações por Email'
+        ordering = ['next_attempt_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='contact_outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.message_id} - {self.get_status_display()} ({self.attempts} tentativas)'
+
+
+class InboxSummary(models.Model):
+    """
+    Resumo da caixa de entrada (linha única, pk=1), mantido incrementalmente
+    por contact.inbox para o polling não precisar de COUNT(*) na tabela.
+    """
+
+    total = models.IntegerField(default=0, verbose_name='Total')
+    unread = models.IntegerField(default=0, verbose_name='Não lidas')
+    last_message_at = models.DateTimeField(null=True, blank=True, verbose_name='Última mensagem')
+    # Incrementada a cada alteração; é o ETag de /api/contact/summary/
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Versão')
+    # Momento da última alteração (Last-Modified da listagem da API)
+    updated_at = models.DateTimeField(null=True, blank=True, verbose_name='Atualizado em')
+
+    class Meta:
+        verbose_name = 'Resumo da Caixa de Entrada'
+        verbose_name_plural = 'Resumo da Caixa de Entrada'
+
+    def __str__(self):
+        return f'{self.unread} não lidas de {self.total}'
+
+
+class HourlyStats(models.Model):
+    """
+    Mensagens recebidas e ainda não lidas por hora de criação (UTC), mantidas
+    incrementalmente por contact.stats junto com o resumo da caixa de
+    entrada. Os totais por dia saem da soma destas linhas.
+    """
+
+    hour = models.DateTimeField(unique=True, verbose_name='Hora')
+    total = models.IntegerField(default=0, verbose_name='Total')
+    unread = models.IntegerField(default=0, verbose_name='Não lidas')
+
+    class Meta:
+        verbose_name = 'Estatística por Hora'
+        verbose_name_plural = 'Estatísticas por Hora'
+        ordering = ['-hour']
+
+    def __str__(self):
+        return f'{self.hour:%d/%m/%Y %H:00}: {self.total} mensagens, {self.unread} não lidas'
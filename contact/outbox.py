@@ -0,0 +1,251 @@
+import logging
+import os
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import metrics
+from .models import EmailOutbox
+from .tasks import send_contact_email, send_digest_email
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(message):
+    """
+    Cria a notificação pendente de uma mensagem.
+
+    Deve ser chamada dentro da mesma transação que grava a ContactMessage.
+    """
+    return EmailOutbox.objects.create(message=message)
+
+
+def backoff_delay(attempts):
+    """Intervalo até a próxima tentativa (exponencial, com teto)"""
+    delay = settings.EMAIL_OUTBOX_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return timedelta(seconds=min(delay, settings.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS))
+
+
+def _due(now):
+    # Pendentes vencidas ou reservas expiradas (processo morreu durante o envio)
+    return Q(next_attempt_at__lte=now) & (
+        Q(status=EmailOutbox.Status.PENDING)
+        | Q(status=EmailOutbox.Status.SENDING, locked_until__lt=now)
+    )
+
+
+def claim_batch(limit):
+    """
+    Reserva até `limit` notificações vencidas para este worker.
+
+    A reserva é um UPDATE condicional com um token único, então funciona em
+    qualquer banco (inclusive SQLite) sem SELECT ... FOR UPDATE.
+    """
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    ids = list(
+        EmailOutbox.objects.filter(_due(now))
+        .order_by('next_attempt_at')
+        .values_list('id', flat=True)[:limit]
+    )
+    if not ids:
+        return []
+    EmailOutbox.objects.filter(_due(now), id__in=ids).update(
+        status=EmailOutbox.Status.SENDING,
+        locked_by=token,
+        locked_until=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS),
+    )
+    return list(
+        EmailOutbox.objects.filter(locked_by=token, status=EmailOutbox.Status.SENDING)
+        .select_related('message')
+    )
+
+
+def _record_result(entries, error=None):
+    """Grava o resultado do envio de um grupo de notificações reservadas"""
+    now = timezone.now()
+    statuses = []
+    for entry in entries:
+        attempts = entry.attempts + 1
+        if error is None:
+            new_status = EmailOutbox.Status.SENT
+            changes = {'status': new_status, 'attempts': attempts, 'sent_at': now, 'last_error': ''}
+        else:
+            if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+                new_status = EmailOutbox.Status.DEAD
+                logger.error(
+                    'Notificação %s descartada após %s tentativas: %s', entry.id, attempts, error,
+                    extra={'message_id': entry.message_id},
+                )
+            else:
+                new_status = EmailOutbox.Status.PENDING
+                logger.warning(
+                    'Falha ao enviar notificação %s (tentativa %s): %s', entry.id, attempts, error,
+                    extra={'message_id': entry.message_id},
+                )
+            changes = {
+                'status': new_status,
+                'attempts': attempts,
+                'next_attempt_at': now + backoff_delay(attempts),
+                'last_error': str(error)[:2000],
+            }
+
+        # Só grava se a reserva ainda for nossa (o lease pode ter expirado)
+        EmailOutbox.objects.filter(id=entry.id, locked_by=entry.locked_by).update(
+            locked_by='', locked_until=None, **changes
+        )
+        statuses.append(new_status)
+    return statuses
+
+
+def deliver(entry):
+    """
+    Envia uma notificação reservada e registra o resultado.
+
+    Retorna o novo status da notificação.
+    """
+    try:
+        send_contact_email(entry.message)
+    except Exception as e:
+        return _record_result([entry], e)[0]
+    return _record_result([entry])[0]
+
+
+def deliver_digest(entries):
+    """
+    Envia um grupo de notificações reservadas como um único email.
+
+    Retorna a lista de novos status, na ordem de `entries`.
+    """
+    try:
+        send_digest_email([entry.message for entry in entries])
+    except Exception as e:
+        return _record_result(entries, e)
+    return _record_result(entries)
+
+
+def digest_ready(now=None):
+    """
+    Indica se há um digest pronto para envio: a notificação vencida mais
+    antiga já esperou EMAIL_DIGEST_WINDOW_SECONDS ou a fila atingiu
+    EMAIL_DIGEST_MAX_MESSAGES.
+    """
+    now = now or timezone.now()
+    due = EmailOutbox.objects.filter(_due(now))
+    oldest = due.order_by('created_at').values_list('created_at', flat=True).first()
+    if oldest is None:
+        return False
+    if oldest <= now - timedelta(seconds=settings.EMAIL_DIGEST_WINDOW_SECONDS):
+        return True
+    return len(due.values_list('id', flat=True)[:settings.EMAIL_DIGEST_MAX_MESSAGES]) >= settings.EMAIL_DIGEST_MAX_MESSAGES
+
+
+def process_outbox(limit=None):
+    """
+    Processa um lote de notificações vencidas.
+
+    No modo EMAIL_DELIVERY_MODE='digest' o lote inteiro vira um único email
+    (um flush), e só é enviado quando `digest_ready()`.
+
+    Retorna um dicionário com a contagem por resultado; `flushes` é o número
+    de chamadas ao SendGrid feitas e `claimed` quantas mensagens elas cobriram.
+    """
+    result = {'claimed': 0, 'flushes': 0, 'sent': 0, 'retry': 0, 'dead': 0}
+
+    if settings.EMAIL_DELIVERY_MODE == 'digest':
+        if not digest_ready():
+            return result
+        entries = claim_batch(limit or settings.EMAIL_DIGEST_MAX_MESSAGES)
+        statuses = deliver_digest(entries) if entries else []
+        result['flushes'] = 1 if entries else 0
+    else:
+        entries = claim_batch(limit or settings.EMAIL_OUTBOX_BATCH_SIZE)
+        statuses = [deliver(entry) for entry in entries]
+        result['flushes'] = len(entries)
+
+    result['claimed'] = len(entries)
+    for new_status in statuses:
+        if new_status == EmailOutbox.Status.SENT:
+            result['sent'] += 1
+        elif new_status == EmailOutbox.Status.DEAD:
+            result['dead'] += 1
+        else:
+            result['retry'] += 1
+    return result
+
+
+class OutboxWorkerPool:
+    """
+    Pool de tamanho fixo de threads que drenam a fila de notificações.
+
+    As threads são criadas na primeira chamada de `wake()` em cada processo
+    (seguro após o fork do gunicorn), que nos workers do gunicorn acontece
+    ao iniciar (startup.warm_up_worker). Elas acordam a cada nova mensagem
+    ou a cada EMAIL_OUTBOX_POLL_SECONDS para reprocessar tentativas agendadas.
+    """
+
+    def __init__(self, size=None, poll_interval=None):
+        self.size = size or settings.EMAIL_OUTBOX_WORKERS
+        self.poll_interval = poll_interval or settings.EMAIL_OUTBOX_POLL_SECONDS
+        if settings.EMAIL_DELIVERY_MODE == 'digest':
+            # Acorda a tempo de fechar a janela do digest
+            self.poll_interval = min(self.poll_interval, settings.EMAIL_DIGEST_WINDOW_SECONDS)
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'outbox-worker-{i}', daemon=True)
+                for i in range(self.size)
+            ]
+            for thread in self._threads:
+                thread.start()
+        logger.info('Pool de notificações iniciado com %s workers', self.size)
+
+    def wake(self):
+        self.start()
+        self._wakeup.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+            metrics.OUTBOX_BUSY_WORKERS.inc()
+            try:
+                while not self._stop.is_set() and process_outbox()['claimed']:
+                    pass
+            except Exception as e:
+                logger.error('Erro ao processar fila de notificações: %s', e)
+            finally:
+                metrics.OUTBOX_BUSY_WORKERS.dec()
+                close_old_connections()
+
+
+pool = OutboxWorkerPool()
+
+
+def wake():
+    """Acorda o pool deste processo, se o envio em processo estiver habilitado"""
+    if settings.EMAIL_OUTBOX_INPROCESS:
+        pool.wake()
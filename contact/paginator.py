@@ -0,0 +1,157 @@
+"""
+Paginação para listagens grandes.
+
+- Admin: o COUNT(*) exato é a consulta mais lenta da listagem quando a
+  tabela é grande. Aqui a contagem vem primeiro de uma estimativa do
+  planejador do banco (barata); só abaixo de
+  `CONTACT_ADMIN_COUNT_ESTIMATE_THRESHOLD` a contagem exata é feita, e ela
+  fica em cache por `CONTACT_ADMIN_COUNT_CACHE_SECONDS`.
+- API: paginação por cursor (keyset) em (created_at, id), que custa o mesmo
+  em qualquer página, ao contrário do OFFSET.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.db.models.query import QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CACHE_PREFIX = 'contact:count:'
+
+
+def _table_estimate(queryset):
+    """Linhas da tabela inteira segundo as estatísticas do banco (ou None)"""
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # reltuples é -1 (PostgreSQL 14+) em tabelas nunca analisadas
+            return int(row[0]) if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            # Preenchida por ANALYZE, uma linha por índice; o primeiro número de
+            # `stat` é o total de linhas do índice (menor em índices parciais)
+            if 'sqlite_stat1' not in connection.introspection.table_names(cursor):
+                return None
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+            counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+            return max(counts) if counts else None
+    return None
+
+
+def _plan_estimate(queryset):
+    """Linhas estimadas pelo EXPLAIN do PostgreSQL para uma consulta filtrada (ou None)"""
+    if connections[queryset.db].vendor != 'postgresql':
+        return None
+    plan = json.loads(queryset.explain(format='json'))
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimate_count(queryset):
+    """
+    Estimativa do número de linhas de `queryset` pelo planejador, sem
+    executar a consulta. Retorna None quando o banco não oferece estimativa.
+    """
+    query = queryset.query
+    try:
+        if not query.where and not query.distinct and not query.combinator:
+            return _table_estimate(queryset)
+        return _plan_estimate(queryset)
+    except DatabaseError:
+        return None
+
+
+def cached_count(queryset, timeout=None):
+    """COUNT(*) exato de `queryset`, em cache por `timeout` segundos"""
+    if timeout is None:
+        timeout = settings.CONTACT_ADMIN_COUNT_CACHE_SECONDS
+    if not timeout:
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    digest = hashlib.sha1(f'{queryset.db}:{sql}:{params!r}'.encode('utf-8')).hexdigest()
+    key = CACHE_PREFIX + digest
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator que usa a estimativa do planejador quando ela passa de
+    `threshold` linhas e a contagem exata (em cache) abaixo disso.
+
+    Com contagem estimada, o número de páginas é aproximado: as últimas
+    páginas podem vir incompletas ou vazias.
+    """
+
+    def __init__(self, *args, threshold=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if threshold is None:
+            threshold = settings.CONTACT_ADMIN_COUNT_ESTIMATE_THRESHOLD
+        self.threshold = threshold
+        self.estimated = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        if self.threshold:
+            estimate = estimate_count(self.object_list)
+            if estimate is not None and estimate >= self.threshold:
+                self.estimated = True
+                return estimate
+        return cached_count(self.object_list)
+
+
+def encode_cursor(created_at, pk):
+    """Cursor opaco para a posição (created_at, id)"""
+    raw = f'{created_at.isoformat()}|{pk}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) de um cursor; levanta ValueError se inválido"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, pk = raw.rsplit('|', 1)
+        moment = parse_datetime(created_at)
+        if moment is None:
+            raise ValueError(cursor)
+        return moment, int(pk)
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(cursor) from e
+
+
+def keyset_page(queryset, fields, limit, cursor=None):
+    """
+    Uma página de `queryset` em ordem (-created_at, -id) como dicts com
+    `fields` (que devem incluir 'id' e 'created_at'), começando depois de
+    `cursor`. Retorna (linhas, cursor da próxima página ou None).
+
+    A condição de continuação usa o índice (-created_at, -id) em vez de
+    OFFSET, então a página 1000 custa o mesmo que a primeira.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    if cursor is not None:
+        created_at, pk = decode_cursor(cursor)
+        # O created_at__lte redundante é o que deixa o banco começar a leitura
+        # do índice no cursor; só com o OR ele percorre o índice desde o início
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk),
+            created_at__lte=created_at,
+        )
+    rows = list(queryset.values(*fields)[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]['created_at'], rows[-1]['id'])
@@ -0,0 +1,20 @@
+from rest_framework.parsers import BaseParser
+
+from .importer import iter_jsonl
+
+
+class JSONLinesParser(BaseParser):
+    """
+    Parser para JSON Lines (um objeto por linha).
+
+    Retorna um gerador, para que a importação em lote processe o corpo da
+    requisição em blocos.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return iter_jsonl(stream)
+
+
+class JSONLParser(JSONLinesParser):
+    media_type = 'application/jsonl'
@@ -0,0 +1,16 @@
+from rest_framework.exceptions import PermissionDenied
+from rest_framework.permissions import BasePermission
+
+from .ipfilter import client_ip, is_blocked
+
+
+class IPFilterPermission(BasePermission):
+    """Recusa (403) IPs das faixas bloqueadas (contact.ipfilter) antes do throttle e da validação"""
+
+    message = 'Acesso bloqueado para este endereço.'
+
+    def has_permission(self, request, view):
+        if is_blocked(client_ip(request)):
+            # Direto, sem o NotAuthenticated que o DRF usaria para anônimos
+            raise PermissionDenied(self.message)
+        return True
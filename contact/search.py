@@ -0,0 +1,162 @@
+"""
+Busca textual em ContactMessage.
+
+- PostgreSQL: coluna gerada `search_vector` (tsvector, pesos A/B/C para
+  assunto, remetente e mensagem) com índice GIN, consultada com
+  websearch_to_tsquery e ordenada por ts_rank.
+- SQLite: tabela FTS5 `contact_contactmessage_fts` (external content)
+  mantida por triggers, consultada com MATCH e ordenada por bm25.
+- Outros bancos, ou SQLite sem FTS5: `available()` é False e o admin volta
+  ao `icontains` padrão.
+
+A coluna, a tabela e os triggers são criados pela migração 0004. No SQLite,
+migrações que recriam a tabela contact_contactmessage (_remake_table)
+descartam os triggers: chame `install_sqlite_fts(schema_editor)` de novo
+nessas migrações.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from .models import ContactMessage
+
+SEARCH_CONFIG = 'portuguese'
+TABLE = ContactMessage._meta.db_table
+FTS_TABLE = f'{TABLE}_fts'
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+POSTGRES_INSTALL = [
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(subject, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '') || ' ' || coalesce(email, '')), 'B') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(message, '')), 'C')
+    ) STORED
+    """,
+    f'CREATE INDEX contact_msg_search_idx ON {TABLE} USING GIN (search_vector)',
+]
+POSTGRES_UNINSTALL = [
+    'DROP INDEX IF EXISTS contact_msg_search_idx',
+    f'ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector',
+]
+
+SQLITE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, email, subject, message,
+        content='{TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+"""
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contact_msg_fts_ai AFTER INSERT ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, email, subject, message)
+        VALUES (new.id, new.name, new.email, new.subject, new.message);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contact_msg_fts_ad AFTER DELETE ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, subject, message)
+        VALUES ('delete', old.id, old.name, old.email, old.subject, old.message);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS contact_msg_fts_au AFTER UPDATE OF name, email, subject, message ON {TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, email, subject, message)
+        VALUES ('delete', old.id, old.name, old.email, old.subject, old.message);
+        INSERT INTO {FTS_TABLE}(rowid, name, email, subject, message)
+        VALUES (new.id, new.name, new.email, new.subject, new.message);
+    END
+    """,
+]
+SQLITE_UNINSTALL = [
+    'DROP TRIGGER IF EXISTS contact_msg_fts_ai',
+    'DROP TRIGGER IF EXISTS contact_msg_fts_ad',
+    'DROP TRIGGER IF EXISTS contact_msg_fts_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def install_sqlite_fts(schema_editor):
+    """Cria (ou recria) a tabela FTS5, os triggers e reindexa as mensagens"""
+    import sqlite3
+
+    try:
+        schema_editor.execute(SQLITE_TABLE)
+    except sqlite3.OperationalError:
+        # SQLite compilado sem FTS5: a busca usa o fallback icontains
+        return
+    for statement in SQLITE_TRIGGERS:
+        schema_editor.execute(statement)
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def install(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        for statement in POSTGRES_INSTALL:
+            schema_editor.execute(statement)
+    elif vendor == 'sqlite':
+        install_sqlite_fts(schema_editor)
+
+
+def uninstall(schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRES_UNINSTALL, 'sqlite': SQLITE_UNINSTALL}.get(vendor, [])
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+_available = {}
+
+
+def available():
+    """Indica se o banco atual tem o backend de busca textual instalado (com cache)"""
+    alias = connection.alias
+    if alias not in _available:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                columns = connection.introspection.get_table_description(cursor, TABLE)
+            _available[alias] = any(column.name == 'search_vector' for column in columns)
+        elif connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                _available[alias] = FTS_TABLE in connection.introspection.table_names(cursor)
+        else:
+            _available[alias] = False
+    return _available[alias]
+
+
+def _fts5_query(term):
+    # Cada palavra entre aspas (sem sintaxe FTS5 vinda do usuário), com prefixo
+    return ' '.join(f'"{token}"*' for token in TOKEN.findall(term))
+
+
+def search(queryset, term):
+    """
+    Filtra `queryset` pelas mensagens que casam com `term` e anota
+    `search_rank` (maior = mais relevante). Requer `available()`.
+    """
+    if connection.vendor == 'postgresql':
+        tsquery = 'websearch_to_tsquery(%s::regconfig, %s)'
+        params = (SEARCH_CONFIG, term)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT id FROM {TABLE} WHERE search_vector @@ {tsquery}', params)
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank({TABLE}.search_vector, {tsquery})', params, output_field=FloatField())
+        )
+
+    query = _fts5_query(term)
+    if not query:
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+    return queryset.filter(
+        id__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (query,))
+    ).annotate(
+        search_rank=RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE}.rowid = {TABLE}.id AND {FTS_TABLE} MATCH %s)',
+            (query,),
+            output_field=FloatField(),
+        )
+    )
@@ -0,0 +1,150 @@
+import http.client
+import json
+import os
+import queue
+import threading
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+SendGridResponse = namedtuple('SendGridResponse', ['status_code', 'body', 'headers'])
+
+# Erros que indicam uma conexão keep-alive fechada pelo servidor enquanto ociosa
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class SendGridError(Exception):
+    def __init__(self, status_code, body):
+        super().__init__(f'HTTP Error {status_code}: {body[:500]!r}')
+        self.status_code = status_code
+        self.body = body
+
+
+class SendGridClient:
+    """
+    Cliente HTTP da API v3 do SendGrid com pool de conexões keep-alive.
+
+    Thread-safe: cada envio pega uma conexão ociosa do pool (ou abre uma
+    nova) e a devolve ao final. Até `pool_size` conexões ociosas são
+    mantidas; se uma conexão reaproveitada tiver sido fechada pelo servidor,
+    o envio é refeito uma vez em uma conexão nova.
+    """
+
+    def __init__(self, api_key, host='https://api.sendgrid.com', pool_size=4, timeout=10):
+        url = urlsplit(host)
+        self.api_key = api_key
+        self.scheme = url.scheme or 'https'
+        self.netloc = url.netloc
+        self.base_path = url.path.rstrip('/')
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._lock = threading.Lock()
+        self._counters = {'opened': 0, 'reused': 0, 'reconnects': 0, 'discarded': 0}
+
+    def stats(self):
+        """Contadores de conexões abertas, reaproveitadas, refeitas e descartadas"""
+        with self._lock:
+            return dict(self._counters, idle=self._pool.qsize())
+
+    def _count(self, key):
+        with self._lock:
+            self._counters[key] += 1
+
+    def _acquire(self):
+        try:
+            connection = self._pool.get_nowait()
+        except queue.Empty:
+            connection_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            self._count('opened')
+            return connection_class(self.netloc, timeout=self.timeout), False
+        self._count('reused')
+        return connection, True
+
+    def _release(self, connection):
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+            self._count('discarded')
+
+    def close(self):
+        """Fecha todas as conexões ociosas"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def send(self, message):
+        """
+        Envia um `sendgrid.helpers.mail.Mail` (ou um dict já serializável)
+        para /v3/mail/send. Levanta SendGridError em respostas >= 400.
+        """
+        payload = message if isinstance(message, dict) else message.get()
+        body = json.dumps(payload).encode('utf-8')
+        headers = {
+            'Authorization': f'Bearer {self.api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        }
+        path = f'{self.base_path}/v3/mail/send'
+
+        while True:
+            connection, reused = self._acquire()
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                data = response.read()
+            except STALE_CONNECTION_ERRORS:
+                connection.close()
+                if not reused:
+                    raise
+                # Conexão ociosa fechada pelo servidor: tenta de novo com outra
+                self._count('reconnects')
+                continue
+            except Exception:
+                connection.close()
+                raise
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+
+        if response.status >= 400:
+            raise SendGridError(response.status, data)
+        return SendGridResponse(response.status, data, dict(response.getheaders()))
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Cliente compartilhado pelo processo (recriado após fork)"""
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = SendGridClient(
+                settings.SENDGRID_API_KEY,
+                host=settings.SENDGRID_API_HOST,
+                pool_size=settings.SENDGRID_POOL_SIZE,
+                timeout=settings.SENDGRID_TIMEOUT,
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+@receiver(setting_changed)
+def _reset_client(setting, **kwargs):
+    global _client
+    if setting.startswith('SENDGRID_'):
+        with _client_lock:
+            if _client is not None:
+                _client.close()
+            _client = None
@@ -0,0 +1,109 @@
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import dedup, inbox, ipfilter, outbox, wal
+from .models import ContactMessage, EmailOutbox
+
+
+def notifications_enabled():
+    return bool(getattr(settings, 'SENDGRID_API_KEY', ''))
+
+
+def create_contact_message(serializer, ip_address, fingerprint=None, duplicate_of=None):
+    """
+    Salva a mensagem e enfileira a notificação por email na mesma transação.
+
+    Se o processo cair depois do commit, a notificação continua na fila e é
+    enviada pelo próximo worker. `fingerprint` é o resultado de
+    dedup.check(), quando a verificação de duplicatas já foi feita, e
+    `duplicate_of` o id da mensagem parecida que ela encontrou (modo 'flag').
+    """
+    if fingerprint is None:
+        fingerprint = dedup.fingerprint(serializer.validated_data)
+    with transaction.atomic():
+        message = serializer.save(
+            ip_address=ip_address, content_hash=fingerprint.content_hash, duplicate_of_id=duplicate_of,
+        )
+        inbox.record_created([message])
+        if notifications_enabled():
+            outbox.enqueue(message)
+            transaction.on_commit(outbox.wake)
+        transaction.on_commit(lambda: dedup.remember(message, fingerprint))
+    return message
+
+
+def check_duplicate(data):
+    """
+    dedup.check() que, com CONTACT_WRITE_BEHIND, também procura a cópia exata
+    entre as mensagens deste processo ainda no log. Nesse caso o
+    `message_id` da Duplicate é o ingest_id (UUID) da mensagem no log.
+    """
+    fingerprint, duplicate = dedup.check(data)
+    if duplicate is None and settings.CONTACT_WRITE_BEHIND and dedup.enabled():
+        ingest_id = wal.get_log().pending(fingerprint.content_hash)
+        if ingest_id is not None:
+            duplicate = dedup.Duplicate('exact', uuid.UUID(ingest_id), 1.0)
+    return fingerprint, duplicate
+
+
+def submit_contact_message(serializer, ip_address, fingerprint=None, duplicate_of=None):
+    """
+    Entrada das mensagens do /send/: grava direto (create_contact_message)
+    ou, com CONTACT_WRITE_BEHIND, registra no log de gravação adiada e
+    retorna a mensagem ainda sem id, gravada no banco no próximo lote.
+    """
+    if not settings.CONTACT_WRITE_BEHIND:
+        return create_contact_message(serializer, ip_address, fingerprint, duplicate_of)
+    if fingerprint is None:
+        fingerprint = dedup.fingerprint(serializer.validated_data)
+    data = serializer.validated_data
+    # O log só recebe o que o banco aceita: um registro recusado no lote seria
+    # refeito um a um e iria para o .dead. O client_ip já volta ao REMOTE_ADDR
+    # quando o X-Forwarded-For não é um IP; aqui cobre o resto (REMOTE_ADDR
+    # vazio, IPv6 com zona '%eth0', que o GenericIPAddressField recusa)
+    if not ip_address or ipfilter.parse_ip(ip_address) is None or '%' in ip_address:
+        ip_address = None
+    # Original ainda no log (check_duplicate): o id só existe depois do lote
+    duplicate_of_ingest = str(duplicate_of) if isinstance(duplicate_of, uuid.UUID) else None
+    if duplicate_of_ingest:
+        duplicate_of = None
+    message = ContactMessage(
+        ip_address=ip_address,
+        content_hash=fingerprint.content_hash,
+        duplicate_of_id=duplicate_of,
+        created_at=timezone.now(),
+        ingest_id=uuid.uuid4(),
+        **{field: data[field] for field in wal.FIELDS},
+    )
+    wal.get_log().append({
+        'id': str(message.ingest_id),
+        **{field: data[field] for field in wal.FIELDS},
+        'ip_address': ip_address,
+        'content_hash': fingerprint.content_hash,
+        'duplicate_of': duplicate_of,
+        'duplicate_of_ingest': duplicate_of_ingest,
+        'created_at': message.created_at.isoformat(),
+        'notify': notifications_enabled(),
+    }, fingerprint)
+    return message
+
+
+def create_contact_messages(items, notify=False):
+    """
+    Grava várias mensagens já validadas com bulk_create (uma transação).
+
+    Com `notify`, enfileira as notificações em lote na mesma transação.
+    """
+    with transaction.atomic():
+        messages = ContactMessage.objects.bulk_create([
+            ContactMessage(content_hash=dedup.content_hash(data['subject'], data['message']), **data)
+            for data in items
+        ])
+        inbox.record_created(messages)
+        if notify and notifications_enabled():
+            EmailOutbox.objects.bulk_create([EmailOutbox(message=message) for message in messages])
+            transaction.on_commit(outbox.wake)
+    return messages
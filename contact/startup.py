@@ -0,0 +1,97 @@
+"""
+Aquecimento da aplicação antes de atender requisições (gunicorn.conf.py).
+
+Com preload_app o gunicorn importa a aplicação uma vez no processo mestre e
+os workers herdam a memória pelo fork. Só que boa parte do custo da
+primeira requisição é preguiçoso (URLconf, views, classes do DRF, catálogos
+de tradução) e seria pago de novo em cada worker; `warm_up()` carrega tudo
+isso no mestre. As dependências opcionais pesadas continuam preguiçosas: o
+SDK do SendGrid só é pré-carregado quando as notificações estão ativas.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import Resolver404, resolve
+from django.utils import translation
+
+from .db.pool import close_pools
+
+logger = logging.getLogger(__name__)
+
+# Rotas resolvidas no aquecimento (importam o URLconf e todas as views)
+WARM_PATHS = ['/api/contact/send/', '/api/contact/health/']
+
+
+def warm_up():
+    start = time.perf_counter()
+
+    for path in WARM_PATHS:
+        try:
+            resolve(path)
+        except Resolver404:
+            pass
+
+    # O DRF importa as classes configuradas no primeiro acesso a cada chave
+    from rest_framework.settings import api_settings
+    for name in (
+        'DEFAULT_RENDERER_CLASSES',
+        'DEFAULT_PARSER_CLASSES',
+        'DEFAULT_AUTHENTICATION_CLASSES',
+        'DEFAULT_PERMISSION_CLASSES',
+        'DEFAULT_THROTTLE_CLASSES',
+        'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+        'DEFAULT_VERSIONING_CLASS',
+        'EXCEPTION_HANDLER',
+    ):
+        getattr(api_settings, name)
+
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('Not Found')
+
+    # Listas de IP carregadas no mestre: os workers herdam os arrays prontos
+    from .ipfilter import loader
+    loader.get()
+
+    from .services import notifications_enabled
+    if notifications_enabled():
+        import sendgrid.helpers.mail
+
+    # Nenhuma conexão aberta aqui pode ser herdada pelos workers
+    connections.close_all()
+    close_pools()
+    logger.info('Aplicação aquecida em %.0f ms', (time.perf_counter() - start) * 1000)
+
+
+def warm_up_worker():
+    """
+    Aquecimento de cada worker, já depois do fork (post_worker_init): o que
+    é do processo e não pode ser herdado do mestre.
+    """
+    start = time.perf_counter()
+
+    # Índice de quase duplicatas: sem isso a primeira mensagem de cada
+    # worker pagaria a leitura das mensagens recentes
+    from . import dedup
+    if dedup.enabled():
+        index = dedup.get_index()
+        logger.info('Índice de duplicatas com %s mensagens', len(index))
+
+    # Gravação adiada: a thread de cada worker já começa reaplicando os logs
+    # deixados por workers que morreram
+    if settings.CONTACT_WRITE_BEHIND:
+        from .wal import get_log
+        get_log().start()
+
+    # Notificações deixadas na fila por um deploy, reinício ou queda (e as
+    # novas tentativas agendadas) não esperam a próxima mensagem: o pool já
+    # começa drenando a fila e depois a consulta a cada EMAIL_OUTBOX_POLL_SECONDS
+    from .services import notifications_enabled
+    if notifications_enabled():
+        from . import outbox
+        outbox.wake()
+
+    # A conexão usada aqui volta (ou fecha) antes da primeira requisição
+    connections.close_all()
+    logger.info('Worker aquecido em %.0f ms', (time.perf_counter() - start) * 1000)
@@ -0,0 +1,133 @@
+"""
+Estatísticas de mensagens por hora e por dia (total, não lidas e proporção).
+
+Uma linha de HourlyStats por hora (UTC) com mensagens. Os contadores são
+ajustados com UPDATE ... SET total = total + n na mesma transação que cria,
+marca, arquiva ou apaga as mensagens (via contact.inbox e o admin), então
+os relatórios leem no máximo 24 linhas por dia em vez de agrupar a tabela de
+mensagens. Os dias são montados somando as horas no fuso local (TIME_ZONE),
+o que é exato para fusos com deslocamento de horas inteiras.
+
+`rebuild()` (comando rebuild_stats) recalcula tudo a partir da tabela, para
+o backfill ou depois de alterações feitas fora da aplicação.
+"""
+from collections import Counter
+from datetime import timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import ContactMessage, HourlyStats
+
+FIELDS = ('total', 'unread')
+
+
+def bucket(created_at):
+    """Hora (UTC) em que a mensagem é contada"""
+    return created_at.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _apply(total, unread):
+    """Soma os Counters {hora: n} às linhas das horas (chamar dentro de uma transação)"""
+    # Ordem fixa: duas transações nunca travam as mesmas linhas em ordens opostas
+    for hour in sorted(set(total) | set(unread)):
+        changes = {'total': F('total') + total[hour], 'unread': F('unread') + unread[hour]}
+        if not HourlyStats.objects.filter(hour=hour).update(**changes):
+            # Primeira mensagem da hora; se outra transação criou a linha antes, o INSERT é ignorado
+            HourlyStats.objects.bulk_create([HourlyStats(hour=hour)], ignore_conflicts=True)
+            HourlyStats.objects.filter(hour=hour).update(**changes)
+
+
+def record_created(messages):
+    """Conta mensagens recém-criadas"""
+    _apply(
+        Counter(bucket(message.created_at) for message in messages),
+        Counter(bucket(message.created_at) for message in messages if not message.is_read),
+    )
+
+
+def _negated(counter):
+    return Counter({hour: -n for hour, n in counter.items()})
+
+
+def record_read_change(created_ats, is_read):
+    """Mensagens (datas de criação) que passaram a lidas, ou a não lidas com `is_read` falso"""
+    delta = Counter(bucket(created_at) for created_at in created_ats)
+    _apply(Counter(), _negated(delta) if is_read else delta)
+
+
+def record_deleted(rows):
+    """Desconta mensagens apagadas, dadas como pares (created_at, is_read)"""
+    rows = list(rows)
+    _apply(
+        _negated(Counter(bucket(created_at) for created_at, _ in rows)),
+        _negated(Counter(bucket(created_at) for created_at, is_read in rows if not is_read)),
+    )
+
+
+def rebuild():
+    """Recalcula todas as horas a partir da tabela de mensagens. Retorna quantas horas têm mensagens"""
+    rows = (
+        ContactMessage.objects.annotate(bucket=TruncHour('created_at', tzinfo=dt_timezone.utc))
+        .values('bucket')
+        .annotate(total=Count('pk'), unread=Count('pk', filter=Q(is_read=False)))
+        .order_by()
+    )
+    with transaction.atomic():
+        HourlyStats.objects.all().delete()
+        created = HourlyStats.objects.bulk_create(
+            [HourlyStats(hour=row['bucket'], total=row['total'], unread=row['unread']) for row in rows],
+            batch_size=1000,
+        )
+    return len(created)
+
+
+def _with_ratio(row):
+    row['unread_ratio'] = round(row['unread'] / row['total'], 4) if row['total'] else 0.0
+    return row
+
+
+def _range(since, until):
+    queryset = HourlyStats.objects.filter(total__gt=0)
+    if since is not None:
+        queryset = queryset.filter(hour__gte=since)
+    if until is not None:
+        queryset = queryset.filter(hour__lt=until)
+    return queryset
+
+
+def hourly(since=None, until=None):
+    """Horas com mensagens em [since, until), em ordem cronológica"""
+    return [
+        _with_ratio(row)
+        for row in _range(since, until).order_by('hour').values('hour', *FIELDS)
+    ]
+
+
+def daily(since=None, until=None, tz=None):
+    """Dias (no fuso `tz`, padrão o atual) com mensagens em [since, until)"""
+    tz = tz or timezone.get_current_timezone()
+    days = {}
+    # Somado aqui: no SQLite o TruncDate com fuso chama uma função Python por linha
+    for hour, total, unread in _range(since, until).order_by('hour').values_list('hour', *FIELDS):
+        day = days.setdefault(hour.astimezone(tz).date(), [0, 0])
+        day[0] += total
+        day[1] += unread
+    return [_with_ratio({'date': date, 'total': total, 'unread': unread}) for date, (total, unread) in days.items()]
+
+
+def totals(since=None, until=None):
+    """Total, não lidas e proporção de não lidas em [since, until)"""
+    row = _range(since, until).aggregate(total=Sum('total'), unread=Sum('unread'))
+    return _with_ratio({field: row[field] or 0 for field in FIELDS})
+
+
+def default_since(period, now=None):
+    """Início padrão dos relatórios: 30 dias (por dia) ou 48 horas (por hora)"""
+    now = now or timezone.now()
+    if period == 'hour':
+        return bucket(now) - timedelta(hours=47)
+    today = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    return today - timedelta(days=29)
@@ -1,3 +1,1502 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import ipaddress
+import json
+import logging
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock, skipIf
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings as django_settings
+from django.contrib.admin.sites import site
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+from rest_framework.test import APIClient
+
+from . import archive, dedup, emails, exporter, health, inbox, logs, metrics, outbox, search, startup, stats, views, wal
+from .admin import ContactMessageAdmin, EmailOutboxAdmin
+from .benchmarks import FakeSendGridServer, _FakeSendGridHandler
+from .db.pool import ConnectionPool, PoolTimeout, close_pools
+from .importer import import_messages
+from .ipfilter import FilterLoader, IntervalSet, client_ip, parse_cidr
+from .management.commands import bench_startup
+from .middleware import LeanAPIMiddleware, RequestLogMiddleware
+from .models import ContactMessage, EmailOutbox, HourlyStats
+from .serializers import ContactMessageSerializer
+from .services import submit_contact_message
+from .paginator import EstimatedCountPaginator, cached_count, decode_cursor, encode_cursor, estimate_count, keyset_page
+from .sendgrid_client import SendGridClient, SendGridError, get_client
+from .throttling import SQLiteThrottleBackend, sliding_window
+
+
+def staff_client():
+    user = get_user_model().objects.create_user('staff', 'staff@example.com', 'senha', is_staff=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+class BulkImportTests(TestCase):
+    url = '/api/contact/bulk/'
+
+    def setUp(self):
+        self.client = staff_client()
+
+    def test_rejects_json_that_is_not_a_list(self):
+        for body in ('5', '"abc"', '{"name": "Ana"}', 'null', 'true'):
+            with self.subTest(body=body):
+                response = self.client.post(self.url, body, content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertFalse(response.json()['success'])
+        self.assertEqual(ContactMessage.objects.count(), 0)
+
+    def test_import_messages_rejects_strings_and_dicts(self):
+        for items in ('abc', b'abc', {'name': 'Ana'}):
+            with self.subTest(items=items), self.assertRaises(TypeError):
+                import_messages(items)
+
+    def test_reports_errors_per_item_and_saves_the_rest(self):
+        items = [
+            contact_payload(),
+            contact_payload(email='não é email'),
+            'texto solto',
+            contact_payload(ip_address='999.1.1.1'),
+            contact_payload(name='Bruno Lima', ip_address='203.0.113.9'),
+        ]
+        # Blocos de 2: os erros de um bloco não derrubam os válidos dos outros
+        result = import_messages(items, chunk_size=2)
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(result['failed'], 3)
+        errors = {error['index']: error['errors'] for error in result['errors']}
+        self.assertEqual(sorted(errors), [1, 2, 3])
+        self.assertIn('email', errors[1])
+        self.assertIn('ip_address', errors[3])
+        self.assertEqual(
+            sorted(ContactMessage.objects.values_list('name', 'ip_address')),
+            [('Ana Souza', None), ('Bruno Lima', '203.0.113.9')],
+        )
+
+    def test_jsonl_stream_reports_invalid_lines(self):
+        body = '\n'.join([json.dumps(contact_payload()), '{"name": ', '', json.dumps(contact_payload(subject=''))])
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['created'], data['failed']), (1, 2))
+        errors = {error['index']: error['errors'] for error in data['errors']}
+        # Linhas vazias não contam como itens
+        self.assertIn('non_field_errors', errors[1])
+        self.assertIn('subject', errors[2])
+
+
+class TempDirMixin:
+    """Diretório temporário por teste (banco do throttle, logs, listas de IP)"""
+
+    def setUp(self):
+        super().setUp()
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.tmp, ignore_errors=True)
+
+
+def contact_payload(**overrides):
+    return {
+        'name': 'Ana Souza',
+        'email': 'ana@example.com',
+        'subject': 'Orçamento de site',
+        'message': 'Olá, gostaria de um orçamento para um site institucional.',
+        **overrides,
+    }
+
+
+class SendMixin(TempDirMixin):
+    """Envio pelo /send/ com banco de throttle e índice de duplicatas novos a cada teste"""
+
+    url = '/api/contact/send/'
+
+    def setUp(self):
+        super().setUp()
+        settings = override_settings(THROTTLE_SQLITE_PATH=str(self.tmp / 'throttle.sqlite3'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        # O índice de quase duplicatas é do processo: começa vazio em cada teste
+        dedup._index = None
+
+    def send(self, ip, **overrides):
+        return APIClient().post(self.url, contact_payload(**overrides), format='json', REMOTE_ADDR=ip)
+
+
+class DuplicateMessageTests(SendMixin, TestCase):
+
+    def test_flag_by_default_keeps_both_messages(self):
+        first = self.send('10.0.0.1')
+        second = self.send('10.0.0.2', name='Bruno Lima', email='bruno@example.com')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(second.status_code, 201)
+        original, flagged = ContactMessage.objects.order_by('id')
+        self.assertIsNone(original.duplicate_of_id)
+        self.assertEqual(flagged.duplicate_of_id, original.id)
+
+    def test_archiving_an_original_clears_duplicate_of(self):
+        self.send('10.0.0.1')
+        self.send('10.0.0.2', name='Bruno Lima', email='bruno@example.com')
+        original, flagged = ContactMessage.objects.order_by('id')
+        ContactMessage.objects.filter(pk=original.pk).update(created_at=timezone.now() - timedelta(days=400))
+        with override_settings(CONTACT_ARCHIVE_DIR=str(self.tmp / 'archive')):
+            self.assertEqual(archive.archive_messages(archive.cutoff_for(365)), (1, 1))
+        flagged.refresh_from_db()
+        self.assertIsNone(flagged.duplicate_of_id)
+        self.assertEqual(list(ContactMessage.objects.values_list('pk', flat=True)), [flagged.pk])
+
+    @override_settings(CONTACT_DEDUP_ACTION='reject')
+    def test_reject_returns_conflict(self):
+        self.assertEqual(self.send('10.0.0.1').status_code, 201)
+        self.assertEqual(self.send('10.0.0.2').status_code, 409)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+    def write_behind(self):
+        # Lote só quando o teste chama flush(): nada de thread gravando no banco em paralelo
+        settings = override_settings(
+            CONTACT_WRITE_BEHIND=True, CONTACT_WAL_DIR=str(self.tmp / 'wal'), CONTACT_WAL_FLUSH_SECONDS=60,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        return wal.get_log()
+
+    def test_write_behind_flags_copy_still_in_the_log(self):
+        log = self.write_behind()
+        self.assertEqual(self.send('10.0.0.1').status_code, 201)
+        self.assertEqual(self.send('10.0.0.2').status_code, 201)
+        self.assertEqual(log.flush(), 2)
+        original, flagged = ContactMessage.objects.order_by('id')
+        self.assertIsNone(original.duplicate_of_id)
+        self.assertEqual(flagged.duplicate_of_id, original.id)
+
+    @override_settings(CONTACT_DEDUP_ACTION='reject')
+    def test_write_behind_rejects_copy_still_in_the_log(self):
+        log = self.write_behind()
+        self.assertEqual(self.send('10.0.0.1').status_code, 201)
+        self.assertEqual(self.send('10.0.0.2').status_code, 409)
+        self.assertEqual(log.flush(), 1)
+        self.assertEqual(ContactMessage.objects.count(), 1)
+
+
+class FakeSendGridMixin:
+    """SendGrid local (contact.benchmarks.FakeSendGridServer); `self.sendgrid.httpd.status` muda a resposta"""
+
+    def setUp(self):
+        super().setUp()
+        self.sendgrid = FakeSendGridServer()
+        self.sendgrid.__enter__()
+        self.addCleanup(self.sendgrid.__exit__, None, None, None)
+        settings = override_settings(
+            SENDGRID_API_KEY='SG.teste', SENDGRID_API_HOST=self.sendgrid.url, EMAIL_OUTBOX_INPROCESS=False,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+def queued_messages(count, **fields):
+    """Mensagens com a notificação na fila, como create_contact_message as deixa"""
+    entries = []
+    for i in range(count):
+        message = ContactMessage.objects.create(**contact_payload(name=f'Pessoa {chr(65 + i)}'))
+        entry = outbox.enqueue(message)
+        if fields:
+            EmailOutbox.objects.filter(pk=entry.pk).update(**fields)
+        entries.append(entry)
+    return entries
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=3, EMAIL_OUTBOX_BACKOFF_SECONDS=30, EMAIL_OUTBOX_BACKOFF_MAX_SECONDS=100)
+class OutboxTests(FakeSendGridMixin, TestCase):
+
+    def make_due(self):
+        EmailOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claim_reserves_each_entry_once(self):
+        due = queued_messages(2)
+        queued_messages(1, next_attempt_at=timezone.now() + timedelta(minutes=5))
+        claimed = outbox.claim_batch(10)
+        self.assertEqual(sorted(entry.pk for entry in claimed), sorted(entry.pk for entry in due))
+        self.assertEqual({entry.status for entry in claimed}, {EmailOutbox.Status.SENDING})
+        self.assertEqual(len({entry.locked_by for entry in claimed}), 1)
+        self.assertEqual(outbox.claim_batch(10), [])
+        # Reserva expirada (o processo morreu durante o envio) volta para a fila
+        EmailOutbox.objects.filter(pk=due[0].pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([entry.pk for entry in outbox.claim_batch(10)], [due[0].pk])
+
+    def test_sends_through_sendgrid(self):
+        queued_messages(2)
+        self.assertEqual(outbox.process_outbox(), {'claimed': 2, 'flushes': 2, 'sent': 2, 'retry': 0, 'dead': 0})
+        self.assertEqual(self.sendgrid.requests, 2)
+        for entry in EmailOutbox.objects.all():
+            self.assertEqual((entry.status, entry.attempts, entry.locked_by), (EmailOutbox.Status.SENT, 1, ''))
+            self.assertIsNotNone(entry.sent_at)
+
+    def test_backoff_delay(self):
+        self.assertEqual(
+            [outbox.backoff_delay(attempts).total_seconds() for attempts in (1, 2, 3, 4)], [30, 60, 100, 100],
+        )
+
+    def test_failures_back_off_until_dead(self):
+        self.sendgrid.httpd.status = 500
+        queued_messages(1)
+        before = timezone.now()
+        with self.assertLogs('contact.outbox', 'WARNING') as logs:
+            self.assertEqual(outbox.process_outbox()['retry'], 1)
+            entry = EmailOutbox.objects.get()
+            self.assertEqual((entry.status, entry.attempts), (EmailOutbox.Status.PENDING, 1))
+            self.assertIn('HTTP Error 500', entry.last_error)
+            self.assertGreaterEqual(entry.next_attempt_at, before + timedelta(seconds=30))
+            # Ainda no backoff: nada é reservado
+            self.assertEqual(outbox.process_outbox()['claimed'], 0)
+
+            self.make_due()
+            self.assertEqual(outbox.process_outbox()['retry'], 1)
+            self.make_due()
+            self.assertEqual(outbox.process_outbox()['dead'], 1)
+        self.assertIn('descartada após 3 tentativas', logs.output[-1])
+        entry = EmailOutbox.objects.get()
+        self.assertEqual((entry.status, entry.attempts), (EmailOutbox.Status.DEAD, 3))
+        self.make_due()
+        self.assertEqual(outbox.process_outbox()['claimed'], 0)
+        self.assertEqual(self.sendgrid.requests, 3)
+
+    def test_requeue_sends_dead_entries_again(self):
+        dead, sent = queued_messages(2, status=EmailOutbox.Status.DEAD, attempts=3, last_error='HTTP Error 500')
+        EmailOutbox.objects.filter(pk=sent.pk).update(status=EmailOutbox.Status.SENT)
+        EmailOutboxAdmin(EmailOutbox, site).requeue(None, EmailOutbox.objects.all())
+        dead.refresh_from_db()
+        self.assertEqual((dead.status, dead.attempts), (EmailOutbox.Status.PENDING, 0))
+        self.assertEqual(EmailOutbox.objects.get(pk=sent.pk).status, EmailOutbox.Status.SENT)
+        self.assertEqual(outbox.process_outbox()['sent'], 1)
+        self.assertEqual(self.sendgrid.requests, 1)
+
+
+@override_settings(CONTACT_DEDUP_ACTION='off', CONTACT_WRITE_BEHIND=False)
+class WorkerStartupTests(SimpleTestCase):
+
+    @mock.patch('contact.outbox.pool')
+    def test_worker_start_drains_the_outbox(self, pool):
+        with override_settings(SENDGRID_API_KEY='SG.teste', EMAIL_OUTBOX_INPROCESS=True):
+            startup.warm_up_worker()
+        pool.wake.assert_called_once_with()
+
+    @mock.patch('contact.outbox.pool')
+    def test_no_pool_without_notifications_or_inprocess(self, pool):
+        for overrides in ({'SENDGRID_API_KEY': ''}, {'SENDGRID_API_KEY': 'SG.teste', 'EMAIL_OUTBOX_INPROCESS': False}):
+            with self.subTest(**overrides), override_settings(**overrides):
+                startup.warm_up_worker()
+        pool.wake.assert_not_called()
+
+
+class ColdStartTests(TempDirMixin, SimpleTestCase):
+
+    def probe(self, **overrides):
+        env = {
+            **os.environ,
+            'DEBUG': 'False',
+            'ALLOWED_HOSTS': 'localhost',
+            'METRICS_TOKEN': '',
+            'SENDGRID_API_KEY': '',
+            'DATABASE_URL': f'sqlite:///{self.tmp / "db.sqlite3"}',
+            'THROTTLE_SQLITE_PATH': str(self.tmp / 'throttle.sqlite3'),
+            **overrides,
+        }
+        heavy = json.dumps(bench_startup.HEAVY_MODULES)
+        completed = subprocess.run(
+            [sys.executable, '-c', bench_startup.PROBE, '/api/contact/health/', heavy],
+            capture_output=True, text=True, env=env, cwd=django_settings.BASE_DIR, timeout=60,
+        )
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def test_heavy_modules_stay_unloaded(self):
+        result = self.probe()
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['heavy'], [])
+        self.assertEqual(self.probe(METRICS_TOKEN='segredo')['heavy'], ['prometheus_client'])
+
+    @mock.patch('contact.startup.close_pools')
+    @mock.patch('contact.startup.resolve')
+    def test_warm_up_resolves_routes_and_closes_connections(self, resolve, close_pools):
+        with mock.patch('contact.startup.connections') as connections:
+            startup.warm_up()
+        self.assertEqual([call.args[0] for call in resolve.call_args_list], startup.WARM_PATHS)
+        connections.close_all.assert_called_once_with()
+        close_pools.assert_called_once_with()
+
+
+@override_settings(EMAIL_DELIVERY_MODE='digest', EMAIL_DIGEST_WINDOW_SECONDS=300, EMAIL_DIGEST_MAX_MESSAGES=5)
+class DigestDeliveryTests(FakeSendGridMixin, TestCase):
+
+    def test_waits_for_the_window(self):
+        queued_messages(3)
+        self.assertFalse(outbox.digest_ready())
+        self.assertEqual(outbox.process_outbox()['claimed'], 0)
+        EmailOutbox.objects.update(created_at=timezone.now() - timedelta(seconds=301))
+        self.assertEqual(outbox.process_outbox(), {'claimed': 3, 'flushes': 1, 'sent': 3, 'retry': 0, 'dead': 0})
+        self.assertEqual(self.sendgrid.requests, 1)
+        self.assertEqual(EmailOutbox.objects.filter(status=EmailOutbox.Status.SENT).count(), 3)
+
+    def test_full_digest_goes_out_before_the_window(self):
+        queued_messages(6)
+        self.assertTrue(outbox.digest_ready())
+        self.assertEqual(outbox.process_outbox()['claimed'], 5)
+        # O que sobrou espera a janela de novo
+        self.assertEqual(outbox.process_outbox()['claimed'], 0)
+        self.assertEqual(self.sendgrid.requests, 1)
+
+    def test_failed_digest_retries_every_message(self):
+        self.sendgrid.httpd.status = 503
+        queued_messages(2, created_at=timezone.now() - timedelta(seconds=301))
+        with self.assertLogs('contact.outbox', 'WARNING'):
+            self.assertEqual(outbox.process_outbox(), {'claimed': 2, 'flushes': 1, 'sent': 0, 'retry': 2, 'dead': 0})
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', 'attempts')), {(EmailOutbox.Status.PENDING, 1)})
+
+
+class EmailRendererTests(SimpleTestCase):
+
+    def message(self, **fields):
+        return ContactMessage(
+            created_at=datetime(2024, 5, 2, 14, 31, tzinfo=dt_timezone.utc), ip_address='203.0.113.7',
+            **contact_payload(**fields),
+        )
+
+    def test_html_escapes_every_field(self):
+        hostile = self.message(
+            name='<script>alert(1)</script>', subject='"><img src=x onerror=alert(1)>',
+            message="Tom & Jerry's <b>orçamento</b>",
+        )
+        html, text = emails.render_notification(hostile)
+        self.assertNotIn('<script>', html)
+        self.assertNotIn('<img', html)
+        self.assertIn('&lt;script&gt;alert(1)&lt;/script&gt;', html)
+        self.assertIn('&quot;&gt;&lt;img src=x onerror=alert(1)&gt;', html)
+        self.assertIn('Tom &amp; Jerry&#x27;s &lt;b&gt;orçamento&lt;/b&gt;', html)
+        # O texto puro vai como está
+        self.assertIn('<script>alert(1)</script>', text)
+        self.assertIn('02/05/2024 às 14:31', text)
+
+    def test_digest_escapes_items_once(self):
+        html, text = emails.render_digest([self.message(name='Ana <Souza>'), self.message(name='Bruno & Cia')])
+        self.assertIn('Ana &lt;Souza&gt;', html)
+        self.assertIn('Bruno &amp; Cia', html)
+        self.assertNotIn('&amp;lt;', html)
+        self.assertNotIn('&amp;amp;', html)
+        self.assertIn('Ana <Souza>', text)
+
+    def test_compiled_template(self):
+        template = emails.CompiledTemplate('<p>{{ a }}</p>{{b}}<hr>{{ a }}')
+        self.assertEqual(
+            template.render({'a': '<i>', 'b': mark_safe('<b>ok</b>')}), '<p>&lt;i&gt;</p><b>ok</b><hr>&lt;i&gt;',
+        )
+        self.assertEqual(emails.CompiledTemplate('{{ a }}', autoescape=False).render({'a': '<i>'}), '<i>')
+        self.assertIs(emails.get_template('notification.html'), emails.get_template('notification.html'))
+        self.assertFalse(emails.get_template('notification.txt').autoescape)
+
+
+class _IdleClosingHandler(_FakeSendGridHandler):
+    """Responde com keep-alive, mas fecha a conexão logo depois (como um servidor com timeout ocioso)"""
+
+    def do_POST(self):
+        super().do_POST()
+        self.close_connection = True
+
+
+class SendGridClientTests(SimpleTestCase):
+    payload = {'personalizations': [{'to': [{'email': 'c@d.com'}]}], 'subject': 'Contato'}
+
+    def server(self, handler=None):
+        server = FakeSendGridServer()
+        if handler is not None:
+            server.httpd.RequestHandlerClass = handler
+        server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+        client = SendGridClient('SG.teste', host=server.url, pool_size=2, timeout=5)
+        self.addCleanup(client.close)
+        return server, client
+
+    def test_reuses_one_connection(self):
+        server, client = self.server()
+        for _ in range(5):
+            self.assertEqual(client.send(self.payload).status_code, 202)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(client.stats(), {'opened': 1, 'reused': 4, 'reconnects': 0, 'discarded': 0, 'idle': 1})
+
+    def test_reconnects_when_the_idle_connection_was_closed(self):
+        server, client = self.server(_IdleClosingHandler)
+        for _ in range(3):
+            self.assertEqual(client.send(self.payload).status_code, 202)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(client.stats()['reconnects'], 2)
+
+    def test_error_status_raises(self):
+        server, client = self.server()
+        server.httpd.status = 401
+        with self.assertRaises(SendGridError) as caught:
+            client.send(self.payload)
+        self.assertEqual(caught.exception.status_code, 401)
+        # A conexão continua boa para o próximo envio
+        server.httpd.status = 202
+        client.send(self.payload)
+        self.assertEqual(server.connections, 1)
+
+    def test_process_client_is_shared_until_settings_change(self):
+        with override_settings(SENDGRID_API_KEY='SG.teste'):
+            client = get_client()
+            self.assertIs(get_client(), client)
+            with override_settings(SENDGRID_POOL_SIZE=1):
+                self.assertIsNot(get_client(), client)
+
+
+class AsyncSendTests(SendMixin, TestCase):
+    """send_contact_message_async (CONTACT_ASYNC_VIEWS) responde como a view síncrona"""
+
+    async def send_async(self, ip, body=None, method='post'):
+        # O REMOTE_ADDR do ASGIRequest vem do `client` do scope
+        factory = AsyncRequestFactory(client=(ip, 50000))
+        if method == 'post':
+            request = factory.post(self.url, json.dumps(body or contact_payload()), content_type='application/json')
+        else:
+            request = factory.generic(method.upper(), self.url)
+        return await views.send_contact_message_async(request)
+
+    async def test_creates_message(self):
+        response = await self.send_async('10.0.0.1')
+        self.assertEqual(response.status_code, 201)
+        data = json.loads(response.content)
+        self.assertTrue(data['success'])
+        message = await ContactMessage.objects.aget()
+        self.assertEqual((data['data']['id'], message.ip_address), (message.id, '10.0.0.1'))
+
+    async def test_invalid_body_matches_sync_view(self):
+        invalid = contact_payload(email='não é email', message='curta')
+        response = await self.send_async('10.0.0.1', invalid)
+        expected = await sync_to_async(
+            lambda: APIClient().post(self.url, invalid, format='json', REMOTE_ADDR='10.0.0.2')
+        )()
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.content, expected.content)
+
+        response = await self.send_async('10.0.0.1', method='get')
+        expected = await sync_to_async(lambda: APIClient().get(self.url, REMOTE_ADDR='10.0.0.2'))()
+        self.assertEqual((response.status_code, response['Allow']), (405, 'POST'))
+        self.assertEqual(response.content, expected.content)
+
+    async def test_throttle_and_ip_filter(self):
+        for i in range(5):
+            body = contact_payload(subject=f'Assunto {i}', message=f'Mensagem número {i} do teste.')
+            self.assertEqual((await self.send_async('10.0.0.1', body)).status_code, 201)
+        response = await self.send_async('10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+        blocklist = self.tmp / 'blocklist.txt'
+        blocklist.write_text('10.9.0.0/16\n')
+        with override_settings(CONTACT_IP_BLOCKLIST=str(blocklist)):
+            response = await self.send_async('10.9.1.1')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(json.loads(response.content), {'detail': 'Acesso bloqueado para este endereço.'})
+
+
+class FullTextSearchTests(TestCase):
+
+    def setUp(self):
+        self.budget = ContactMessage.objects.create(**contact_payload(subject='Orçamento de loja virtual'))
+        self.job = ContactMessage.objects.create(**contact_payload(
+            name='Bruno Lima', email='bruno@empresa.com', subject='Vaga de desenvolvedor',
+            message='Temos uma vaga para desenvolvedor backend com Django na empresa.',
+        ))
+
+    def found(self, term):
+        return set(search.search(ContactMessage.objects.all(), term).values_list('pk', flat=True))
+
+    def test_available_on_the_test_database(self):
+        self.assertTrue(search.available())
+
+    def test_matches_without_accents_and_by_prefix(self):
+        self.assertEqual(self.found('orcamento'), {self.budget.pk})
+        self.assertEqual(self.found('desenvolv'), {self.job.pk})
+        self.assertEqual(self.found('empresa.com'), {self.job.pk})
+        self.assertEqual(self.found('django vaga'), {self.job.pk})
+        self.assertEqual(self.found('django orçamento'), set())
+
+    def test_user_input_is_not_fts_syntax(self):
+        for term in ('vaga OR orçamento', 'vaga"', 'NEAR(vaga', '*', '-vaga', '!!!'):
+            with self.subTest(term=term):
+                self.assertLessEqual(self.found(term), {self.job.pk})
+
+    def test_index_follows_updates_and_deletes(self):
+        ContactMessage.objects.filter(pk=self.budget.pk).update(subject='Proposta de parceria')
+        self.assertEqual(self.found('loja'), set())
+        self.assertEqual(self.found('parceria'), {self.budget.pk})
+        self.job.delete()
+        self.assertEqual(self.found('vaga'), set())
+
+    def test_admin_orders_by_rank(self):
+        ContactMessage.objects.create(**contact_payload(
+            subject='Vaga, vaga, vaga', message='Vaga de emprego: vaga para vaga de estágio em vaga aberta.',
+        ))
+        model_admin = ContactMessageAdmin(ContactMessage, site)
+        queryset, may_have_duplicates = model_admin.get_search_results(None, ContactMessage.objects.all(), 'vaga')
+        self.assertFalse(may_have_duplicates)
+        ranked = list(queryset.order_by('-search_rank').values_list('subject', flat=True))
+        self.assertEqual(ranked, ['Vaga, vaga, vaga', 'Vaga de desenvolvedor'])
+
+
+def create_messages(count, **overrides):
+    """Mensagens gravadas pelo caminho normal (contadores e estatísticas em dia)"""
+    result = import_messages([contact_payload(name=f'Pessoa {chr(65 + i)}', **overrides) for i in range(count)])
+    assert result['created'] == count, result['errors']
+
+
+class EstimatedCountPaginatorTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        create_messages(6)
+
+    def analyze(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def test_estimate_comes_from_sqlite_stats(self):
+        queryset = ContactMessage.objects.all()
+        self.assertIsNone(estimate_count(queryset))
+        self.analyze()
+        self.assertEqual(estimate_count(queryset), 6)
+        # Consultas filtradas só têm estimativa no PostgreSQL
+        self.assertIsNone(estimate_count(queryset.filter(is_read=False)))
+
+    def test_uses_estimate_above_threshold(self):
+        self.analyze()
+        create_messages(2)
+        paginator = EstimatedCountPaginator(ContactMessage.objects.order_by('-pk'), 5, threshold=5)
+        # Estimativa desatualizada (6), aceita acima do limite
+        self.assertEqual(paginator.count, 6)
+        self.assertTrue(paginator.estimated)
+        self.assertEqual(paginator.num_pages, 2)
+
+        paginator = EstimatedCountPaginator(ContactMessage.objects.order_by('-pk'), 5, threshold=100)
+        self.assertEqual(paginator.count, 8)
+        self.assertFalse(paginator.estimated)
+        self.assertEqual(EstimatedCountPaginator(list(range(3)), 2, threshold=1).count, 3)
+
+    def test_exact_count_is_cached(self):
+        queryset = ContactMessage.objects.filter(is_read=False)
+        self.assertEqual(cached_count(queryset, timeout=30), 6)
+        create_messages(1)
+        self.assertEqual(cached_count(queryset, timeout=30), 6)
+        self.assertEqual(cached_count(queryset, timeout=0), 7)
+        # Outra consulta, outra chave
+        self.assertEqual(cached_count(ContactMessage.objects.filter(is_read=True), timeout=30), 0)
+
+
+class KeysetPaginationTests(TestCase):
+    url = '/api/contact/messages/'
+
+    def setUp(self):
+        self.client = staff_client()
+        cache.clear()
+
+    def test_cursor_round_trip(self):
+        moment = datetime(2024, 5, 2, 14, 31, 7, 123456, tzinfo=dt_timezone.utc)
+        cursor = encode_cursor(moment, 812)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (moment, 812))
+
+    def test_decode_rejects_invalid_cursors(self):
+        invalid = [
+            'não-base64!',
+            'xyz',
+            'c2VtLXNlcGFyYWRvcg',  # 'sem-separador'
+            'b250ZW18MQ',  # 'ontem|1'
+            'MjAyNC0wNS0wMlQxNDozMTowN3xhYmM',  # '2024-05-02T14:31:07|abc'
+        ]
+        for cursor in invalid:
+            with self.subTest(cursor=cursor), self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_pages_cover_ties_in_order(self):
+        create_messages(7)
+        # Metade com o mesmo created_at: o id desempata
+        moment = datetime(2024, 5, 2, 12, tzinfo=dt_timezone.utc)
+        ContactMessage.objects.filter(pk__in=list(ContactMessage.objects.values_list('pk', flat=True)[:4])).update(
+            created_at=moment,
+        )
+        expected = list(ContactMessage.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            rows, cursor = keyset_page(ContactMessage.objects.all(), ['id', 'created_at'], 3, cursor)
+            seen.extend(row['id'] for row in rows)
+            if cursor is None:
+                break
+        self.assertEqual(seen, expected)
+
+    def test_api_follows_next_links(self):
+        create_messages(5)
+        seen, url = [], f'{self.url}?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+        self.assertEqual(seen, list(ContactMessage.objects.order_by('-created_at', '-id').values_list('id', flat=True)))
+
+    def test_invalid_cursor_returns_400(self):
+        response = self.client.get(self.url, {'cursor': 'não-é-um-cursor'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], 'Cursor inválido.')
+
+
+class SlidingWindowThrottleTests(SendMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.backend = SQLiteThrottleBackend(self.tmp / 'backend.sqlite3')
+
+    def hits(self, count, now, key='ip', limit=4, duration=60):
+        return [self.backend.hit(key, limit, duration, now) for _ in range(count)]
+
+    def test_limit_within_one_window(self):
+        self.assertEqual(self.hits(4, now=600.0), [(True, None)] * 4)
+        # Janela atual cheia, sem anterior: espera até o fim dela
+        self.assertEqual(self.hits(1, now=615.0), [(False, 45.0)])
+        # Outra chave não é afetada
+        self.assertEqual(self.hits(1, now=615.0, key='outro'), [(True, None)])
+
+    def test_previous_window_counts_by_its_remaining_weight(self):
+        self.hits(3, now=600.0)
+        # Na metade da janela seguinte as 3 anteriores pesam 1,5
+        self.assertEqual(self.hits(3, now=690.0), [(True, None), (True, None), (False, 10.0)])
+        # 10 s depois o peso caiu para 1 e cabe mais uma
+        self.assertEqual(self.hits(2, now=700.0), [(True, None), (False, 20.0)])
+
+    def test_windows_older_than_the_previous_are_forgotten(self):
+        self.hits(4, now=600.0)
+        self.assertEqual(self.hits(4, now=721.0), [(True, None)] * 4)
+
+    def test_sliding_window_state(self):
+        # (permitido, atual, anterior, espera)
+        self.assertEqual(sliding_window(11, 2, 0, 10, 4, 60, 660.0), (True, 1, 2, None))
+        self.assertEqual(sliding_window(12, 2, 0, 10, 4, 60, 720.0), (True, 1, 0, None))
+        self.assertEqual(sliding_window(10, 4, 0, 10, 4, 60, 630.0), (False, 4, 0, 30.0))
+
+    def test_contact_throttle_returns_429(self):
+        for i in range(5):
+            response = self.send('10.0.0.1', subject=f'Assunto {i}', message=f'Mensagem número {i} do teste.')
+            self.assertEqual(response.status_code, 201)
+        response = self.send('10.0.0.1', subject='Mais um', message='Mensagem além do limite por hora.')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        # O limite é por IP
+        self.assertEqual(self.send('10.0.0.2').status_code, 201)
+
+
+class IPRangeTests(SimpleTestCase):
+
+    def test_parse_cidr(self):
+        cases = {
+            '10.1.2.3/8': (4, 10 << 24, (11 << 24) - 1),
+            '192.0.2.7': (4, 0xC0000207, 0xC0000207),
+            '0.0.0.0/0': (4, 0, 2 ** 32 - 1),
+            '::ffff:10.0.0.0/104': (4, 10 << 24, (11 << 24) - 1),
+            '2001:db8::1/32': (6, 0x20010DB8 << 96, ((0x20010DB8 + 1) << 96) - 1),
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(parse_cidr(value), expected)
+
+    def test_parse_cidr_rejects_invalid(self):
+        for value in ('', 'abc', '10.0.0.0/33', '10.0.0.0/x', '10.0.0.0/-1', '10.0.0/8', '2001:db8::/129'):
+            with self.subTest(value=value):
+                self.assertIsNone(parse_cidr(value))
+
+    def test_interval_set_merges_ranges(self):
+        ranges = IntervalSet(parse_cidr(value) for value in (
+            '10.0.0.0/25', '10.0.0.128/25', '10.0.0.64/26', '10.0.1.0/24', '2001:db8::/48', '2001:db8:1::/48',
+        ))
+        # Adjacentes e sobrepostas viram uma faixa só, por versão
+        self.assertEqual(len(ranges), 2)
+        for address in ('10.0.0.0', '10.0.1.255', '::ffff:10.0.0.5', '2001:db8:1:ffff::1'):
+            with self.subTest(address=address):
+                self.assertIn(address, ranges)
+        for address in ('9.255.255.255', '10.0.2.0', '2001:db8:2::', 'abc', ''):
+            with self.subTest(address=address):
+                self.assertNotIn(address, ranges)
+
+    def test_lookup_matches_ipaddress(self):
+        rng = random.Random(7)
+        networks = [
+            ipaddress.ip_network(f'{ipaddress.IPv4Address(rng.getrandbits(32))}/{rng.randint(8, 32)}', strict=False)
+            for _ in range(200)
+        ]
+        ranges = IntervalSet(parse_cidr(str(network)) for network in networks)
+        addresses = [ipaddress.IPv4Address(rng.getrandbits(32)) for _ in range(2000)]
+        # Endereços dentro e nas bordas das faixas, não só aleatórios
+        addresses += [network[0] for network in networks] + [network[-1] for network in networks]
+        addresses += [network[-1] + 1 for network in networks if int(network[-1]) < 2 ** 32 - 1]
+        for address in addresses:
+            self.assertEqual(str(address) in ranges, any(address in network for network in networks), address)
+
+
+class IPFilterTests(TempDirMixin, SimpleTestCase):
+
+    def request(self, remote, forwarded=None):
+        extra = {'REMOTE_ADDR': remote}
+        if forwarded is not None:
+            extra['HTTP_X_FORWARDED_FOR'] = forwarded
+        return RequestFactory().get('/', **extra)
+
+    def test_client_ip_without_trusted_proxies(self):
+        cases = [
+            ('203.0.113.5', None, '203.0.113.5'),
+            ('10.0.0.1', '198.51.100.7, 10.0.0.1', '198.51.100.7'),
+            ('10.0.0.1', '2001:db8::7', '2001:db8::7'),
+            # Cabeçalho forjado com lixo não vira o IP gravado na mensagem
+            ('10.0.0.1', 'nao-e-ip, 198.51.100.7', '10.0.0.1'),
+            ('10.0.0.1', '', '10.0.0.1'),
+            ('10.0.0.1', '1' * 300, '10.0.0.1'),
+        ]
+        for remote, forwarded, expected in cases:
+            with self.subTest(forwarded=forwarded):
+                self.assertEqual(client_ip(self.request(remote, forwarded)), expected)
+
+    @override_settings(TRUSTED_PROXIES=['10.0.0.0/8'])
+    def test_client_ip_behind_trusted_proxies(self):
+        cases = [
+            # Conexão direta de fora dos proxies: o cabeçalho é ignorado
+            ('203.0.113.5', '198.51.100.7', '203.0.113.5'),
+            ('10.0.0.1', '1.2.3.4, 198.51.100.7, 10.0.0.2', '198.51.100.7'),
+            ('10.0.0.1', 'nao-e-ip, 10.0.0.2', '10.0.0.2'),
+        ]
+        for remote, forwarded, expected in cases:
+            with self.subTest(remote=remote, forwarded=forwarded):
+                self.assertEqual(client_ip(self.request(remote, forwarded)), expected)
+
+    def test_reload_keeps_the_previous_lists_on_a_bad_file(self):
+        blocklist = self.tmp / 'blocklist.txt'
+        blocklist.write_text('# rede interna\n10.0.0.0/8\ninvalida\n')
+        loader = FilterLoader()
+        with override_settings(CONTACT_IP_BLOCKLIST=str(blocklist), CONTACT_IP_FILTER_RELOAD_SECONDS=0):
+            with self.assertLogs('contact.ipfilter', 'WARNING'):
+                self.assertTrue(loader.get().is_blocked('10.1.2.3'))
+            blocklist.write_bytes('192.0.2.0/24 # exceção\n'.encode('latin-1'))
+            with self.assertLogs('contact.ipfilter', 'ERROR'):
+                loader.get()
+                loader._reloading.join(5)
+            self.assertTrue(loader.get().is_blocked('10.1.2.3'))
+            blocklist.write_text('192.0.2.0/24\n')
+            loader.get()
+            loader._reloading.join(5)
+            self.assertFalse(loader.get().is_blocked('10.1.2.3'))
+            self.assertTrue(loader.get().is_blocked('192.0.2.1'))
+
+
+def wal_record(accepted_at, **overrides):
+    """Registro como o que submit_contact_message grava no log"""
+    data = contact_payload(**overrides)
+    return {
+        'id': str(uuid.uuid4()),
+        **{field: data[field] for field in wal.FIELDS},
+        'ip_address': '203.0.113.7',
+        'content_hash': dedup.content_hash(data['subject'], data['message']),
+        'duplicate_of': None,
+        'duplicate_of_ingest': None,
+        'created_at': accepted_at.isoformat(),
+        'notify': False,
+    }
+
+
+class WriteBehindReplayTests(TempDirMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.accepted_at = datetime(2024, 5, 2, 14, 31, 7, tzinfo=dt_timezone.utc)
+
+    def write_segment(self, records, tail=b''):
+        """Segmento deixado por um processo que morreu (sem trava)"""
+        path = self.tmp / f'1234-{len(list(self.tmp.iterdir()))}{wal.SUFFIX}'
+        with open(path, 'wb') as stream:
+            for record in records:
+                stream.write((json.dumps(record) + '\n').encode('utf-8'))
+            stream.write(tail)
+        return path
+
+    def test_replay_after_crash(self):
+        records = [wal_record(self.accepted_at + timedelta(seconds=i), name=f'Pessoa {chr(65 + i)}') for i in range(3)]
+        records[2]['duplicate_of_ingest'] = records[0]['id']
+        # Última linha cortada no meio da escrita: nunca foi confirmada ao cliente
+        path = self.write_segment(records, tail=b'{"id": "')
+
+        self.assertEqual(wal.WriteBehindLog(self.tmp).replay(), 3)
+        self.assertFalse(path.exists())
+        messages = {str(message.ingest_id): message for message in ContactMessage.objects.all()}
+        self.assertEqual(set(messages), {record['id'] for record in records})
+        first = messages[records[0]['id']]
+        # Volta com a hora da aceitação, não a da gravação
+        self.assertEqual(first.created_at, self.accepted_at)
+        self.assertEqual(messages[records[2]['id']].duplicate_of_id, first.id)
+        self.assertEqual(inbox.get_summary()['total'], 3)
+
+    def test_ingest_id_makes_replay_idempotent(self):
+        records = [wal_record(self.accepted_at, name=f'Pessoa {chr(65 + i)}') for i in range(4)]
+        # Lote gravado em parte antes da queda
+        self.assertEqual(len(wal.commit_records(records[:2])), 2)
+        self.write_segment(records)
+        self.assertEqual(wal.WriteBehindLog(self.tmp).replay(), 2)
+        self.assertEqual(wal.commit_records(records), [])
+        # O mesmo registro repetido no lote também só entra uma vez
+        again = wal_record(self.accepted_at)
+        self.assertEqual(len(wal.commit_records([again, again])), 1)
+        self.assertEqual(ContactMessage.objects.count(), 5)
+
+    def test_locked_segment_is_left_alone(self):
+        self.write_segment([wal_record(self.accepted_at)])
+        segment = wal.Segment(next(self.tmp.iterdir()))
+        self.addCleanup(segment.file.close)
+        # Em uso por um processo vivo (flock): não é reaplicado
+        self.assertEqual(wal.WriteBehindLog(self.tmp).replay(), 0)
+        self.assertEqual(ContactMessage.objects.count(), 0)
+
+    def test_replay_moves_rejected_records_aside(self):
+        good = [wal_record(self.accepted_at, name=f'Pessoa {chr(65 + i)}') for i in range(3)]
+        # NOT NULL no banco: o lote inteiro falharia
+        poisoned = wal_record(self.accepted_at, name=None)
+        tail = b'{"id": lixo\n' + (json.dumps(good[2]) + '\n').encode()
+        path = self.write_segment([good[0], poisoned, good[1]], tail=tail)
+        with self.assertLogs('contact.wal', 'WARNING') as captured:
+            self.assertEqual(wal.WriteBehindLog(self.tmp).replay(), 3)
+        self.assertFalse(path.exists())
+        self.assertEqual(
+            sorted(str(value) for value in ContactMessage.objects.values_list('ingest_id', flat=True)),
+            sorted(record['id'] for record in good),
+        )
+        (dead,) = self.tmp.glob(f'*{wal.DEAD_SUFFIX}')
+        unreadable, rejected = [json.loads(line) for line in dead.open()]
+        # Linha ilegível no meio do arquivo também vai para o .dead
+        self.assertEqual(unreadable['record'], '{"id": lixo\n')
+        self.assertEqual(rejected['record'], poisoned)
+        self.assertIn('IntegrityError', rejected['error'])
+        self.assertEqual(sum('movido para' in message for message in captured.output), 2)
+
+
+class WriteBehindLogTests(TempDirMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Sem a thread de gravação: o lote só vai ao banco quando o teste chama flush()
+        patcher = mock.patch.object(wal.WriteBehindLog, 'start')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log = wal.WriteBehindLog(self.tmp)
+        self.addCleanup(self.log.close)
+        self.accepted_at = timezone.now()
+
+    def records(self, count):
+        return [wal_record(self.accepted_at, name=f'Pessoa {chr(65 + i)}') for i in range(count)]
+
+    def test_rejected_record_does_not_block_the_batch(self):
+        first, second = self.records(2)
+        poisoned = {**wal_record(self.accepted_at), 'created_at': 'não é data'}
+        for record in (first, poisoned, second):
+            self.log.append(record)
+        with self.assertLogs('contact.wal', 'WARNING'):
+            self.assertEqual(self.log.flush(), 3)
+        self.assertEqual(ContactMessage.objects.count(), 2)
+        self.assertEqual(self.log.stats()['rejected'], 1)
+        self.assertEqual(self.log.stats()['buffered'], 0)
+        (dead,) = self.tmp.glob(f'*{wal.DEAD_SUFFIX}')
+        self.assertEqual(json.loads(dead.read_text())['record']['id'], poisoned['id'])
+
+    def test_database_errors_keep_the_batch(self):
+        for record in self.records(2):
+            self.log.append(record)
+        with mock.patch('contact.wal._commit', side_effect=OperationalError('banco fora do ar')), \
+                self.assertLogs('contact.wal', 'WARNING'), self.assertRaises(OperationalError):
+            self.log.flush()
+        self.assertEqual(self.log.stats()['buffered'], 2)
+        self.assertEqual(list(self.tmp.glob(f'*{wal.DEAD_SUFFIX}')), [])
+        self.assertEqual(self.log.flush(), 2)
+
+    def test_fsync_failure_accepts_the_message(self):
+        first, second, third = self.records(3)
+        self.log.append(first)
+        segment = self.log._segment
+        with mock.patch('contact.wal.os.fsync', side_effect=OSError('EIO')), \
+                self.assertLogs('contact.wal', 'ERROR'):
+            self.log.append(second)
+        # Aceita (vai para o banco no lote), mas o arquivo não recebe mais escritas
+        self.assertEqual(self.log.stats()['sync_errors'], 1)
+        self.assertFalse(segment.active)
+        self.log.append(third)
+        self.assertIsNot(self.log._segment, segment)
+        self.assertEqual(self.log.flush(), 3)
+        self.assertEqual(ContactMessage.objects.count(), 3)
+        self.assertFalse(segment.path.exists())
+
+    def test_failed_write_leaves_no_partial_line(self):
+        first, second, third = self.records(3)
+        self.log.append(first)
+        segment = self.log._segment
+        real = segment.file
+
+        class ShortWrite:
+            def write(self, data):
+                return real.write(data[:10])
+
+            def fileno(self):
+                return real.fileno()
+
+        segment.file = ShortWrite()
+        try:
+            with self.assertRaises(OSError):
+                self.log.append(second)
+        finally:
+            segment.file = real
+        line = json.dumps(first, ensure_ascii=False, separators=(',', ':'))
+        self.assertEqual(segment.path.read_text().splitlines(), [line])
+        self.log.append(third)
+        self.assertIsNot(self.log._segment, segment)
+        self.assertEqual(self.log.flush(), 2)
+        self.assertEqual(
+            sorted(str(value) for value in ContactMessage.objects.values_list('ingest_id', flat=True)),
+            sorted([first['id'], third['id']]),
+        )
+
+    @override_settings(CONTACT_WRITE_BEHIND=True)
+    def test_submit_drops_ip_addresses_the_database_rejects(self):
+        for ip_address, expected in (('203.0.113.7', '203.0.113.7'), ('fe80::1%eth0', None), ('', None)):
+            serializer = ContactMessageSerializer(data=contact_payload())
+            self.assertTrue(serializer.is_valid())
+            with self.subTest(ip_address=ip_address), \
+                    mock.patch('contact.wal.get_log', return_value=self.log):
+                self.assertEqual(submit_contact_message(serializer, ip_address).ip_address, expected)
+                self.assertEqual(self.log._buffer[-1][1]['ip_address'], expected)
+
+
+class HourlyStatsTests(TestCase):
+
+    def snapshot(self):
+        return list(HourlyStats.objects.filter(total__gt=0).order_by('hour').values_list('hour', 'total', 'unread'))
+
+    def test_incremental_counts_match_rebuild(self):
+        start = datetime(2024, 5, 2, 9, 40, tzinfo=dt_timezone.utc)
+        # Mensagens em quatro horas diferentes, mais as de agora
+        wal.commit_records([
+            wal_record(start + timedelta(minutes=25 * i), name=f'Pessoa {chr(65 + i)}') for i in range(8)
+        ])
+        create_messages(3)
+
+        model_admin = ContactMessageAdmin(ContactMessage, site)
+        messages = ContactMessage.objects.order_by('created_at')
+        inbox.mark(messages.filter(pk__in=list(messages.values_list('pk', flat=True)[:6])), True)
+        inbox.mark(messages.filter(pk=messages[1].pk), False)
+        model_admin.delete_queryset(None, messages.filter(pk__in=[messages[2].pk, messages[7].pk]))
+        model_admin.delete_model(None, messages.last())
+
+        incremental = self.snapshot()
+        self.assertEqual(sum(total for _, total, _ in incremental), 8)
+        self.assertEqual(incremental[0], (datetime(2024, 5, 2, 9, tzinfo=dt_timezone.utc), 1, 0))
+        call_command('rebuild_stats', stdout=io.StringIO())
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(stats.totals(), {'total': 8, 'unread': 4, 'unread_ratio': 0.5})
+
+    def test_daily_uses_the_local_day(self):
+        # 01h UTC ainda é o dia anterior em São Paulo
+        wal.commit_records([
+            wal_record(datetime(2024, 5, 3, 1, tzinfo=dt_timezone.utc)),
+            wal_record(datetime(2024, 5, 3, 15, tzinfo=dt_timezone.utc), name='Bruno Lima'),
+        ])
+        self.assertEqual(
+            [(row['date'].isoformat(), row['total']) for row in stats.daily()],
+            [('2024-05-02', 1), ('2024-05-03', 1)],
+        )
+        self.assertEqual(stats.daily(tz=dt_timezone.utc)[0]['total'], 2)
+
+
+class LeanMiddlewareTests(TestCase):
+    url = '/api/contact/health/'
+
+    def test_api_routes_skip_the_rest_of_the_stack(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        # X-Frame-Options é do último middleware da pilha
+        self.assertNotIn('X-Frame-Options', response)
+
+    async def test_async_stack(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Frame-Options', response)
+
+    def test_full_stack_outside_the_shortcut(self):
+        self.client.cookies[django_settings.SESSION_COOKIE_NAME] = 'sessao'
+        self.assertIn('X-Frame-Options', self.client.get(self.url))
+        self.client.cookies.clear()
+        self.assertIn('X-Frame-Options', self.client.get('/admin/'))
+        # Caminho que não resolve: o APPEND_SLASH do CommonMiddleware continua valendo
+        response = self.client.get(self.url.rstrip('/'))
+        self.assertEqual((response.status_code, response['Location']), (301, self.url))
+
+    def test_disabled_by_setting_or_atomic_requests(self):
+        with override_settings(API_LEAN_MIDDLEWARE=False), self.assertRaises(MiddlewareNotUsed):
+            LeanAPIMiddleware(lambda request: None)
+        with mock.patch.dict(django_settings.DATABASES['default'], ATOMIC_REQUESTS=True), \
+                self.assertRaises(MiddlewareNotUsed):
+            LeanAPIMiddleware(lambda request: None)
+
+
+class FakeConnection:
+    """Conexão DB-API mínima para o pool; `healthy=False` faz o SELECT 1 falhar"""
+
+    def __init__(self, healthy=True):
+        self.healthy = healthy
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        if not self.healthy:
+            raise OSError('conexão perdida')
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_reuses_the_most_recent_idle_connection(self):
+        pool = ConnectionPool(max_size=2)
+        first, second = pool.acquire(FakeConnection), pool.acquire(FakeConnection)
+        pool.release(first)
+        pool.release(second)
+        self.assertIs(pool.acquire(FakeConnection), second)
+        self.assertEqual(
+            {key: pool.stats()[key] for key in ('opened', 'reused', 'size', 'idle')},
+            {'opened': 2, 'reused': 1, 'size': 2, 'idle': 1},
+        )
+
+    def test_waits_for_a_free_slot_then_times_out(self):
+        pool = ConnectionPool(max_size=1, timeout=0.05)
+        entry = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        threading.Timer(0.01, pool.release, [entry]).start()
+        pool.timeout = 5
+        self.assertIs(pool.acquire(FakeConnection), entry)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_unhealthy_idle_connection_is_replaced(self):
+        pool = ConnectionPool(check_interval=0)
+        stale = pool.acquire(lambda: FakeConnection(healthy=False))
+        pool.release(stale)
+        fresh = pool.acquire(FakeConnection)
+        self.assertIsNot(fresh, stale)
+        self.assertTrue(stale.connection.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+
+    def test_closes_broken_expired_and_idle_connections(self):
+        pool = ConnectionPool(min_size=0, max_idle=0, max_lifetime=60)
+        for kwargs in ({'broken': True}, {}):
+            entry = pool.acquire(FakeConnection)
+            pool.release(entry, **kwargs)
+            self.assertTrue(entry.connection.closed)
+        pool.max_lifetime = 0
+        entry = pool.acquire(FakeConnection)
+        pool.release(entry)
+        self.assertTrue(entry.connection.closed)
+        self.assertEqual((pool.stats()['size'], pool.stats()['closed']), (0, 3))
+
+    def test_failed_open_frees_the_slot(self):
+        pool = ConnectionPool(max_size=1, timeout=0)
+        with self.assertRaises(OSError):
+            pool.acquire(mock.Mock(side_effect=OSError('recusada')))
+        pool.acquire(FakeConnection)
+
+    def test_database_wrapper_returns_connections_to_the_pool(self):
+        from .db.sqlite3.base import DatabaseWrapper
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        settings_dict = {
+            **connection.settings_dict,
+            'NAME': os.path.join(tmp, 'pool.sqlite3'),
+            'POOL': {'max_size': 1},
+        }
+        wrapper = DatabaseWrapper(settings_dict, alias='pool-test')
+        self.addCleanup(close_pools)
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertEqual(wrapper.pool.stats()['idle'], 1)
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw)
+        # Fechada no meio de uma transação: não volta ao pool
+        wrapper.set_autocommit(False)
+        wrapper.in_atomic_block = True
+        wrapper.close()
+        self.assertEqual(wrapper.pool.stats()['size'], 0)
+
+
+class BlockingStream(io.StringIO):
+    """stdout lento: a escrita espera `release` (a fila do log enche)"""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+
+    def write(self, value):
+        self.release.wait(5)
+        return super().write(value)
+
+
+class StructuredLoggingTests(SimpleTestCase):
+
+    def handler(self, stream, **kwargs):
+        handler = logs.NonBlockingQueueHandler(stream=stream, **kwargs)
+        handler.setFormatter(logs.JSONFormatter())
+        logger = logging.getLogger(f'contact.tests.{self._testMethodName}')
+        logger.propagate = False
+        logger.addHandler(handler)
+        self.addCleanup(logger.removeHandler, handler)
+        return handler, logger
+
+    def lines(self, handler, stream):
+        handler.close()
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    def test_json_lines_with_context(self):
+        stream = io.StringIO()
+        handler, logger = self.handler(stream)
+        token = logs.request_id.set('abc123')
+        try:
+            logger.info('Mensagem %s de %s', 7, 'Ana', extra={'message_id': 7})
+            try:
+                raise ValueError('falhou')
+            except ValueError:
+                logger.exception('Erro')
+        finally:
+            logs.request_id.reset(token)
+        info, error = self.lines(handler, stream)
+        self.assertEqual(
+            {key: info[key] for key in ('level', 'message', 'message_id', 'request_id')},
+            {'level': 'INFO', 'message': 'Mensagem 7 de Ana', 'message_id': 7, 'request_id': 'abc123'},
+        )
+        self.assertIn('ValueError: falhou', error['exc'])
+
+    def test_full_queue_drops_without_blocking(self):
+        stream = BlockingStream()
+        handler, logger = self.handler(stream, capacity=2, sample_rate=1)
+        start = time.perf_counter()
+        for i in range(10):
+            logger.warning('registro %s', i)
+        self.assertLess(time.perf_counter() - start, 1)
+        dropped = handler.stats()['dropped']
+        self.assertGreater(dropped, 0)
+        stream.release.set()
+        handler.queue.join()
+        # O total descartado vai no próximo registro que entrar na fila
+        logger.warning('depois')
+        lines = self.lines(handler, stream)
+        self.assertEqual(lines[-1]['message'], 'depois')
+        self.assertEqual(sum(line.get('dropped', 0) for line in lines), dropped)
+        self.assertEqual(len(lines), 11 - dropped)
+
+    def test_info_is_sampled_under_pressure(self):
+        stream = io.StringIO()
+        handler, logger = self.handler(stream, sample_rate=0, sample_above=0)
+        logger.info('amostrado')
+        logger.warning('mantido')
+        self.assertEqual([line['message'] for line in self.lines(handler, stream)], ['mantido'])
+        self.assertEqual(handler.stats()['sampled_out'], 1)
+
+    @override_settings(LOG_FORMAT='json')
+    def test_request_id_header(self):
+        seen = []
+
+        def view(request):
+            seen.append(logs.request_id.get())
+            return HttpResponse()
+
+        middleware = RequestLogMiddleware(view)
+        with self.assertLogs('contact.access', 'INFO') as captured:
+            response = middleware(RequestFactory().get('/api/contact/health/', HTTP_X_REQUEST_ID='req-1'))
+            generated = middleware(RequestFactory().get('/api/contact/health/'))
+        self.assertEqual(seen[0], 'req-1')
+        self.assertEqual(response['X-Request-ID'], 'req-1')
+        self.assertEqual(generated['X-Request-ID'], seen[1])
+        self.assertIsNone(logs.request_id.get())
+        self.assertEqual(captured.records[0].status, 200)
+        with override_settings(LOG_FORMAT='text'), self.assertRaises(MiddlewareNotUsed):
+            RequestLogMiddleware(view)
+
+
+def probe_results(database='ok'):
+    return {'database': {'status': database}, 'outbox': {'status': 'ok'}, 'sendgrid': {'status': 'disabled'}}
+
+
+class HealthCheckTests(TestCase):
+
+    def test_probes(self):
+        queued_messages(2)
+        EmailOutbox.objects.update(created_at=timezone.now() - timedelta(seconds=1000))
+        checks = health.run_probes()
+        self.assertEqual(checks['database']['status'], health.OK)
+        self.assertEqual(
+            {key: checks['outbox'][key] for key in ('status', 'pending', 'dead')},
+            {'status': health.DEGRADED, 'pending': 2, 'dead': 0},
+        )
+        self.assertEqual(checks['sendgrid']['status'], health.DISABLED)
+
+    def test_sendgrid_probe_only_opens_a_connection(self):
+        with FakeSendGridServer() as server:
+            with override_settings(SENDGRID_API_KEY='SG.teste', SENDGRID_API_HOST=server.url):
+                self.assertEqual(health.run_probes()['sendgrid']['status'], health.OK)
+            self.assertEqual(server.requests, 0)
+        with override_settings(SENDGRID_API_KEY='SG.teste', SENDGRID_API_HOST=server.url):
+            # Servidor já fechado: falha registrada, não levantada
+            self.assertEqual(health.run_probes()['sendgrid']['status'], health.ERROR)
+
+    @override_settings(HEALTH_CACHE_SECONDS=60)
+    def test_snapshot_is_cached_and_refreshed_in_background(self):
+        monitor = health.HealthMonitor()
+        with mock.patch('contact.health.run_probes', return_value=probe_results()) as probes:
+            first = monitor.snapshot()
+            self.assertIs(monitor.snapshot(), first)
+            self.assertEqual(probes.call_count, 1)
+            with override_settings(HEALTH_CACHE_SECONDS=0):
+                # Resultado velho: devolvido na hora, a rodada nova vem em segundo plano
+                self.assertIs(monitor.snapshot(), first)
+                monitor._refreshing.join(5)
+            self.assertEqual(probes.call_count, 2)
+            self.assertIsNot(monitor.snapshot(), first)
+
+    def test_ready_endpoint(self):
+        url = '/api/contact/ready/'
+        for database, status_code in (('ok', 200), ('error', 503)):
+            with self.subTest(database=database), \
+                    mock.patch('contact.health.monitor', health.HealthMonitor()), \
+                    mock.patch('contact.health.run_probes', return_value=probe_results(database)):
+                response = APIClient().get(url)
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response.json()['checks']['database']['status'], database)
+
+    @override_settings(HEALTH_MAX_STALE_SECONDS=30)
+    def test_stale_results_are_unready(self):
+        monitor = health.HealthMonitor()
+        monitor._pid = os.getpid()
+        monitor._snapshot = health.Snapshot(probe_results(), timezone.now(), time.monotonic() - 31)
+        # Uma rodada travada: o resultado não é renovado
+        monitor._refreshing = mock.Mock(is_alive=mock.Mock(return_value=True))
+        with mock.patch('contact.health.monitor', monitor):
+            ready, payload = health.readiness()
+        self.assertFalse(ready)
+        self.assertEqual(payload['reason'], 'Verificações sem resposta.')
+
+
+@skipIf(metrics.prometheus_client is None, 'prometheus_client não carregado (sem METRICS_TOKEN nem DEBUG)')
+@override_settings(METRICS_TOKEN='segredo')
+class MetricsTests(TestCase):
+    url = '/metrics'
+
+    def scrape(self, token='segredo'):
+        return self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_requires_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        self.assertEqual(self.scrape('outro').status_code, 401)
+        self.assertEqual(self.scrape('segredo-mais-longo').status_code, 401)
+        self.assertEqual(self.scrape().status_code, 200)
+        with override_settings(METRICS_TOKEN='', DEBUG=False):
+            self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_outbox_gauges_come_from_the_database(self):
+        queued_messages(2)
+        EmailOutbox.objects.filter(pk=queued_messages(1)[0].pk).update(status=EmailOutbox.Status.DEAD)
+        # Processo que nunca atendeu /ready/: não há resultado das verificações em cache
+        with mock.patch('contact.health.monitor', health.HealthMonitor()) as monitor:
+            body = self.scrape().content.decode()
+        self.assertIsNone(monitor._snapshot)
+        self.assertIn('contact_outbox_pending 2.0', body)
+        self.assertIn('contact_outbox_dead 1.0', body)
+        self.assertIn('contact_outbox_oldest_pending_seconds', body)
+
+    def test_request_latency_by_view(self):
+        self.client.get('/api/contact/health/')
+        body = self.scrape().content.decode()
+        self.assertIn(
+            'contact_http_request_duration_seconds_count{method="GET",status="200",view="contact:health_check"}', body,
+        )
+
+
+class ExportTests(TempDirMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        create_messages(2, message='Linha 1\nLinha 2, com "aspas"')
+        self.old, self.new = ContactMessage.objects.order_by('id')
+        ContactMessage.objects.filter(pk=self.old.pk).update(
+            created_at=datetime(2024, 1, 10, 12, tzinfo=dt_timezone.utc), is_read=True,
+        )
+        self.old.refresh_from_db()
+
+    def test_csv_round_trip(self):
+        with mock.patch('contact.exporter.BUFFER_SIZE', 100):
+            chunks = list(exporter.export_stream(exporter.filter_messages(), 'csv', chunk_size=1))
+        # Blocos de ~BUFFER_SIZE, não um por linha nem o arquivo inteiro
+        self.assertGreater(len(chunks), 1)
+        rows = list(csv.DictReader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+        self.assertEqual([int(row['id']) for row in rows], [self.old.pk, self.new.pk])
+        self.assertEqual(rows[0]['message'], 'Linha 1\nLinha 2, com "aspas"')
+        self.assertEqual(rows[0]['is_read'], 'True')
+
+    def test_command_writes_filtered_gzip_jsonl(self):
+        path = self.tmp / 'nao-lidas.jsonl.gz'
+        call_command('export_contacts', '--format', 'jsonl', '--unread', '--since', '2024-01-11', '-o', str(path),
+                     stderr=io.StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record['id'] for record in records], [self.new.pk])
+        self.assertEqual(records[0]['message'], self.new.message)
+
+    def test_command_rejects_invalid_dates(self):
+        with self.assertRaises(CommandError):
+            call_command('export_contacts', '--until', '31/01/2024', '-o', str(self.tmp / 'x.csv'))
+
+    def test_until_date_includes_the_whole_day(self):
+        until = exporter.parse_bound('2024-01-10', end=True)
+        self.assertEqual(list(exporter.filter_messages(until=until)), [self.old])
+
+    def test_admin_action_streams_the_selection(self):
+        admin = ContactMessageAdmin(ContactMessage, site)
+        response = admin.export_jsonl_gzip(None, ContactMessage.objects.filter(pk=self.new.pk))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.jsonl.gz"', response['Content-Disposition'])
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode('utf-8').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.new.pk])
+
+
+class ArchiveTests(TempDirMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        settings = override_settings(CONTACT_ARCHIVE_DIR=str(self.tmp / 'archive'))
+        settings.enable()
+        self.addCleanup(settings.disable)
+        create_messages(4)
+        self.january, self.month_end, self.february, self.recent = ContactMessage.objects.order_by('id')
+        for message, moment in (
+            (self.january, datetime(2024, 1, 15, 12)),
+            # 22h do dia 31 no horário local: partição de janeiro
+            (self.month_end, datetime(2024, 2, 1, 1)),
+            (self.february, datetime(2024, 2, 20, 12)),
+        ):
+            ContactMessage.objects.filter(pk=message.pk).update(
+                created_at=moment.replace(tzinfo=dt_timezone.utc), email=f'{message.name[-1]}@Example.com',
+            )
+        # Mensagem antiga com a notificação ainda na fila: fica na tabela
+        self.pending = queued_messages(1)[0].message
+        ContactMessage.objects.filter(pk=self.pending.pk).update(
+            created_at=datetime(2024, 1, 20, tzinfo=dt_timezone.utc),
+        )
+
+    def archived_ids(self, **filters):
+        return sorted(record['id'] for record in archive.lookup(**filters))
+
+    def test_archives_into_monthly_partitions(self):
+        self.assertEqual(archive.archive_messages(archive.cutoff_for(365), batch_size=2), (3, 2))
+        self.assertEqual(
+            sorted(ContactMessage.objects.values_list('pk', flat=True)), [self.recent.pk, self.pending.pk],
+        )
+        self.assertEqual(archive.partitions(), ['2024-01', '2024-02'])
+        self.assertEqual(
+            sorted(path.name for path in (self.tmp / 'archive' / '2024-01').iterdir()),
+            [f'{self.january.pk}-{self.month_end.pk}.jsonl.gz'],
+        )
+        self.assertEqual(archive.archive_batch(archive.cutoff_for(365)), (0, []))
+
+    def test_lookup(self):
+        archive.archive_messages(archive.cutoff_for(365))
+        self.assertEqual(self.archived_ids(email='a@example.com'), [self.january.pk])
+        self.assertEqual(self.archived_ids(text='ORÇAMENTO'), [self.january.pk, self.month_end.pk, self.february.pk])
+        self.assertEqual(self.archived_ids(message_id=self.february.pk), [self.february.pk])
+        since = exporter.parse_bound('2024-02-01')
+        self.assertEqual(self.archived_ids(since=since), [self.february.pk])
+        self.assertEqual(self.archived_ids(until=since), [self.january.pk, self.month_end.pk])
+
+    def test_interrupted_batch_is_archived_again_without_duplicates(self):
+        with mock.patch('contact.inbox.record_deleted', side_effect=RuntimeError('queda')), \
+                self.assertRaises(RuntimeError):
+            archive.archive_messages(archive.cutoff_for(365))
+        # Arquivo escrito, DELETE desfeito: as mensagens continuam na tabela
+        self.assertEqual(ContactMessage.objects.count(), 5)
+        self.assertEqual(archive.archive_messages(archive.cutoff_for(365)), (3, 2))
+        self.assertEqual(self.archived_ids(), [self.january.pk, self.month_end.pk, self.february.pk])
+
+    def test_commands(self):
+        out = io.StringIO()
+        call_command('archive_contacts', '--dry-run', stdout=out)
+        self.assertIn('3 mensagens', out.getvalue())
+        self.assertEqual(ContactMessage.objects.count(), 5)
+        with self.assertRaises(CommandError):
+            call_command('archive_contacts', '--days', '0')
+        call_command('archive_contacts', stdout=io.StringIO())
+        out = io.StringIO()
+        call_command('archive_lookup', '--email', 'C@example.com', stdout=out, stderr=io.StringIO())
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()], [self.february.pk])
+
+
+class InboxSummaryTests(TestCase):
+    url = '/api/contact/summary/'
+
+    def setUp(self):
+        self.client = staff_client()
+        cache.clear()
+
+    def test_etag_and_not_modified(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_messages(2)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.json()['total'], response.json()['unread']), (2, 2))
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        # A listagem usa o mesmo validador
+        self.assertEqual(self.client.get('/api/contact/messages/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            inbox.mark(ContactMessage.objects.filter(pk=ContactMessage.objects.first().pk), True)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['unread'], 1)
+
+    def test_requires_staff(self):
+        self.assertIn(APIClient().get(self.url).status_code, (401, 403))
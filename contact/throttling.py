@@ -0,0 +1,210 @@
+"""
+Throttles com janela deslizante compartilhada entre processos.
+
+O throttle padrão do DRF guarda a lista de timestamps de cada IP no cache
+do Django, que sem CACHES configurado é um LocMemCache por processo: com N
+workers o limite real vira N vezes o configurado, e a lista cresce com o
+limite. Aqui cada chave guarda só três números (janela atual, contagem da
+janela atual e da anterior) e a contagem é estimada pela janela deslizante:
+
+    estimativa = anterior * (1 - decorrido / duração) + atual
+
+O estado fica em um arquivo SQLite local (compartilhado pelos workers da
+mesma máquina) ou no Redis quando THROTTLE_REDIS_URL estiver definido.
+"""
+import math
+import os
+import random
+import sqlite3
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.throttling import AnonRateThrottle
+
+from . import metrics
+from .ipfilter import client_ip
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Fração dos hits que também removem chaves expiradas do SQLite
+PURGE_PROBABILITY = 0.001
+
+
+def sliding_window(window, current, previous, stored_window, limit, duration, now):
+    """
+    Aplica um hit ao estado (`stored_window`, `current`, `previous`) de uma
+    chave na janela `window`. Retorna (permitido, atual, anterior, espera).
+    """
+    if stored_window != window:
+        previous = current if stored_window == window - 1 else 0
+        current = 0
+    elapsed = now - window * duration
+    estimate = previous * (1 - elapsed / duration) + current
+    if estimate + 1 <= limit:
+        return True, current + 1, previous, None
+    remaining = duration - elapsed
+    if previous and current < limit:
+        # Espera até o peso da janela anterior cair o suficiente
+        wait = min((estimate + 1 - limit) * duration / previous, remaining)
+    else:
+        wait = remaining
+    return False, current, previous, wait
+
+
+class SQLiteThrottleBackend:
+    """Estado dos throttles em um arquivo SQLite (WAL) compartilhado pelos processos"""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle ('
+                'key TEXT PRIMARY KEY, window INTEGER, current INTEGER, previous INTEGER, expires_at REAL)'
+            )
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def hit(self, key, limit, duration, now):
+        window = int(now // duration)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT window, current, previous FROM throttle WHERE key = ?', (key,)
+            ).fetchone()
+            stored_window, current, previous = row or (None, 0, 0)
+            allowed, current, previous, wait = sliding_window(
+                window, current, previous, stored_window, limit, duration, now
+            )
+            if allowed:
+                connection.execute(
+                    'INSERT OR REPLACE INTO throttle (key, window, current, previous, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, window, current, previous, (window + 2) * duration),
+                )
+            if random.random() < PURGE_PROBABILITY:
+                connection.execute('DELETE FROM throttle WHERE expires_at < ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return allowed, wait
+
+    def clear(self):
+        self._connection().execute('DELETE FROM throttle')
+
+
+class RedisThrottleBackend:
+    """Estado dos throttles no Redis, atualizado atomicamente por um script Lua"""
+
+    SCRIPT = """
+        local limit = tonumber(ARGV[1])
+        local duration = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local window = math.floor(now / duration)
+        local data = redis.call('HMGET', KEYS[1], 'window', 'current', 'previous')
+        local stored = tonumber(data[1])
+        local current = tonumber(data[2]) or 0
+        local previous = tonumber(data[3]) or 0
+        if stored ~= window then
+            if stored == window - 1 then previous = current else previous = 0 end
+            current = 0
+        end
+        local estimate = previous * (1 - (now - window * duration) / duration) + current
+        if estimate + 1 > limit then
+            return {0, current, previous}
+        end
+        current = current + 1
+        redis.call('HSET', KEYS[1], 'window', window, 'current', current, 'previous', previous)
+        redis.call('EXPIRE', KEYS[1], duration * 2)
+        return {1, current, previous}
+    """
+
+    def __init__(self, url):
+        if redis is None:
+            raise ImportError('THROTTLE_REDIS_URL requer o pacote redis')
+        self.client = redis.Redis.from_url(url)
+        self.script = self.client.register_script(self.SCRIPT)
+
+    def hit(self, key, limit, duration, now):
+        allowed, current, previous = self.script(keys=[key], args=[limit, duration, now])
+        if allowed:
+            return True, None
+        window = int(now // duration)
+        _, _, _, wait = sliding_window(window, current, previous, window, limit, duration, now)
+        return False, wait
+
+    def clear(self):
+        for key in self.client.scan_iter('throttle_*'):
+            self.client.delete(key)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Backend compartilhado pelo processo: Redis se configurado, senão SQLite"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings.THROTTLE_REDIS_URL:
+                _backend = RedisThrottleBackend(settings.THROTTLE_REDIS_URL)
+            else:
+                _backend = SQLiteThrottleBackend(settings.THROTTLE_SQLITE_PATH)
+        return _backend
+
+
+@receiver(setting_changed)
+def _reset_backend(setting, **kwargs):
+    global _backend
+    if setting.startswith('THROTTLE_'):
+        with _backend_lock:
+            _backend = None
+
+
+class SlidingWindowThrottleMixin:
+    """
+    Substitui o histórico em cache do SimpleRateThrottle pelo contador de
+    janela deslizante do backend compartilhado.
+    """
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        allowed, self._wait = get_backend().hit(self.key, self.num_requests, self.duration, self.timer())
+        if not allowed:
+            metrics.THROTTLE_REJECTIONS.labels(self.scope).inc()
+        return allowed
+
+    def wait(self):
+        return math.ceil(self._wait) if self._wait is not None else None
+
+
+class SharedAnonRateThrottle(SlidingWindowThrottleMixin, AnonRateThrottle):
+    """AnonRateThrottle (taxa `anon` do REST_FRAMEWORK) com contagem compartilhada"""
+
+    def get_ident(self, request):
+        # Mesmo IP do filtro e da mensagem gravada (ver TRUSTED_PROXIES)
+        return client_ip(request)
+
+
+class ContactThrottle(SharedAnonRateThrottle):
+    scope = 'contact'
+    rate = '5/hour'
@@ -1,9 +1,19 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 app_name = 'contact'
 
 urlpatterns = [
-    path('send/', views.send_contact_message, name='send_message'),
+    path(
+        'send/',
+        views.send_contact_message_async if settings.CONTACT_ASYNC_VIEWS else views.send_contact_message,
+        name='send_message',
+    ),
+    path('bulk/', views.bulk_import_messages, name='bulk_import'),
+    path('summary/', views.inbox_summary, name='inbox_summary'),
+    path('messages/', views.list_messages, name='message_list'),
+    path('stats/', views.message_stats, name='message_stats'),
     path('health/', views.health_check, name='health_check'),
+    path('ready/', views.readiness_check, name='readiness_check'),
 ]
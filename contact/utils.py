@@ -0,0 +1,12 @@
+"""
+Funções pequenas usadas pelas views e pelos middlewares.
+
+Sem dependência do DRF nem das views: o middleware importa daqui no carregamento
+do MIDDLEWARE, antes de qualquer requisição (ver contact.startup).
+"""
+from .ipfilter import client_ip
+
+
+def get_client_ip(request):
+    """Obter IP do cliente (considerando TRUSTED_PROXIES)"""
+    return client_ip(request)
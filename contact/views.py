@@ -1,32 +1,46 @@
+import json
+from types import GeneratorType
+from datetime import datetime, time, timedelta
+from asgiref.sync import sync_to_async
 from rest_framework import status
-from rest_framework.decorators import api_view, throttle_classes
-from rest_framework.throttling import AnonRateThrottle
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes
+from rest_framework.exceptions import MethodNotAllowed, ParseError, Throttled
+from rest_framework.parsers import JSONParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
 from django.conf import settings
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.csrf import csrf_exempt
+from . import health, inbox, ipfilter, stats
+from .importer import import_messages
 from .models import ContactMessage
+from .paginator import keyset_page
+from .parsers import JSONLinesParser, JSONLParser
+from .permissions import IPFilterPermission
 from .serializers import ContactMessageSerializer
-from .tasks import send_email_async
+from .services import check_duplicate, notifications_enabled, submit_contact_message
+from .throttling import ContactThrottle
+from .utils import get_client_ip
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class ContactThrottle(AnonRateThrottle):
-    rate = '5/hour'
-
-
 @api_view(['POST'])
+@permission_classes([IPFilterPermission])
 @throttle_classes([ContactThrottle])
 def send_contact_message(request):
     """
     Endpoint para enviar mensagem de contato
     """
-    # Obter IP do cliente
-    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-    if x_forwarded_for:
-        ip_address = x_forwarded_for.split(',')[0]
-    else:
-        ip_address = request.META.get('REMOTE_ADDR')
+    ip_address = get_client_ip(request)
 
     # Validar dados
     serializer = ContactMessageSerializer(data=request.data)
@@ -39,15 +53,22 @@ def send_contact_message(request):
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        # Salvar mensagem no banco de dados
-        message = serializer.save(ip_address=ip_address)
-        
-        logger.info(f'Nova mensagem de contato: {message.name} ({message.email})')
-        
-        # Enviar notificação por email se SendGrid estiver configurado
-        if hasattr(settings, 'SENDGRID_API_KEY') and settings.SENDGRID_API_KEY:
-            send_email_async(message, ip_address)
-        else:
+        # Descartar reenvios do mesmo conteúdo (ou quase) antes de gravar
+        fingerprint, duplicate = check_duplicate(serializer.validated_data)
+        if duplicate is not None and settings.CONTACT_DEDUP_ACTION != 'flag':
+            data, status_code = _duplicate_response(serializer, duplicate, ip_address)
+            return Response(data, status=status_code)
+
+        # Salvar mensagem e enfileirar notificação por email (ou, com
+        # CONTACT_WRITE_BEHIND, registrar no log para gravação em lote)
+        message = submit_contact_message(serializer, ip_address, fingerprint, _duplicate_of(duplicate))
+
+        logger.info(
+            'Nova mensagem de contato: %s (%s)', message.name, message.email,
+            extra={'message_id': message.id, 'ip': ip_address},
+        )
+
+        if not notifications_enabled():
             logger.warning('SendGrid não configurado. Email não será enviado.')
 
         return Response({
@@ -63,7 +84,7 @@ def send_contact_message(request):
         }, status=status.HTTP_201_CREATED)
 
     except Exception as e:
-        logger.error(f'Erro ao processar mensagem: {str(e)}')
+        logger.error('Erro ao processar mensagem: %s', e, extra={'ip': ip_address})
         return Response({
             'success': False,
             'message': 'Erro ao processar sua mensagem. Por favor, tente novamente.',
@@ -71,6 +92,360 @@ def send_contact_message(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _duplicate_of(duplicate):
+    """Id da mensagem parecida, gravado na nova mensagem com CONTACT_DEDUP_ACTION='flag'"""
+    if duplicate is None:
+        return None
+    logger.info(
+        'Possível duplicata (%s, %.2f com #%s) gravada e marcada',
+        duplicate.kind, duplicate.similarity, duplicate.message_id,
+        extra={'message_id': duplicate.message_id},
+    )
+    return duplicate.message_id
+
+
+def _duplicate_response(serializer, duplicate, ip_address):
+    """
+    Resposta para uma mensagem duplicada: com CONTACT_DEDUP_ACTION='absorb'
+    o cliente recebe a mesma resposta de sucesso (sem gravação nem email);
+    com 'reject', 409.
+    """
+    logger.info(
+        'Mensagem duplicada descartada (%s, %.2f com #%s) de %s',
+        duplicate.kind, duplicate.similarity, duplicate.message_id, ip_address,
+        extra={'message_id': duplicate.message_id, 'ip': ip_address},
+    )
+    if settings.CONTACT_DEDUP_ACTION == 'reject':
+        return {
+            'success': False,
+            'message': 'Esta mensagem já foi enviada.',
+        }, status.HTTP_409_CONFLICT
+    data = serializer.validated_data
+    return {
+        'success': True,
+        'message': 'Mensagem enviada com sucesso! Responderei em breve.',
+        'data': {
+            'id': None,
+            'name': data['name'],
+            'email': data['email'],
+            'subject': data['subject'],
+            'created_at': timezone.now()
+        }
+    }, status.HTTP_201_CREATED
+
+
+def _check_throttles(request):
+    """Aplica os mesmos throttles da view síncrona; retorna a espera em segundos ou None"""
+    drf_request = Request(request)
+    for throttle_class in send_contact_message.cls.throttle_classes:
+        throttle = throttle_class()
+        if not throttle.allow_request(drf_request, None):
+            return throttle.wait()
+    return None
+
+
+def _json_response(data, status):
+    # Mesma serialização do JSONRenderer do DRF usado pela view síncrona
+    # (compacta e sem escapar acentos), byte a byte
+    return JsonResponse(
+        data, status=status, encoder=JSONEncoder,
+        json_dumps_params={'separators': (',', ':'), 'ensure_ascii': False},
+    )
+
+
+def _parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError as e:
+            raise ParseError(f'JSON parse error - {str(e)}')
+    return request.POST
+
+
+@csrf_exempt
+async def send_contact_message_async(request):
+    """
+    Versão assíncrona (ASGI) do endpoint de envio de mensagem de contato.
+
+    Mesmo contrato de `send_contact_message`; habilitada em /send/ com
+    CONTACT_ASYNC_VIEWS=True. A validação não faz I/O e roda direto no event
+    loop; o throttle (cache) e a gravação da mensagem com a notificação
+    (mesma transação) rodam via sync_to_async.
+    """
+    if request.method != 'POST':
+        # Mesmo corpo do 405 da view síncrona (MethodNotAllowed do DRF)
+        response = _json_response(
+            {'detail': str(MethodNotAllowed(request.method).detail)}, status.HTTP_405_METHOD_NOT_ALLOWED
+        )
+        response['Allow'] = 'POST'
+        return response
+
+    if ipfilter.is_blocked(get_client_ip(request)):
+        return _json_response({'detail': IPFilterPermission.message}, status.HTTP_403_FORBIDDEN)
+
+    wait = await sync_to_async(_check_throttles)(request)
+    if wait is not None:
+        response = _json_response({'detail': str(Throttled(wait).detail)}, status.HTTP_429_TOO_MANY_REQUESTS)
+        response['Retry-After'] = str(int(wait))
+        return response
+
+    try:
+        data = _parse_body(request)
+    except ParseError as e:
+        return _json_response({'detail': str(e.detail)}, status.HTTP_400_BAD_REQUEST)
+
+    ip_address = get_client_ip(request)
+    serializer = ContactMessageSerializer(data=data)
+
+    if not serializer.is_valid():
+        return _json_response({
+            'success': False,
+            'message': 'Dados inválidos.',
+            'errors': serializer.errors
+        }, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        fingerprint, duplicate = await sync_to_async(check_duplicate)(serializer.validated_data)
+        if duplicate is not None and settings.CONTACT_DEDUP_ACTION != 'flag':
+            data, status_code = _duplicate_response(serializer, duplicate, ip_address)
+            return _json_response(data, status_code)
+
+        message = await sync_to_async(submit_contact_message)(
+            serializer, ip_address, fingerprint, _duplicate_of(duplicate)
+        )
+
+        logger.info(
+            'Nova mensagem de contato: %s (%s)', message.name, message.email,
+            extra={'message_id': message.id, 'ip': ip_address},
+        )
+
+        if not notifications_enabled():
+            logger.warning('SendGrid não configurado. Email não será enviado.')
+
+        return _json_response({
+            'success': True,
+            'message': 'Mensagem enviada com sucesso! Responderei em breve.',
+            'data': {
+                'id': message.id,
+                'name': message.name,
+                'email': message.email,
+                'subject': message.subject,
+                'created_at': message.created_at
+            }
+        }, status.HTTP_201_CREATED)
+
+    except Exception as e:
+        logger.error('Erro ao processar mensagem: %s', e, extra={'ip': ip_address})
+        return _json_response({
+            'success': False,
+            'message': 'Erro ao processar sua mensagem. Por favor, tente novamente.',
+            'error': str(e) if settings.DEBUG else None
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@parser_classes([JSONParser, JSONLinesParser, JSONLParser])
+def bulk_import_messages(request):
+    """
+    Endpoint autenticado para importar mensagens em lote.
+
+    Aceita um array JSON (application/json) ou JSON Lines
+    (application/x-ndjson). Itens inválidos são reportados individualmente
+    e não impedem a gravação dos demais. Use ?notify=1 para enviar as
+    notificações por email das mensagens importadas.
+    """
+    data = request.data
+    # Só um array JSON ou o gerador do parser JSONL: qualquer outro JSON
+    # (objeto, número, string) seria iterado como se fosse a lista de itens
+    if not isinstance(data, (list, GeneratorType)):
+        return Response({
+            'success': False,
+            'message': 'Envie um array JSON ou um stream JSONL de mensagens.',
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    notify = request.query_params.get('notify', '').lower() in ('1', 'true')
+    result = import_messages(data, notify=notify)
+
+    logger.info('Importação em lote: %s mensagens gravadas, %s com erro', result['created'], result['failed'])
+
+    return Response({'success': True, **result}, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@throttle_classes([])
+def inbox_summary(request):
+    """
+    Resumo da caixa de entrada para polling (total, não lidas e data da
+    última mensagem), servido do cache. Com If-None-Match igual ao ETag
+    atual responde 304 sem corpo.
+    """
+    summary = inbox.get_summary()
+    response = _not_modified(request, summary) or Response({
+        'total': summary['total'],
+        'unread': summary['unread'],
+        'last_message_at': summary['last_message_at'],
+    })
+    return _with_validators(response, summary)
+
+
+# Campos da listagem; `message` (o corpo, grande) só com ?fields=...,message
+MESSAGE_FIELDS = ['id', 'name', 'email', 'subject', 'created_at', 'is_read', 'ip_address', 'duplicate_of', 'message']
+DEFAULT_MESSAGE_FIELDS = [field for field in MESSAGE_FIELDS if field != 'message']
+MAX_PAGE_SIZE = 200
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@throttle_classes([])
+def list_messages(request):
+    """
+    Listagem das mensagens, mais recentes primeiro, paginada por cursor.
+
+    Parâmetros: `cursor` (do campo `next` da página anterior), `limit`,
+    `fields` (lista separada por vírgulas; `message` só vem se pedido) e
+    `is_read`. ETag e Last-Modified vêm do resumo da caixa de entrada:
+    enquanto nada mudar, a página responde 304 sem consultar o banco.
+    """
+    params = request.query_params
+    errors = {}
+
+    fields = DEFAULT_MESSAGE_FIELDS
+    if params.get('fields'):
+        requested = {field.strip() for field in params['fields'].split(',') if field.strip()}
+        unknown = requested - set(MESSAGE_FIELDS)
+        if unknown:
+            errors['fields'] = [f'Campos desconhecidos: {", ".join(sorted(unknown))}.']
+        # id e created_at formam o cursor: vêm sempre
+        fields = [field for field in MESSAGE_FIELDS if field in requested | {'id', 'created_at'}]
+
+    try:
+        limit = int(params.get('limit', settings.CONTACT_API_PAGE_SIZE))
+        if not 1 <= limit <= MAX_PAGE_SIZE:
+            raise ValueError(limit)
+    except ValueError:
+        errors['limit'] = [f'Use um número entre 1 e {MAX_PAGE_SIZE}.']
+
+    is_read = params.get('is_read', '').lower()
+    if is_read not in ('', 'true', '1', 'false', '0'):
+        errors['is_read'] = ['Use true ou false.']
+
+    if errors:
+        return Response({
+            'success': False,
+            'message': 'Parâmetros inválidos.',
+            'errors': errors,
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    summary = inbox.get_summary()
+    response = _not_modified(request, summary)
+    if response is None:
+        queryset = ContactMessage.objects.all()
+        if is_read:
+            queryset = queryset.filter(is_read=is_read in ('true', '1'))
+        try:
+            rows, next_cursor = keyset_page(queryset, fields, limit, params.get('cursor'))
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'Cursor inválido.',
+            }, status=status.HTTP_400_BAD_REQUEST)
+        response = Response({
+            'results': rows,
+            'next': replace_query_param(request.build_absolute_uri(), 'cursor', next_cursor) if next_cursor else None,
+        })
+    return _with_validators(response, summary)
+
+
+STATS_PERIODS = ('day', 'hour')
+# Maior intervalo de ?period=hour (31 dias)
+MAX_STATS_HOURS = 24 * 31
+
+
+def _parse_moment(value):
+    """Data (meia-noite no fuso local) ou data e hora ISO; ValueError se inválida"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@throttle_classes([])
+def message_stats(request):
+    """
+    Mensagens por dia (`period=day`, padrão: últimos 30 dias) ou por hora
+    (`period=hour`, padrão: últimas 48 horas, no máximo 31 dias), com não
+    lidas e a proporção de não lidas. `since` e `until` (exclusivo) aceitam
+    data ou data e hora ISO. Lê só a tabela agregada (contact.stats); ETag e
+    Last-Modified são os do resumo da caixa de entrada.
+    """
+    params = request.query_params
+    errors = {}
+
+    period = params.get('period', 'day')
+    if period not in STATS_PERIODS:
+        errors['period'] = [f'Use {" ou ".join(STATS_PERIODS)}.']
+        period = 'day'
+
+    bounds = {}
+    for name in ('since', 'until'):
+        try:
+            bounds[name] = _parse_moment(params[name]) if params.get(name) else None
+        except ValueError:
+            errors[name] = ['Use uma data (AAAA-MM-DD) ou data e hora ISO 8601.']
+    since = bounds.get('since') or stats.default_since(period)
+    until = bounds.get('until')
+    if not errors and period == 'hour':
+        if (until or timezone.now()) - since > timedelta(hours=MAX_STATS_HOURS):
+            errors['since'] = [f'Intervalo por hora limitado a {MAX_STATS_HOURS // 24} dias.']
+
+    if errors:
+        return Response({
+            'success': False,
+            'message': 'Parâmetros inválidos.',
+            'errors': errors,
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    summary = inbox.get_summary()
+    response = _not_modified(request, summary) or Response({
+        'period': period,
+        'since': since,
+        'until': until,
+        **stats.totals(since, until),
+        'results': stats.daily(since, until) if period == 'day' else stats.hourly(since, until),
+    })
+    return _with_validators(response, summary)
+
+
+def _last_modified(summary):
+    return int(summary['updated_at'].timestamp()) if summary['updated_at'] else None
+
+
+def _not_modified(request, summary):
+    """Resposta 304 se o cliente já tem a versão atual do resumo (ou None)"""
+    return get_conditional_response(
+        request, etag=quote_etag(f'inbox-{summary["version"]}'), last_modified=_last_modified(summary)
+    )
+
+
+def _with_validators(response, summary):
+    response['ETag'] = quote_etag(f'inbox-{summary["version"]}')
+    last_modified = _last_modified(summary)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    # O cliente pode guardar a resposta, mas deve revalidar a cada consulta
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @api_view(['GET'])
 def health_check(request):
     """
@@ -81,3 +456,15 @@ def health_check(request):
         'message': 'API do Portfolio funcionando',
         'version': '1.0.0'
     })
+
+
+@api_view(['GET'])
+@throttle_classes([])
+def readiness_check(request):
+    """
+    Endpoint de prontidão para o load balancer: banco, fila de notificações
+    e SendGrid, a partir do resultado em cache (ver contact.health).
+    Retorna 503 quando o banco está inacessível.
+    """
+    ready, payload = health.readiness()
+    return Response(payload, status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE)
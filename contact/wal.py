@@ -0,0 +1,482 @@
+"""
+Gravação adiada (write-behind) das mensagens de contato.
+
+Com CONTACT_WRITE_BEHIND, /api/contact/send/ não espera o INSERT: a mensagem
+validada vira uma linha JSON num log local (CONTACT_WAL_DIR), o log é
+sincronizado com fsync e só então a resposta sai. Uma thread por processo
+junta o que chegou e grava no banco a cada CONTACT_WAL_FLUSH_SECONDS (ou a
+cada CONTACT_WAL_BATCH_SIZE mensagens), num único bulk_create por lote, com
+as notificações na mesma transação.
+
+- fsync em grupo: requisições simultâneas compartilham o mesmo fsync, então
+  o custo por mensagem cai com a carga.
+- Cada processo escreve nos próprios segmentos (`<pid>-<ns>.wal`), travados
+  com flock enquanto abertos. Um segmento sem trava ao iniciar é de um
+  processo que morreu, e é reaplicado em segundo plano por qualquer worker
+  (ou pelo comando replay_wal) e depois apagado.
+- O `ingest_id` de cada registro vai para a ContactMessage (único): reaplicar
+  um segmento já gravado em parte não duplica mensagens.
+- Um registro que o banco recusa (ex.: valor inválido) não trava o log: o
+  lote é refeito registro a registro e os recusados vão para um arquivo
+  `<pid>-<ns>.dead` no mesmo diretório, com o erro, para análise manual.
+- Falha no fsync depois da escrita: a mensagem já está no arquivo e seria
+  reaplicada de qualquer jeito, então é aceita (e gravada no banco pelo
+  próximo lote); o segmento deixa de receber escritas. Falha na própria
+  escrita desfaz a linha parcial e a requisição recebe o erro.
+- `pending()` acha, pelo hash exato, uma mensagem deste processo que ainda
+  está no buffer; uma cópia aceita em seguida é marcada (`duplicate_of`) ou
+  descartada como as duplicatas já gravadas.
+
+Trocas: a resposta não tem o id da mensagem. A mensagem só aparece no admin
+e na API depois do lote seguinte; até lá, só o worker que a aceitou a vê
+como duplicata (e só a exata). Sem
+CONTACT_WAL_FSYNC, uma queda do servidor (não só do processo) perde o que
+ainda não tinha chegado ao disco.
+"""
+import atexit
+import errno
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.db import DataError, IntegrityError, close_old_connections, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import dedup, inbox, outbox
+from .models import ContactMessage, EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+SUFFIX = '.wal'
+DEAD_SUFFIX = '.dead'
+# Erros de um registro específico (o banco fora do ar não entra aqui)
+REJECTED_ERRORS = (DataError, IntegrityError, ValidationError, KeyError, TypeError, ValueError)
+FIELDS = ('name', 'email', 'subject', 'message')
+# Mensagens aceitas há mais que isso voltam com o created_at da aceitação
+# (o auto_now_add marcaria a hora da gravação)
+LATE_COMMIT = timedelta(seconds=1)
+
+
+def _fsync_dir(directory):
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def commit_records(records, fingerprints=None, rejected=None):
+    """
+    Grava registros do log em uma transação, ignorando os que já estão no
+    banco. Retorna as mensagens criadas.
+
+    Se o lote falhar, os registros são gravados um a um. Os que falham
+    sozinhos com um erro do próprio registro (REJECTED_ERRORS) entram em
+    `rejected` como (registro, erro); sem `rejected`, o erro é levantado.
+    Outros erros (banco fora do ar) são sempre levantados.
+    """
+    try:
+        return _commit(records, fingerprints)
+    except Exception:
+        if len(records) == 1 and rejected is None:
+            raise
+        logger.warning('Lote de %s mensagens recusado; gravando uma a uma', len(records), exc_info=True)
+    messages = []
+    for i, record in enumerate(records):
+        try:
+            messages.extend(_commit([record], [fingerprints[i]] if fingerprints else None))
+        except REJECTED_ERRORS as e:
+            if isinstance(e, IntegrityError) and _already_committed(record):
+                # Gravado por outro processo ao mesmo tempo (ingest_id único)
+                continue
+            if rejected is None:
+                raise
+            rejected.append((record, e))
+    return messages
+
+
+def _already_committed(record):
+    try:
+        return ContactMessage.objects.filter(ingest_id=record['id']).exists()
+    except (KeyError, TypeError, ValueError, ValidationError):
+        return False
+
+
+def _commit(records, fingerprints):
+    existing = {
+        str(value) for value in
+        ContactMessage.objects.filter(ingest_id__in=[record['id'] for record in records])
+        .values_list('ingest_id', flat=True)
+    }
+    pending = []
+    for i, record in enumerate(records):
+        if record['id'] not in existing:
+            existing.add(record['id'])
+            pending.append((record, fingerprints[i] if fingerprints else None))
+    if not pending:
+        return []
+
+    # A mensagem marcada como original pode ter sido apagada antes do lote
+    originals = {record.get('duplicate_of') for record, _ in pending} - {None}
+    if originals:
+        originals = set(ContactMessage.objects.filter(pk__in=originals).values_list('pk', flat=True))
+    # Originais que ainda estavam no log: conhecidos só pelo ingest_id
+    logged = {record['duplicate_of_ingest'] for record, _ in pending if record.get('duplicate_of_ingest')}
+
+    now = timezone.now()
+    with transaction.atomic():
+        messages = ContactMessage.objects.bulk_create([
+            ContactMessage(
+                ingest_id=record['id'],
+                ip_address=record['ip_address'],
+                content_hash=record['content_hash'],
+                duplicate_of_id=record.get('duplicate_of') if record.get('duplicate_of') in originals else None,
+                **{field: record[field] for field in FIELDS},
+            )
+            for record, _ in pending
+        ])
+        ids = {}
+        if logged:
+            ids = {str(message.ingest_id): message.pk for message in messages}
+            ids.update(
+                (str(ingest_id), pk) for ingest_id, pk in
+                ContactMessage.objects.filter(ingest_id__in=logged - set(ids)).values_list('ingest_id', 'pk')
+            )
+        changed = []
+        for message, (record, _) in zip(messages, pending):
+            accepted_at = parse_datetime(record['created_at'])
+            late = now - accepted_at > LATE_COMMIT
+            if late:
+                message.created_at = accepted_at
+            original = ids.get(record.get('duplicate_of_ingest'))
+            if original is not None:
+                message.duplicate_of_id = original
+            if late or original is not None:
+                changed.append(message)
+        if changed:
+            ContactMessage.objects.bulk_update(changed, ['created_at', 'duplicate_of'])
+        inbox.record_created(messages)
+
+        notify = [message for message, (record, _) in zip(messages, pending) if record['notify']]
+        if notify:
+            EmailOutbox.objects.bulk_create([EmailOutbox(message=message) for message in notify])
+            transaction.on_commit(outbox.wake)
+        remember = [(message, fp) for message, (_, fp) in zip(messages, pending) if fp is not None]
+        if remember:
+            transaction.on_commit(lambda: [dedup.remember(message, fp) for message, fp in remember])
+    return messages
+
+
+class Segment:
+    """Arquivo do log em uso por este processo (travado com flock)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'ab', buffering=0)
+        fcntl.flock(self.file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self.size = 0
+        self.written = 0
+        self.synced = 0
+        self.committed = 0
+        self.active = True
+        self.sync_lock = threading.Lock()
+
+    def remove(self):
+        os.unlink(self.path)
+        self.file.close()
+
+
+class WriteBehindLog:
+    """Log local das mensagens aceitas e a thread que as grava no banco"""
+
+    def __init__(self, directory, fsync=True, flush_interval=0.05, batch_size=500, segment_bytes=4 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.fsync = fsync
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._segment = None
+        self._segments = []
+        self._buffer = []
+        # content_hash -> ingest_id das mensagens no buffer
+        self._pending = {}
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._counters = {
+            'appended': 0, 'syncs': 0, 'sync_errors': 0, 'committed': 0, 'batches': 0, 'replayed': 0, 'rejected': 0,
+        }
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, buffered=len(self._buffer), segments=len(self._segments))
+
+    # Escrita (threads das requisições)
+
+    def _active_segment(self):
+        # Chamado com self._lock
+        if self._segment is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._segment = Segment(self.directory / f'{os.getpid()}-{time.time_ns()}{SUFFIX}')
+            self._segments.append(self._segment)
+            if self.fsync:
+                # A entrada do novo arquivo no diretório também precisa ir ao disco
+                _fsync_dir(self.directory)
+        return self._segment
+
+    def _retire(self, segment):
+        # Chamado com self._lock: os próximos registros vão para um segmento novo
+        segment.active = False
+        if self._segment is segment:
+            self._segment = None
+
+    def _dead_letter(self, rejected):
+        """Grava os registros recusados (e linhas ilegíveis do log) num arquivo .dead, com o erro"""
+        if not rejected:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{os.getpid()}-{time.time_ns()}{DEAD_SUFFIX}'
+        with open(path, 'ab') as stream:
+            for record, error in rejected:
+                line = json.dumps({'record': record, 'error': repr(error)}, ensure_ascii=False, default=str)
+                stream.write((line + '\n').encode('utf-8'))
+            stream.flush()
+            os.fsync(stream.fileno())
+        for record, error in rejected:
+            record_id = record.get('id') if isinstance(record, dict) else None
+            logger.error('Registro %s do log recusado, movido para %s: %s', record_id, path.name, error)
+        with self._lock:
+            self._counters['rejected'] += len(rejected)
+
+    def _sync(self, segment, position):
+        with segment.sync_lock:
+            if segment.synced >= position:
+                # Outra requisição já sincronizou esta escrita
+                return
+            with self._lock:
+                target = segment.written
+            try:
+                os.fsync(segment.file.fileno())
+            except OSError as e:
+                # A linha já está no arquivo e seria reaplicada depois de uma
+                # queda: a mensagem é aceita e segue para o banco pelo buffer.
+                # O estado do arquivo no disco é incerto, então ele não recebe
+                # mais escritas.
+                logger.error('Falha no fsync do log %s: %s', segment.path.name, e)
+                with self._lock:
+                    self._retire(segment)
+                    self._counters['sync_errors'] += 1
+                return
+            segment.synced = target
+            with self._lock:
+                self._counters['syncs'] += 1
+
+    def append(self, record, fingerprint=None):
+        """Grava o registro no log (com fsync, se configurado) e o entrega à thread de gravação"""
+        line = (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            segment = self._active_segment()
+            try:
+                if segment.file.write(line) != len(line):
+                    raise OSError(errno.EIO, 'Escrita incompleta no log')
+            except OSError:
+                # Desfaz a linha parcial, que emendaria na próxima, e passa
+                # para um segmento novo; a requisição recebe o erro
+                self._retire(segment)
+                try:
+                    os.ftruncate(segment.file.fileno(), segment.size)
+                except OSError:
+                    pass
+                raise
+            segment.size += len(line)
+            segment.written += 1
+            position = segment.written
+            if segment.size >= self.segment_bytes:
+                self._retire(segment)
+        if self.fsync:
+            self._sync(segment, position)
+        with self._lock:
+            self._buffer.append((segment, record, fingerprint))
+            self._pending[record['content_hash']] = record['id']
+            self._counters['appended'] += 1
+            full = len(self._buffer) >= self.batch_size
+        self.start()
+        if full:
+            self._wakeup.set()
+
+    def pending(self, content_hash):
+        """ingest_id da última mensagem com este hash ainda no buffer, ou None"""
+        with self._lock:
+            return self._pending.get(content_hash)
+
+    # Gravação no banco (thread de fundo)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='wal-committer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.replay()
+        except Exception as e:
+            logger.error('Erro ao reaplicar o log de mensagens: %s', e)
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stop.is_set():
+                # O close() grava o restante
+                return
+            try:
+                while self.flush():
+                    pass
+            except Exception as e:
+                # Os registros continuam no buffer e no log; nova tentativa no próximo ciclo
+                logger.error('Erro ao gravar mensagens do log: %s', e)
+                self._stop.wait(min(self.flush_interval * 20, 5))
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Grava um lote do buffer no banco. Retorna quantas mensagens gravou"""
+        with self._flush_lock:
+            with self._lock:
+                batch = self._buffer[:self.batch_size]
+            if not batch:
+                return 0
+            rejected = []
+            commit_records([record for _, record, _ in batch], [fp for _, _, fp in batch], rejected)
+            self._dead_letter(rejected)
+            with self._lock:
+                del self._buffer[:len(batch)]
+                for segment, record, _ in batch:
+                    segment.committed += 1
+                    if self._pending.get(record['content_hash']) == record['id']:
+                        # Já no banco: a verificação pelo content_hash passa a achá-la
+                        del self._pending[record['content_hash']]
+                finished = [
+                    segment for segment in self._segments
+                    if not segment.active and segment.committed == segment.written
+                ]
+                for segment in finished:
+                    self._segments.remove(segment)
+                self._counters['committed'] += len(batch)
+                self._counters['batches'] += 1
+            for segment in finished:
+                segment.remove()
+            return len(batch)
+
+    def close(self):
+        """Grava o que falta e apaga os segmentos já gravados (saída do processo)"""
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(10)
+        try:
+            while self.flush():
+                pass
+        except Exception as e:
+            logger.error('Mensagens mantidas no log para a próxima execução: %s', e)
+            return
+        with self._lock:
+            segments, self._segments, self._segment = self._segments, [], None
+        for segment in segments:
+            if segment.committed == segment.written:
+                segment.remove()
+            else:
+                segment.file.close()
+
+    # Reaplicação de segmentos de processos que morreram
+
+    def replay(self):
+        """Grava no banco os segmentos órfãos do diretório e os apaga. Retorna as mensagens recuperadas"""
+        if not self.directory.is_dir():
+            return 0
+        total = 0
+        for path in sorted(self.directory.glob(f'*{SUFFIX}')):
+            try:
+                stream = open(path, 'rb')
+            except FileNotFoundError:
+                continue
+            with stream:
+                try:
+                    fcntl.flock(stream.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Segmento em uso por um processo vivo
+                    continue
+                if not path.exists():
+                    # Reaplicado e apagado por outro processo enquanto esperávamos
+                    continue
+                records = []
+                rejected = []
+                invalid = None
+                for line in stream:
+                    if invalid is not None:
+                        # Linha ilegível no meio do arquivo (a última pode só estar incompleta)
+                        rejected.append(invalid)
+                    try:
+                        records.append(json.loads(line))
+                        invalid = None
+                    except ValueError as e:
+                        # Se for a última, é uma escrita interrompida pela queda:
+                        # nunca foi confirmada ao cliente e é descartada
+                        invalid = (line.decode('utf-8', 'replace'), e)
+                created = 0
+                for start in range(0, len(records), self.batch_size):
+                    created += len(commit_records(records[start:start + self.batch_size], rejected=rejected))
+                self._dead_letter(rejected)
+                os.unlink(path)
+            if records:
+                logger.info('Log %s reaplicado: %s de %s mensagens gravadas agora', path.name, created, len(records))
+            total += created
+        with self._lock:
+            self._counters['replayed'] += total
+        return total
+
+
+_log = None
+_log_pid = None
+_log_lock = threading.Lock()
+
+
+def get_log():
+    """Log do processo (recriado após fork)"""
+    global _log, _log_pid
+    with _log_lock:
+        if _log is None or _log_pid != os.getpid():
+            _log = WriteBehindLog(
+                settings.CONTACT_WAL_DIR,
+                fsync=settings.CONTACT_WAL_FSYNC,
+                flush_interval=settings.CONTACT_WAL_FLUSH_SECONDS,
+                batch_size=settings.CONTACT_WAL_BATCH_SIZE,
+                segment_bytes=settings.CONTACT_WAL_SEGMENT_BYTES,
+            )
+            _log_pid = os.getpid()
+            atexit.register(_log.close)
+        return _log
+
+
+@receiver(setting_changed)
+def _reset_log(setting, **kwargs):
+    global _log
+    if setting.startswith('CONTACT_WAL_'):
+        with _log_lock:
+            previous, _log = _log, None
+        if previous is not None and _log_pid == os.getpid():
+            previous.close()
@@ -0,0 +1,76 @@
+"""
+Configuração do gunicorn (carregada automaticamente a partir da raiz do projeto).
+
+Pensada para partida a frio rápida (escala a zero no Render): a aplicação é
+importada e aquecida uma vez no processo mestre (preload_app) e os workers
+nascem por fork já com tudo carregado. O trabalho é dominado por I/O
+(banco, SendGrid), então cada worker atende várias requisições em threads.
+"""
+import os
+import shutil
+import tempfile
+
+
+def _env_bool(name, default):
+    return os.environ.get(name, str(default)).strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# O gunicorn já usa $PORT para o bind quando definido
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+preload_app = _env_bool('GUNICORN_PRELOAD', True)
+timeout = 30
+graceful_timeout = 20
+keepalive = 5
+
+# Métricas do Prometheus agregadas entre os workers (contact.metrics): cada
+# processo grava seus valores neste diretório. Precisa estar definido antes
+# de os workers importarem o prometheus_client.
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'portfolio-backend-metrics')
+)
+# Com preload_app a aplicação é importada antes do on_starting
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    # Valores de execuções anteriores não podem entrar na soma (os arquivos
+    # do mestre também vão embora, mas ele não registra métricas)
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    # Com preload a aplicação já está importada no mestre: aquece antes do fork
+    if server.cfg.preload_app:
+        from contact.startup import warm_up
+        warm_up()
+
+
+def post_worker_init(worker):
+    # Sem preload cada worker importa a aplicação; aquece antes de aceitar conexões
+    if not worker.cfg.preload_app:
+        from contact.startup import warm_up
+        warm_up()
+
+    # Índice de duplicatas, gravação adiada e pool de notificações, que são de cada processo
+    from contact.startup import warm_up_worker
+    warm_up_worker()
+
+
+def worker_exit(server, worker):
+    # Grava no banco o que ainda está só no log antes de o worker sair
+    from django.conf import settings
+    if settings.CONTACT_WRITE_BEHIND:
+        from contact.wal import get_log
+        get_log().close()
+
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)